@@ -70,10 +70,19 @@ VALUES ('python'),
 INSERT INTO `poodle`.`courses_tags` (`course_id`, `tag_id`)
 VALUES (1,1),(1,2),(2,5),(3,3),(3,4);
 
+-- full-text documents of the courses above (src/app/db/search.py), the app keeps them current from here on
+INSERT INTO `poodle`.`course_search` (`course_id`, `title`, `body`, `tags`)
+SELECT c.course_id, c.title, CONCAT(c.description, '\n', c.objectives),
+       COALESCE((SELECT GROUP_CONCAT(t.name SEPARATOR ' ') FROM `poodle`.`tags` t
+                 JOIN `poodle`.`courses_tags` ct ON ct.tag_id = t.tag_id WHERE ct.course_id = c.course_id), '')
+FROM `poodle`.`courses` c;
+
 -- enroll 2 students to course 1
 INSERT INTO `poodle`.`students_courses` (`student_id`, `course_id`,`status`) VALUES ('4', '1', '2');
 INSERT INTO `poodle`.`students_courses` (`student_id`, `course_id`,`status`) VALUES ('5', '1', '2');
 
 -- rating seed
 INSERT INTO `poodle`.`students_ratings` (`student_id`, `course_id`,`rating`) VALUES ('5', '1', 6);
-UPDATE `poodle`.`courses` SET `rating` = 6, people_rated = 1 WHERE `course_id` = 1;
\ No newline at end of file
+-- rank_score is core/ranking.py with the default prior (5 votes of 5.5), SET reads the new rating and people_rated
+UPDATE `poodle`.`courses` SET `rating` = 6, people_rated = 1, rank_score = (5 * 5.5 + `rating` * people_rated) / (5 + people_rated)
+WHERE `course_id` = 1;
\ No newline at end of file
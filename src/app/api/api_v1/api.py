@@ -1,9 +1,10 @@
 from fastapi import APIRouter
-from api.api_v1.routes import students, teachers, admins, public
+from api.api_v1.routes import students, teachers, admins, public, system
 
 api_router = APIRouter()
 
 api_router.include_router(students.router)
 api_router.include_router(public.router)
 api_router.include_router(teachers.router)
-api_router.include_router(admins.router)
\ No newline at end of file
+api_router.include_router(admins.router)
+api_router.include_router(system.router)
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from schemas.course import CourseInfo, CourseStudentRatingsSchema
 from schemas.student import StudentRatingSchema
 from crud import crud_course, crud_admin, crud_user, crud_teacher
 from core.oauth import AdminAuthDep
 from crud.crud_user import Role
-from db.database import dbDep
+from db.database import dbDep, readDbDep
 
 router = APIRouter(
     prefix="/admins",
@@ -15,8 +16,9 @@ router = APIRouter(
 
 @router.get('/courses', response_model=list[CourseInfo])
 async def get_courses(
-        db: dbDep, 
+        db: readDbDep,
         admin: AdminAuthDep,
+        response: Response,
         pages: int = 1,
         items_per_page: int = 5,
         tag: str | None = None,
@@ -24,30 +26,47 @@ async def get_courses(
         name: str | None = None,
         teacher_id: int | None = None,
         student_id: int | None = None,
+        cursor: str | None = None,
+        search: str | None = None,
+        tags: Annotated[list[str] | None, Query()] = None,
+        match_all_tags: bool = True,
 ):
     """
     Enables an admin to view all courses, the number of students in them and their rating.
     Admins can search through courses by teacher/student.
-    Pagination is also supported.
+    Pagination is also supported, by page number or by the cursor in the X-Next-Cursor response header.
 
     **Parameters:**
     - `db` (Session): The SQLAlchemy db session.
     - `admin` (AdminAuthDep): The authentication dependency for users with role Admin.
+    - `response` (Response): The response, carries the next page cursor.
     - `pages` (integer): The number of pages to be returned.
-    - `items_per_page`: The number of items per page to be returned.
+    - `items_per_page`: The number of items per page to be returned, at most CATALOG_MAX_PAGE_SIZE.
     - `tag` (string): The course tags to filter by.
     - `rating` (integer): The minimum desired course rating to filter by.
     - `name` (string): The title of the course to search by.
     - `student_id` (integer): The ID of the student to filter by.
     - `teacher_id` (integer): The ID of the teacher to filter by.
+    - `cursor` (string): The X-Next-Cursor of the previous page, takes precedence over `pages`.
+    - `search` (string): Words to find in title, description, objectives and tags, best matches first.
+      Search results are paged by `pages` only.
+    - `tags` (list of strings): Exact tag names, repeated (`?tags=python&tags=web`), case-insensitive, `name*` matches a prefix.
+    - `match_all_tags` (boolean): Only courses with every one of `tags` (default) or with any of them.
 
     **Returns**: a list of CourseInfo models.
+
+    **Raises**:
+    - `HTTPException 400`: If the cursor is invalid or given with `search`.
     """
 
-    return await crud_course.get_all_courses(
+    courses, next_cursor = await crud_course.get_courses_page(
         db=db, tag=tag, rating=rating, name=name, pages=pages, items_per_page=items_per_page,
-        teacher_id=teacher_id, student_id=student_id
+        teacher_id=teacher_id, student_id=student_id, cursor=cursor, search=search,
+        tags=tags, match_all_tags=match_all_tags
     )
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return courses
 
 
 @router.patch('/accounts/{account_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -78,7 +97,7 @@ async def switch_user_activation(
 
 @router.get('/courses/{course_id}')
 async def get_course_rating_info(
-        db: dbDep, admin: AdminAuthDep, course_id: int,
+        db: readDbDep, admin: AdminAuthDep, course_id: int,
 ):
     """
     Gets course rating info
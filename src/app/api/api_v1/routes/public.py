@@ -1,30 +1,42 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from schemas.course import CourseInfo
+from pydantic import TypeAdapter
+from schemas.course import CourseFacets, CourseInfo
 from crud import crud_user, crud_course
-from core.security import create_access_token, TokenData, Token
-from db.database import dbDep
+from core import catalog_cache, conditional
+from core.security import create_access_token, verify_token_access, oauth2_scheme, TokenData, Token
+from core.rate_limit import check_login_attempt, login_succeeded
+from db.database import catalogDbDep, dbDep
 
 
 router = APIRouter(tags=['public'])
 
+COURSE_LIST_JSON = TypeAdapter(list[CourseInfo])
+COURSE_FACETS_JSON = TypeAdapter(CourseFacets)
+
 
 @router.post('/login', include_in_schema=False)
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+async def login(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                 db: dbDep) -> Token:
     """
     Logs a user.
 
     **Parameters:**
+    - `request` (Request): the incoming request, its client ip is rate limited.
     - `form_data` (OAuth2PasswordRequestForm): the class dependency that implements the OAuth2 password flow
     - `db` (Session): The SQLAlchemy db session.
 
     **Returns**: a Token object (JWT)
 
-    **Raises**: HTTPException 401, if the user's credentials are incorrect.
+    **Raises**:
+    - HTTPException 401, if the user's credentials are incorrect.
+    - HTTPException 429, if the client ip or the username made too many attempts recently.
 
     """
+    # before the db lookup and bcrypt, a credential stuffing burst must not get to use either
+    check_login_attempt(request.client.host if request.client else '', form_data.username)
+
     user = await crud_user.try_login(db, form_data.username, form_data.password)
 
     if not user:
@@ -34,36 +46,143 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    login_succeeded(form_data.username)
     token = await create_access_token(
         TokenData(email=user.email, role=user.role))
     return token
 
 
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(db: dbDep, token: Annotated[str, Depends(oauth2_scheme)]) -> None:
+    """
+    Logs a user out of every device: all tokens issued to the account so far stop working.
+
+    **Parameters:**
+    - `db` (Session): The SQLAlchemy db session.
+    - `token` (str): the bearer token of the request.
+
+    **Raises**: HTTPException 401, if the token is invalid, expired or already revoked.
+
+    """
+    token_data = await verify_token_access(token)
+
+    if not isinstance(token_data, TokenData):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=token_data,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    await crud_user.revoke_tokens(db, token_data.email)
+
+
 @router.get('/courses', response_model=list[CourseInfo])
 async def get_courses(
-        db: dbDep,
+        db: catalogDbDep,
         tag: str | None = None,
         rating: float | None = None,
         name: str | None = None,
         pages: int = 1,
-        items_per_page: int = 5
-) -> list[CourseInfo]:
+        items_per_page: int = 5,
+        cursor: str | None = None,
+        search: str | None = None,
+        tags: Annotated[list[str] | None, Query()] = None,
+        match_all_tags: bool = True,
+        is_premium: bool | None = None,
+        teacher_id: int | None = None,
+        if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """
     - Displays title, description and tags of all courses.
-    - Courses can be searched by tag and/or rating.
+    - Courses can be searched by tag, rating, name and/or full text, matching words by prefix.
     - Number of pages and items per page can also be specified.
-    - By default, courses are ordered by rating in descending order.
+    - By default, courses are ordered by rank: their average rating weighed by how many students rated them.
+    - The X-Next-Cursor response header holds the cursor of the next page, it is absent on the last page.
+    - Responses are cached until a course, its tags or its rating change.
+    - Responses carry an ETag, a request whose If-None-Match holds it gets a 304 without a body,
+      from a cached page without querying the db. Browsers and proxies may reuse a page for CATALOG_MAX_AGE seconds.
 
     **Parameters:**
     - `db` (Session): The SQLAlchemy db session.
     - `tag` (string): the course tags to filter by.
     - `rating` (integer): the minimum desired course rating to filter by.
     - `pages` (integer): the number of pages to be returned.
-    - `items_per_page`: the number of items per page to be returned.
+    - `items_per_page`: the number of items per page to be returned, at most CATALOG_MAX_PAGE_SIZE.
+    - `cursor` (string): the X-Next-Cursor of the previous page, takes precedence over `pages`.
+    - `search` (string): words to find in title, description, objectives and tags, best matches first.
+      Search results are paged by `pages` only.
+    - `tags` (list of strings): exact tag names, repeated (`?tags=python&tags=web`), case-insensitive, `name*` matches a prefix.
+    - `match_all_tags` (boolean): only courses with every one of `tags` (default) or with any of them.
+    - `is_premium` (boolean): only premium or only free courses.
+    - `teacher_id` (integer): only the courses of this teacher.
+    - `if_none_match` (string): the If-None-Match header, the ETag of a page the client has.
+
+    **Returns**: a list of CourseInfo models, or 304 Not Modified.
+
+    **Raises**:
+    - `HTTPException 400`: If the cursor is invalid or given with `search`.
+    """
+
+    filters = dict(tag=tag, rating=rating, name=name, search=search, tags=tags, match_all_tags=match_all_tags,
+                   is_premium=is_premium, teacher_id=teacher_id)
+    key = catalog_cache.key('courses', pages=pages, items_per_page=items_per_page, cursor=cursor,
+                            **catalog_cache.normalized_filters(**filters))
+    cached = catalog_cache.get(key)
+    if cached is None:
+        courses, next_cursor = await crud_course.get_courses_page(
+            db=db, pages=pages, items_per_page=items_per_page, cursor=cursor, **filters)
+        body = COURSE_LIST_JSON.dump_json(courses)
+        # from the bytes: the same page gets the same ETag on every worker and after unrelated catalog changes
+        cached = (body, next_cursor, conditional.etag(body, next_cursor))
+        catalog_cache.store(key, cached)
+
+    body, next_cursor, etag = cached
+    headers = conditional.headers(etag, conditional.PUBLIC)
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    if conditional.matches(if_none_match, etag):
+        return conditional.not_modified(headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+@router.get('/courses/facets', response_model=CourseFacets)
+async def get_course_facets(
+        db: catalogDbDep,
+        tag: str | None = None,
+        rating: float | None = None,
+        name: str | None = None,
+        search: str | None = None,
+        tags: Annotated[list[str] | None, Query()] = None,
+        match_all_tags: bool = True,
+        is_premium: bool | None = None,
+        teacher_id: int | None = None,
+        if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    - Counts the courses matching the filters, for a filter sidebar.
+    - Takes the same filters as GET /courses and counts by premium/free, tag, rating and teacher.
+    - Responses are cached and carry an ETag like those of GET /courses.
 
-    **Returns**: a list of CourseInfo models.
+    **Parameters:**
+    - `db` (Session): The SQLAlchemy db session.
+    - `tag`, `rating`, `name`, `search`, `tags`, `match_all_tags`, `is_premium`, `teacher_id`, `if_none_match`:
+      as in GET /courses.
+
+    **Returns**: a CourseFacets model: the total, the premium and free counts, and the counts per tag,
+    per whole rating point (null for unrated courses) and per teacher, largest first. Or 304 Not Modified.
     """
 
-    return await crud_course.get_all_courses(
-        db=db, tag=tag, rating=rating, name=name, pages=pages, items_per_page=items_per_page
-    )
+    filters = dict(tag=tag, rating=rating, name=name, search=search, tags=tags, match_all_tags=match_all_tags,
+                   is_premium=is_premium, teacher_id=teacher_id)
+    key = catalog_cache.key('facets', **catalog_cache.normalized_filters(**filters))
+    cached = catalog_cache.get(key)
+    if cached is None:
+        body = COURSE_FACETS_JSON.dump_json(await crud_course.get_facets(db=db, **filters))
+        cached = (body, conditional.etag(body))
+        catalog_cache.store(key, cached)
+
+    body, etag = cached
+    headers = conditional.headers(etag, conditional.PUBLIC)
+    if conditional.matches(if_none_match, etag):
+        return conditional.not_modified(headers)
+    return Response(body, media_type='application/json', headers=headers)
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
+from fastapi import APIRouter, Header, HTTPException, Response, status
 from crud import crud_course, crud_section
-from core.oauth import StudentAuthDep
+from core import conditional
+from core.oauth import StudentAuthDep, StudentEnrollmentsAuthDep
 from api.api_v1.routes import utils
 from crud import crud_user, crud_student
 from schemas.course import CourseInfo, CourseRate, CourseRateResponse, StudentCourseSchema
@@ -9,7 +11,7 @@ from schemas.student import StudentCreate, StudentEdit, StudentResponseModel
 from schemas.user import UserChangePassword
 from db.models import Course
 from fastapi import UploadFile
-from db.database import dbDep
+from db.database import dbDep, readDbDep
 
 router = APIRouter(
     prefix="/students",
@@ -118,11 +120,12 @@ async def change_password(db: dbDep, student: StudentAuthDep,
 
 
 @router.get('/courses', response_model=list[CourseInfo])
-async def view_my_courses(student: StudentAuthDep) -> list[CourseInfo]:
+async def view_my_courses(db: readDbDep, student: StudentAuthDep) -> list[CourseInfo]:
     """
     Returns authenticated student's courses.
 
     **Parameters:**
+    - `db` (Session): The SQLAlchemy db session.
     - `student` (StudentAuthDep): The authentication dependency for users with role Student.
 
     **Returns**: A list of CourseInfo response models with the information for each course the student is enrolled in.
@@ -130,11 +133,11 @@ async def view_my_courses(student: StudentAuthDep) -> list[CourseInfo]:
     **Raises**:
     - HTTPException 401, if the student is not authenticated.
     """
-    return await crud_student.get_my_courses(student=student)
+    return await crud_student.get_my_courses(db=db, student=student)
 
 
 @router.get('/courses/pending', response_model=list[CourseInfo] | None)
-async def view_pending_courses(db: dbDep, student: StudentAuthDep) -> list[CourseInfo] | None:
+async def view_pending_courses(db: readDbDep, student: StudentAuthDep) -> list[CourseInfo] | None:
     """
     Returns authenticated student's pending requests for courses.
 
@@ -152,31 +155,44 @@ async def view_pending_courses(db: dbDep, student: StudentAuthDep) -> list[Cours
 
 
 @router.get('/courses/{course_id}', response_model=StudentCourseSchema | None)
-async def view_course(db: dbDep, student: StudentAuthDep, course_id: int) -> StudentCourseSchema:
+async def view_course(db: readDbDep, student: StudentAuthDep, course_id: int, response: Response,
+                      if_none_match: Annotated[str | None, Header()] = None) -> StudentCourseSchema:
     """
     Returns authenticated student's chosen course with details.
+    The ETag follows the course version and the student's progress, a matching If-None-Match gets a 304
+    before the course details are read.
 
     **Parameters:**
     - `db` (Session): The SQLAlchemy db session.
     - `student` (StudentAuthDep): The authentication dependency for users with role Student.
     - `course_id` (integer): The ID of the course the student wants to view.
+    - `if_none_match` (string): the If-None-Match header, the ETag of the course page the client has.
 
-    **Returns**: A StudentCourse response object with detailed information about the course and the student's progress and rating of the course.
+    **Returns**: A StudentCourse response object with detailed information about the course and the student's progress and rating of the course, or 304 Not Modified.
 
     **Raises**:
     - HTTPException 401, if the student is not authenticated.
     - HTTPException 404, if the course is not found.
     - HTTPException 409, if the student is not enrolled in the course.
     """
-    course: Course = await crud_course.get_course_by_id(db=db, course_id=course_id)
+    # the version alone, get_course_information reads the course once the ETag did not match
+    version = await crud_course.get_course_version(db, course_id)
 
-    if not course:
+    if version is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No such course')
 
-    if not await crud_student.is_student_enrolled(student=student, course_id=course_id):
+    if not await crud_student.is_student_enrolled(db=db, student=student, course_id=course_id):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail='You have to enroll in this course to view details about it')
 
+    # the student's own rating changes the course version too (update_rating), progress is the sections viewed
+    viewed_sections = await crud_student.count_viewed_sections(db, student.student_id, course_id)
+    headers = conditional.headers(conditional.etag(course_id, version, student.student_id, viewed_sections),
+                                  conditional.PRIVATE)
+    if conditional.matches(if_none_match, headers['ETag']):
+        return conditional.not_modified(headers)
+
+    response.headers.update(headers)
     return await crud_student.get_course_information(db=db, course_id=course_id, student=student)
 
 
@@ -215,7 +231,7 @@ async def view_course_section(
             detail='No such Section'
         )
 
-    if not await crud_student.is_student_enrolled(student=student, course_id=course_id):
+    if not await crud_student.is_student_enrolled(db=db, student=student, course_id=course_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail='You have to enroll in this course to view details about it'
@@ -227,13 +243,14 @@ async def view_course_section(
 
 
 @router.post('/courses/{course_id}/subscription')
-async def subscribe_for_course(db: dbDep, student: StudentAuthDep, course_id: int) -> str:
+async def subscribe_for_course(db: dbDep, student: StudentEnrollmentsAuthDep, course_id: int) -> str:
     """
     Sends a subscription request by email to the owner of the course.
 
     **Parameters:**
     - `db` (Session): The SQLAlchemy db session.
-    - `student` (StudentAuthDep): The authentication dependency for users with role Student.
+    - `student` (StudentEnrollmentsAuthDep): The authentication dependency for users with role Student,
+    loaded with their active enrollments.
     - `course_id` (integer): the ID of the course the student wants to enroll in.
 
     **Returns**: 'Pending approval' message.
@@ -250,14 +267,14 @@ async def subscribe_for_course(db: dbDep, student: StudentAuthDep, course_id: in
     if not course:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No such course')
 
-    if await crud_student.is_student_enrolled(student=student, course_id=course.course_id):
+    if await crud_student.is_student_enrolled(db=db, student=student, course_id=course.course_id):
         return f'You are already subscribed for course {course.title}. Click on <View Course> or <View Course Section> to access its content'
 
     if course.is_premium and not student.is_premium:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail='Upgrade to premium to enroll in this course')
 
-    if course.is_premium and await crud_student.get_premium_courses_count(student=student) >= 5:
+    if course.is_premium and await crud_student.get_premium_courses_count(db=db, student=student) >= 5:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Premium courses limit reached')
 
@@ -289,14 +306,15 @@ async def unsubscribe(
 
 
 @router.post('/courses/{course_id}/rating', status_code=status.HTTP_201_CREATED, response_model=CourseRateResponse)
-async def rate_course(db: dbDep, student: StudentAuthDep, course_id: int,
+async def rate_course(db: dbDep, student: StudentEnrollmentsAuthDep, course_id: int,
                       rating: CourseRate) -> CourseRateResponse:
     """
     Enables authenticated student to rate a course, if the student is enrolled in the course.
 
     **Parameters:**
     - `db` (Session): The SQLAlchemy db session.
-    - `student` (StudentAuthDep): The authentication dependency for users with role Student.
+    - `student` (StudentEnrollmentsAuthDep): The authentication dependency for users with role Student,
+    loaded with their active enrollments.
     - `course_id` (integer): ID of the course to rate.
     - `rating` (CourseRate): rating the student wants to give.
 
@@ -312,7 +330,7 @@ async def rate_course(db: dbDep, student: StudentAuthDep, course_id: int,
     if not course:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No such course')
 
-    if not await crud_student.is_student_enrolled(student=student, course_id=course_id):
+    if not await crud_student.is_student_enrolled(db=db, student=student, course_id=course_id):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail='You have to enroll in this course to rate it')
 
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Response, status
+from core.oauth import AdminAuthDep
+from db.database import get_pool_stats
+from core.hashing import get_hashing_stats
+from core.offload import get_offload_stats
+from db import warmup
+from core.principal_cache import get_principal_cache_stats
+from core.rate_limit import get_login_limit_stats
+from core.security import get_token_cache_stats
+from core.tag_index import get_tag_index_stats
+from core.catalog_cache import get_catalog_cache_stats
+
+router = APIRouter(
+    prefix="/system",
+    tags=["system"],
+)
+
+
+@router.get('/stats')
+async def get_stats(admin: AdminAuthDep) -> dict:
+    """
+    Shows runtime statistics of the current worker process.
+
+    **Parameters:**
+    - `admin` (AdminAuthDep): The authentication dependency for users with role Admin.
+
+    **Returns**: a dictionary with the connection pool checkout/overflow counters, the offload and password hashing pools' queue depth and queue-wait/run times, the principal and token cache hit/miss counters, the login throttling counters, the tag index size and the catalog cache hit ratio.
+    """
+    return {
+        "db_pool": get_pool_stats(),
+        "offload": get_offload_stats(),
+        "hashing": get_hashing_stats(),
+        "principal_cache": get_principal_cache_stats(),
+        "token_cache": get_token_cache_stats(),
+        "login_limits": get_login_limit_stats(),
+        "tag_index": get_tag_index_stats(),
+        "catalog_cache": get_catalog_cache_stats(),
+    }
+
+
+@router.get('/ready')
+async def readiness(response: Response) -> dict:
+    """
+    Readiness probe for the load balancer / rolling deploys.
+
+    **Returns**: the warm-up state, with status 200 once the connection pool is open and the hot statements are cached.
+
+    **Raises**:
+    - 503, while the warm-up is still running or if it failed.
+    """
+    if not warmup.state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return warmup.state
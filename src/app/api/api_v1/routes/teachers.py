@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Body, status
+from fastapi import APIRouter, HTTPException, Body, Header, Response, status
 from db.models import Course, Student 
 from crud import crud_user, crud_teacher, crud_student
 from crud import crud_course, crud_section, crud_tag
@@ -6,13 +6,14 @@ from schemas.teacher import TeacherEdit, TeacherCreate, TeacherSchema, TeacherAp
 from schemas.course import CourseCreate, CourseUpdate, CourseSectionsTags, CourseBase, CoursePendingRequests
 from schemas.section import SectionBase, SectionUpdate
 from schemas.tag import TagBase
+from core import conditional
 from core.oauth import TeacherAuthDep
 from schemas.user import UserChangePassword
 from api.api_v1.routes import utils
-from typing import List, Dict
+from typing import Annotated, List, Dict
 from typing import Union
 from fastapi import UploadFile
-from db.database import dbDep
+from db.database import dbDep, readDbDep
 
 router = APIRouter(prefix='/teachers', tags=['teachers'])
 
@@ -208,7 +209,7 @@ async def update_course_home_page_picture(
 
 
 @router.get('/courses/pending', response_model=list[CoursePendingRequests])
-async def view_pending_requests(db: dbDep, teacher: TeacherAuthDep):
+async def view_pending_requests(db: readDbDep, teacher: TeacherAuthDep):
     """
     Returns authenticated teacher's pending requests for courses.
 
@@ -225,7 +226,7 @@ async def view_pending_requests(db: dbDep, teacher: TeacherAuthDep):
 
 
 @router.get("/courses", response_model=list[CourseBase])
-async def get_courses(db: dbDep, teacher: TeacherAuthDep):
+async def get_courses(db: readDbDep, teacher: TeacherAuthDep):
     """
     Returns teacher's courses.
 
@@ -244,14 +245,17 @@ async def get_courses(db: dbDep, teacher: TeacherAuthDep):
 
 @router.get("/courses/{course_id}", response_model=CourseSectionsTags)
 async def view_course_by_id(
-        db: dbDep,
+        db: readDbDep,
         course_id: int,
         teacher: TeacherAuthDep,
+        response: Response,
         sort: str | None = None,
-        sort_by: str | None = None
+        sort_by: str | None = None,
+        if_none_match: Annotated[str | None, Header()] = None,
 ):
     """
     Retrieves a course by its ID along with associated tags and sections.
+    The ETag follows the course version, a matching If-None-Match gets a 304 before tags and sections are read.
 
     **Parameters:**
     - `db` (Session): The SQLAlchemy db session.
@@ -259,8 +263,9 @@ async def view_course_by_id(
     - `user` (TeacherAuthDep): The authentication dependency for users with role Teacher.
     - `sort` (str, optional): Sort order, either 'asc' or 'desc'.
     - `sort_by` (str, optional): Field to sort by, either 'section_id' or 'title'.
+    - `if_none_match` (str, optional): the If-None-Match header, the ETag of the course page the client has.
     
-    **Returns**: A `CourseSectionsTags` object containing the course details, tags, and sections.
+    **Returns**: A `CourseSectionsTags` object containing the course details, tags, and sections, or 304 Not Modified.
 
     **Raises**:
     - `HTTPException 401`, if the teacher is not authenticated.
@@ -279,7 +284,11 @@ async def view_course_by_id(
             detail=f"Invalid sort_by parameter"
         )
 
-    course = await crud_course.get_course_common_info(db, course_id)
+    # validation is case-insensitive, one spelling per representation keeps the ETag and the section order stable
+    sort, sort_by = sort and sort.lower(), sort_by and sort_by.lower()
+
+    # owner and version only, the course row (with its picture) is read once the ETag did not match
+    course = await crud_course.get_course_owner_and_version(db, course_id)
     user_has_access, msg = crud_teacher.validate_course_access(course, teacher)
     if not user_has_access:
         raise HTTPException(
@@ -287,6 +296,16 @@ async def view_course_by_id(
             detail=msg
         )
 
+    headers = conditional.headers(conditional.etag(course_id, course.version, sort, sort_by), conditional.PRIVATE)
+    if conditional.matches(if_none_match, headers['ETag']):
+        return conditional.not_modified(headers)
+
+    course = await crud_course.get_course_common_info(db, course_id)
+    if not course:
+        # hidden since the version check
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Course does not exist")
+
+    response.headers.update(headers)
     return await crud_teacher.get_entire_course(db, course, teacher, sort, sort_by)
 
 
@@ -319,7 +338,7 @@ async def approve_enrollment(db: dbDep,
     if not course:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No such course')
 
-    if not await crud_teacher.is_teacher_owner(course_id, teacher):
+    if not await crud_teacher.is_teacher_owner(course, teacher):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Course owner required')
 
     student: Student = await crud_student.get_by_email(db, student)
@@ -596,7 +615,7 @@ async def deactivate_course(db: dbDep, course_id: int, teacher: TeacherAuthDep):
             detail=msg
         )
 
-    if course.students_enrolled:
+    if await crud_course.has_students(db, course.course_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot deactivate a course with enrolled students"
@@ -607,7 +626,7 @@ async def deactivate_course(db: dbDep, course_id: int, teacher: TeacherAuthDep):
 
 @router.get("/reports")
 async def generate_courses_reports(
-        db: dbDep,
+        db: readDbDep,
         teacher: TeacherAuthDep,
         min_progress: str = "0.0",
         sort: str | None = None
@@ -0,0 +1,100 @@
+"""
+Deep catalog pages: OFFSET pagination (`pages`) vs the keyset cursor, on a synthetic catalog.
+
+offset  get_courses_page(pages=n), the database walks and drops every course before the page
+cursor  get_courses_page(cursor=...), the database seeks to the cursor in ix_courses_is_hidden_rank_score
+
+Run from src/app:
+    python -m benchmarks.catalog_pagination [--courses 1000000] [--items-per-page 20] [--repeat 5]
+
+A temporary SQLite file is seeded (about a minute for a million courses), 10% of the courses unrated.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, insert
+from db.database import Base, create_db_engine, create_session_factory
+from db.models import Course
+from crud import crud_course
+
+
+def seed(path: str, courses: int) -> None:
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    random.seed(0)
+    chunk = 50_000
+    with engine.begin() as conn:
+        for first in range(1, courses + 1, chunk):
+            conn.execute(insert(Course), [
+                {'course_id': course_id, 'title': f'course{course_id}', 'description': 'd', 'objectives': 'o',
+                 'owner_id': 1, 'is_premium': False, 'is_hidden': course_id % 50 == 0,
+                 'rating': None if course_id % 10 == 0 else random.uniform(1, 10),
+                 'people_rated': 0 if course_id % 10 == 0 else random.randint(1, 100)}
+                for course_id in range(first, min(first + chunk, courses + 1))])
+    engine.dispose()
+
+
+async def timed(coro_func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coro_func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def run(url: str, courses: int, items_per_page: int, repeat: int) -> None:
+    engine = create_db_engine(url)
+    session_factory = create_session_factory(engine)
+    visible = courses - courses // 50
+
+    print(f'{courses} courses, {items_per_page} per page, median of {repeat}')
+    print(f'{"first row":>10} {"offset ms":>10} {"cursor ms":>10}')
+    async with session_factory() as db:
+        for depth in (0, 10_000, 100_000, visible // 2, visible - items_per_page):
+            if depth >= visible:
+                continue
+            page = depth // items_per_page + 1
+            depth = (page - 1) * items_per_page
+
+            # the cursor a client holds after reading the courses before the page
+            cursor = None
+            if depth:
+                course_id, rank_score = (await db.execute(
+                    crud_course.catalog_page(Course.is_hidden == False).offset(depth - 1).limit(1))).one()
+                cursor = crud_course.encode_cursor(rank_score, course_id)
+
+            by_offset = await crud_course.get_courses_page(db, pages=page, items_per_page=items_per_page)
+            by_cursor = await crud_course.get_courses_page(db, items_per_page=items_per_page, cursor=cursor)
+            assert by_offset == by_cursor, f'pages differ at {depth}'
+
+            offset_s = await timed(lambda: crud_course.get_courses_page(
+                db, pages=page, items_per_page=items_per_page), repeat)
+            cursor_s = await timed(lambda: crud_course.get_courses_page(
+                db, items_per_page=items_per_page, cursor=cursor), repeat)
+            print(f'{depth:>10} {offset_s * 1000:>10.2f} {cursor_s * 1000:>10.2f}')
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, default=1_000_000)
+    parser.add_argument('--items-per-page', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'catalog.db')
+        start = time.perf_counter()
+        seed(path, args.courses)
+        print(f'seeded in {time.perf_counter() - start:.1f} s')
+        asyncio.run(run(f'sqlite+aiosqlite:///{path}', args.courses, args.items_per_page, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Catalog search as the catalog grows: the old LIKE '%term%' filters vs the full-text index.
+
+like       title LIKE '%word%', the filter get_all_courses used, a scan of every course
+full-text  get_courses_page(search=...), title/description/objectives/tags through course_search
+
+Run from src/app:
+    python -m benchmarks.catalog_search [--sizes 10000 100000 1000000] [--repeat 5]
+
+Temporary SQLite files (FTS5) are seeded with titles of random words, the searched word is a rare one
+so both return the same handful of courses.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, insert
+from db import search as full_text
+from db.database import Base, create_db_engine, create_session_factory
+from db.models import Course
+from crud import crud_course
+
+WORDS = ['intro', 'advanced', 'python', 'history', 'painting', 'music', 'data', 'cooking', 'design', 'finance',
+         'biology', 'chess', 'writing', 'physics', 'garden', 'photo', 'marketing', 'guitar', 'yoga', 'law']
+RARE = 'zymurgy'
+
+
+def seed(path: str, courses: int) -> None:
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    rnd = random.Random(0)
+    chunk = 50_000
+    with engine.begin() as conn:
+        for first in range(1, courses + 1, chunk):
+            conn.execute(insert(Course), [
+                {'course_id': course_id, 'owner_id': 1, 'is_premium': False, 'is_hidden': False,
+                 'title': f'{" ".join(rnd.sample(WORDS, 3))} {RARE if course_id % 10_000 == 0 else ""} {course_id}',
+                 'description': ' '.join(rnd.choices(WORDS, k=12)), 'objectives': ' '.join(rnd.choices(WORDS, k=6)),
+                 'rating': rnd.uniform(1, 10), 'people_rated': 1}
+                for course_id in range(first, min(first + chunk, courses + 1))])
+    engine.dispose()
+
+
+async def timed(coro_func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coro_func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def run(path: str, courses: int, repeat: int) -> None:
+    engine = create_db_engine(f'sqlite+aiosqlite:///{path}')
+    session_factory = create_session_factory(engine)
+    async with session_factory() as db:
+        await full_text.rebuild(db)
+
+        async def like():
+            page = crud_course.catalog_page(Course.is_hidden == False, Course.title.like(f'%{RARE}%')).limit(20)
+            return await crud_course.get_catalog(db, page)
+
+        async def search():
+            courses_found, _ = await crud_course.get_courses_page(db, items_per_page=20, search=RARE)
+            return courses_found
+
+        assert {c.title for c in await like()} == {c.title for c in await search()}
+        like_s, search_s = await timed(like, repeat), await timed(search, repeat)
+        print(f'{courses:>10} {like_s * 1000:>10.2f} {search_s * 1000:>12.2f}')
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"courses":>10} {"like ms":>10} {"full-text ms":>12}')
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'catalog.db')
+            seed(path, size)
+            asyncio.run(run(path, size, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Event loop responsiveness while slow queries are in flight: blocking Session vs AsyncSession.
+
+A heartbeat task sleeps 1 ms in a loop and records how late it wakes up, while a number of
+concurrent "requests" each run a slow query. With the blocking driver every query pins the loop,
+with the async driver the loop keeps serving while the queries wait.
+
+Run from src/app:
+    python -m benchmarks.event_loop [--requests 20]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from db.database import create_db_engine, create_session_factory, get_sync_engine
+
+# ~tens of ms of pure SQLite work, stands in for a slow catalog/report query
+SLOW_QUERY = text(
+    'WITH RECURSIVE cnt(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM cnt WHERE x < 300000) SELECT count(*) FROM cnt'
+)
+
+
+async def heartbeat(stop: asyncio.Event, delays: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        delays.append(time.perf_counter() - start - 0.001)
+
+
+async def measure(run_requests) -> tuple[float, float]:
+    stop, delays = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, delays))
+    start = time.perf_counter()
+    await run_requests()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, max(delays, default=0.0)
+
+
+async def main(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+
+        sync_session_factory = sessionmaker(bind=get_sync_engine(url))
+
+        async def blocking_request():
+            with sync_session_factory() as db:
+                db.execute(SLOW_QUERY).scalar()
+
+        async def run_blocking():
+            await asyncio.gather(*(blocking_request() for _ in range(requests)))
+
+        engine = create_db_engine(url)
+        session_factory = create_session_factory(engine)
+
+        async def async_request():
+            async with session_factory() as db:
+                (await db.execute(SLOW_QUERY)).scalar()
+
+        async def run_async():
+            await asyncio.gather(*(async_request() for _ in range(requests)))
+
+        for name, runner in (('blocking Session', run_blocking), ('AsyncSession', run_async)):
+            elapsed, worst_delay = await measure(runner)
+            print(f'{name:<18} {requests} requests in {elapsed * 1000:8.1f} ms   '
+                  f'worst event loop stall {worst_delay * 1000:8.1f} ms')
+
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,61 @@
+"""
+Token verification per request: the old path vs the settings-based one, uncached and cached.
+
+old       os.environ lookups, full jwt.decode and strptime of the string `expire` claim on every call
+uncached  keys/algorithm from Settings, numeric `exp`, signature checked (first sight of a token)
+cached    the same token again, served from the token cache
+
+Run from src/app:
+    python -m benchmarks.jwt_verify [--calls 20000]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from jose import jwt
+from core import security
+from core.security import TokenData
+
+
+async def old_verify_token_access(token: str) -> TokenData:
+    payload = jwt.decode(token, os.environ['AUTH_SECRET_KEY'], algorithms=os.environ['ALGORITHM'])
+    exp_datetime = datetime.strptime(payload.get("expire"), '%Y-%m-%d %H:%M:%S')
+    assert exp_datetime > datetime.now()
+    return TokenData(email=payload.get("email"), role=payload.get("role"))
+
+
+async def per_call(verify, token: str, calls: int, clear_cache: bool = False) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        if clear_cache:
+            security.token_cache.clear()
+        await verify(token)
+    return (time.perf_counter() - start) / calls
+
+
+async def main(calls: int) -> None:
+    os.environ['AUTH_SECRET_KEY'] = security.SIGNING_KEY
+    os.environ['ALGORITHM'] = security.ALGORITHMS[0]
+
+    expire = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    old_token = jwt.encode({'email': 's@s.com', 'role': 'student', 'expire': expire},
+                           security.SIGNING_KEY, security.ALGORITHMS[0])
+    new_token = (await security.create_access_token(TokenData(email='s@s.com', role='student'))).access_token
+
+    runs = [
+        ('old', old_verify_token_access, old_token, False),
+        ('uncached', security.verify_token_access, new_token, True),
+        ('cached', security.verify_token_access, new_token, False),
+    ]
+    for name, verify, token, clear_cache in runs:
+        await verify(token)
+        seconds = await per_call(verify, token, calls, clear_cache)
+        print(f'{name:<9} {seconds * 1_000_000:8.1f} us per call')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
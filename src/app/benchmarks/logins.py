@@ -0,0 +1,54 @@
+"""
+Concurrent logins: bcrypt verification on the event loop vs on the hashing pool (threads and processes).
+
+Every "login" verifies one password against a bcrypt hash, all of them at once, while a heartbeat task
+measures how long the event loop is stalled. Inline, each verification pins the loop; on the pool
+the loop stays free and, with enough workers, the logins finish in parallel.
+
+Run from src/app:
+    python -m benchmarks.logins [--logins 50] [--workers 4]
+"""
+import argparse
+import asyncio
+from core import hashing
+from core.offload import WorkerPool
+from benchmarks.event_loop import measure
+
+
+async def main(logins: int, workers: int) -> None:
+    hashed = hashing.hash_pass('benchmark')
+
+    async def inline_login():
+        hashing.verify_password('benchmark', hashed)
+
+    async def run_inline():
+        await asyncio.gather(*(inline_login() for _ in range(logins)))
+
+    print(f'{logins} concurrent logins, {workers} workers')
+    elapsed, worst_delay = await measure(run_inline)
+    print(f'{"on the event loop":<18} {logins / elapsed:8.1f} logins/s   '
+          f'worst event loop stall {worst_delay * 1000:8.1f} ms')
+
+    for kind in ('thread', 'process'):
+        pool = WorkerPool('bench', workers, kind=kind)
+        # start the workers outside the measurement
+        await asyncio.gather(*(pool.run(int) for _ in range(workers)))
+        pool.reset_stats()
+
+        async def run_pool():
+            await asyncio.gather(*(pool.run(hashing.verify_password, 'benchmark', hashed) for _ in range(logins)))
+
+        elapsed, worst_delay = await measure(run_pool)
+        stats = pool.stats()
+        pool.shutdown()
+        print(f'{kind + " pool":<18} {logins / elapsed:8.1f} logins/s   '
+              f'worst event loop stall {worst_delay * 1000:8.1f} ms   '
+              f'queue wait avg {stats["wait_avg"] * 1000:6.1f} ms max {stats["wait_max"] * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.workers))
@@ -0,0 +1,59 @@
+"""
+Login throughput at each password-hash cost, to pick BCRYPT_ROUNDS / ARGON2_* for a deployment.
+
+For every setting, a batch of concurrent logins verifies against a hash made at that cost on a
+hashing pool like the app's. argon2 settings are skipped when argon2-cffi is not installed.
+
+Run from src/app:
+    python -m benchmarks.password_cost [--logins 20] [--workers 4] [--rounds 10 11 12 13]
+"""
+import argparse
+import asyncio
+import time
+from passlib.exc import MissingBackendError
+from core import hashing
+from core.offload import WorkerPool
+
+ARGON2_SETTINGS = [
+    # (time_cost, memory_cost KiB)
+    (2, 19456),
+    (3, 65536),
+]
+
+
+async def run_logins(context, logins: int, workers: int) -> tuple[float, float]:
+    hashed = context.hash('benchmark')
+    pool = WorkerPool('bench', workers)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.run(context.verify, 'benchmark', hashed) for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    return logins / elapsed, pool.stats()["run_avg"]
+
+
+async def main(logins: int, workers: int, rounds: list[int]) -> None:
+    print(f'{logins} concurrent logins, {workers} workers')
+    settings = [(f'bcrypt rounds={r}', hashing.build_context('bcrypt', bcrypt_rounds=r)) for r in rounds]
+    settings += [
+        (f'argon2 t={t} m={m}', hashing.build_context('argon2', argon2_time_cost=t, argon2_memory_cost=m))
+        for t, m in ARGON2_SETTINGS
+    ]
+
+    for name, context in settings:
+        try:
+            throughput, verify_avg = await run_logins(context, logins, workers)
+        except MissingBackendError:
+            print(f'{name:<22} skipped, argon2-cffi is not installed')
+            continue
+        print(f'{name:<22} {throughput:8.1f} logins/s   {verify_avg * 1000:8.1f} ms per verification')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13])
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.workers, args.rounds))
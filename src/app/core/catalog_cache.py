@@ -0,0 +1,74 @@
+from typing import Hashable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from core.cache import TTLCache
+from core.settings import settings
+from db import database
+from db.search import terms
+
+# Public catalog responses (GET /courses, GET /courses/facets) as ready-to-send JSON bytes,
+# keyed by the catalog version and the normalized query. A committed change to what the catalog shows
+# bumps the version, so every older entry stops matching and ages out of the LRU.
+# Per process: other workers' changes show up within CATALOG_CACHE_TTL.
+cache = TTLCache(maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL)
+version = 0
+
+
+def words(text: str | None) -> str | None:
+    """A full-text filter as the index sees it: case and punctuation do not change the result"""
+    return ' '.join(terms(text)).lower() or None
+
+
+def normalized_filters(tag: str = None, rating: float = None, name: str = None, search: str = None,
+                       tags: list[str] = None, match_all_tags: bool = True, is_premium: bool = None,
+                       teacher_id: int = None) -> dict:
+    """The catalog filters, spellings that give the same result folded into one"""
+    tags = tuple(sorted({tag_name.lower() for tag_name in tags or () if tag_name.rstrip('*')}))
+    return {
+        'tag': words(tag), 'rating': rating or None, 'name': words(name), 'search': words(search), 'tags': tags,
+        'match_all_tags': match_all_tags or len(tags) < 2, 'is_premium': is_premium, 'teacher_id': teacher_id or None,
+    }
+
+
+def key(endpoint: str, **params) -> tuple:
+    """Read the version before querying: a change committed meanwhile leaves the result under the old one"""
+    return (version, endpoint, *sorted(params.items()))
+
+
+def get(cache_key: Hashable):
+    return cache.get(cache_key)
+
+
+def store(cache_key: Hashable, value) -> None:
+    cache.set(cache_key, value)
+
+
+def invalidate_on_commit(db: AsyncSession) -> None:
+    """
+    Bumps the version once db commits, a rollback cancels it. Call it alongside the change:
+    bumping before the commit would let a request in between cache the old rows under the new version.
+    """
+    db.info['catalog_changed'] = True
+
+
+def bump() -> None:
+    global version
+    version += 1
+    # the next fills of this version read the primary until the replicas have the change, see get_catalog_db
+    database.mark_sticky(database.CATALOG_STICKY_KEY)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session: Session) -> None:
+    if session.info.pop('catalog_changed', False):
+        bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session: Session) -> None:
+    session.info.pop('catalog_changed', None)
+
+
+def get_catalog_cache_stats() -> dict:
+    return {**cache.stats(), "version": version}
@@ -0,0 +1,34 @@
+import hashlib
+from fastapi import Response, status
+from core.settings import settings
+
+# shared caches may keep the catalog, it is the same for everyone; per-user pages stay in the browser
+# and are revalidated on every use, a 304 then costs a version lookup instead of the whole page
+PUBLIC = f'public, max-age={settings.CATALOG_MAX_AGE}'
+PRIVATE = 'private, no-cache'
+
+
+def etag(*parts) -> str:
+    """A strong ETag for the representation identified by parts: response bytes, or ids and versions"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(b'\0')
+    return f'"{digest.hexdigest()}"'
+
+
+def matches(if_none_match: str | None, current: str) -> bool:
+    """If-None-Match names the current ETag (or is *), compared weakly as RFC 9110 asks for this header"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == current for tag in if_none_match.split(','))
+
+
+def headers(current: str, cache_control: str) -> dict[str, str]:
+    return {'ETag': current, 'Cache-Control': cache_control}
+
+
+def not_modified(response_headers: dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
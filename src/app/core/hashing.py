@@ -1,6 +1,42 @@
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from core.offload import PoolFull, WorkerPool
+from core.settings import settings
 
-pass_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+def build_context(
+        schemes: str = settings.PASSWORD_SCHEMES,
+        bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+        argon2_time_cost: int = settings.ARGON2_TIME_COST,
+        argon2_memory_cost: int = settings.ARGON2_MEMORY_COST,
+        argon2_parallelism: int = settings.ARGON2_PARALLELISM,
+) -> CryptContext:
+    """
+    The password policy: new hashes use the first scheme at the configured cost.
+    A hash of another scheme, or of the same scheme at another cost, verifies but needs an update.
+    """
+    schemes = [scheme.strip() for scheme in schemes.split(',') if scheme.strip()]
+    # min = max = default, so lowering the cost downgrades old hashes just like raising it upgrades them
+    costs = {
+        'bcrypt': {'rounds': bcrypt_rounds},
+        'argon2': {'rounds': argon2_time_cost, 'memory_cost': argon2_memory_cost,
+                   'parallelism': argon2_parallelism},
+    }
+    options = {}
+    for scheme in schemes:
+        for key, value in costs.get(scheme, {}).items():
+            options[f'{scheme}__{key}'] = value
+            if key == 'rounds':
+                options[f'{scheme}__min_rounds'] = options[f'{scheme}__max_rounds'] = value
+
+    return CryptContext(schemes=schemes, deprecated='auto', **options)
+
+
+pass_context = build_context()
+
+# bcrypt takes tens of ms of CPU per call, on the event loop that stalls every other request of the worker
+pool = WorkerPool('hashing', settings.HASH_POOL_SIZE, kind=settings.HASH_POOL_KIND,
+                  max_pending=settings.HASH_MAX_PENDING)
 
 
 def hash_pass(password: str) -> str:
@@ -9,3 +45,62 @@ def hash_pass(password: str) -> str:
 
 def verify_password(plain_password, hashed_password) -> bool:
     return pass_context.verify(plain_password, hashed_password)
+
+
+# verified against when the email is unknown, so those logins cost as much as a wrong password
+DUMMY_PASSWORD = 'not a password of anyone'
+_dummy_hash: str | None = None
+
+
+async def _run(func, *args):
+    try:
+        return await pool.run(func, *args)
+    except PoolFull:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many logins in progress, try again", headers={"Retry-After": "1"})
+
+
+async def hash_pass_async(password: str) -> str:
+    """hash_pass on the hashing pool"""
+    return await _run(hash_pass, password)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password on the hashing pool"""
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_async(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """
+    (valid, new hash), the verification and the rehash as two calls on the hashing pool.
+    The new hash is only made when the password is valid and its hash is outdated, see rehash_async.
+    """
+    if not await verify_password_async(plain_password, hashed_password):
+        return False, None
+    return True, await rehash_async(plain_password, hashed_password)
+
+
+async def rehash_async(plain_password, hashed_password) -> str | None:
+    """
+    A hash under the current policy when hashed_password is outdated, made on the hashing pool.
+    The upgrade is best effort: with the pool full it is skipped instead of failing a valid login, the next one retries.
+    """
+    if not pass_context.needs_update(hashed_password):
+        return None
+    try:
+        return await pool.run(hash_pass, plain_password)
+    except PoolFull:
+        return None
+
+
+async def get_dummy_hash() -> str:
+    """A hash made once per process under the current policy, by the lifespan before the app serves"""
+    global _dummy_hash
+
+    if _dummy_hash is None:
+        _dummy_hash = await hash_pass_async(DUMMY_PASSWORD)
+    return _dummy_hash
+
+
+def get_hashing_stats() -> dict:
+    return pool.stats()
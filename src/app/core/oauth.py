@@ -1,58 +1,78 @@
 from fastapi import HTTPException, Depends, status
 from typing import Annotated
 from core.security import verify_token_access, oauth2_scheme, TokenData
-from crud.crud_user import exists
-from db.models import Account, Role, Student, Teacher, Admin
-from db.database import get_db
-from sqlalchemy.orm import Session
-from db.models import Account
+from crud import crud_user
+from db.models import Course, Role, Student, Teacher, Admin
+from db.database import get_db, release_connection
+from core import principal_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+# Collections a route can have loaded together with its principal instead of querying them again itself.
+# Active enrollments, only the columns the enrollment checks and the rating response read.
+ENROLLED_COURSES = selectinload(Student.courses_enrolled).load_only(
+    Course.course_id, Course.title, Course.is_premium, raiseload=True)
 
 
 async def get_admin_required(
-        db: Annotated[Session, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
+        db: Annotated[AsyncSession, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
 ) -> Admin:
-    user = await get_current_user(db, token)
-    if not user.role == Role.admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Admin required")
-    return user.admin
+    return await get_principal(db, token, Role.admin)
 
 
 async def get_teacher_required(
-        db: Annotated[Session, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
+        db: Annotated[AsyncSession, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
 ) -> Teacher:
-    user = await get_current_user(db, token)
-    if not user.role == Role.teacher:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Teacher required")
-    return user.teacher
+    return await get_principal(db, token, Role.teacher)
 
 
 async def get_student_required(
-        db: Annotated[Session, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
+        db: Annotated[AsyncSession, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
 ) -> Student:
-    user: Account = await get_current_user(db, token)
-    if not user.role == Role.student:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Student required")
-    return user.student
+    return await get_principal(db, token, Role.student)
 
 
-async def get_current_user(db: Session, token) -> Account:
+async def get_student_with_enrollments(
+        db: Annotated[AsyncSession, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
+) -> Student:
+    return await get_principal(db, token, Role.student, loaders=(ENROLLED_COURSES,))
+
+
+async def get_principal(db: AsyncSession, token, role: Role, loaders=()) -> Admin | Teacher | Student:
+    """
+    The role row of the token's user with its account attached.
+    The role claim picks the table up front, a token of another role is rejected before any db work.
+    """
     token_data = await verify_token_access(token)
 
     if not isinstance(token_data, TokenData):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=token_data)
 
-    user = await exists(db=db, email=token_data.email)
+    if token_data.role != role.value:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail=f"{role.value.capitalize()} required")
+
+    user = principal_cache.load(db, token_data.email)
+    if user is not None:
+        role_row = getattr(user, role.value)
+        if role_row is not None and loaders:
+            await crud_user.load_principal_collections(db, role_row, loaders)
+            await release_connection(db)
+    else:
+        role_row = await crud_user.get_principal(db, token_data.email, role, loaders)
+        # the route may not need the primary again (replica reads, early validation errors), don't hold its connection
+        await release_connection(db)
+        if role_row:
+            principal_cache.store(role_row.account)
 
-    if not user:
+    if not role_row:
         raise HTTPException(status_code=404, detail="No such user")
 
-    return user
+    return role_row
 
 
 AdminAuthDep = Annotated[Admin, Depends(get_admin_required)]
 TeacherAuthDep = Annotated[Teacher, Depends(get_teacher_required)]
 StudentAuthDep = Annotated[Student, Depends(get_student_required)]
+StudentEnrollmentsAuthDep = Annotated[Student, Depends(get_student_with_enrollments)]
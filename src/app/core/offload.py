@@ -0,0 +1,140 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, wraps
+from threading import Lock
+from core.settings import settings
+
+
+class PoolFull(RuntimeError):
+    """The pool already has max_pending calls submitted, the caller should back off"""
+
+
+def _timed(func) -> tuple:
+    # runs in the worker (thread or process): perf_counter is the system-wide monotonic clock,
+    # so the caller can compare started_at with its own submit time
+    started_at = time.perf_counter()
+    return func(), started_at, time.perf_counter() - started_at
+
+
+class WorkerPool:
+    """
+    A lazily created, bounded executor for blocking work plus its stats.
+    kind 'process' runs the calls in worker processes (func and args must be picklable),
+    max_pending > 0 rejects submissions with PoolFull once that many calls are queued or running.
+    """
+
+    def __init__(self, name: str, size: int, kind: str = 'thread', max_pending: int = 0):
+        self.name = name
+        self.size = int(size)
+        self.kind = kind
+        self.max_pending = int(max_pending)
+        self.executor: Executor | None = None
+        self._lock = Lock()
+        self._stats = {}
+        self.reset_stats()
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.kind == 'process':
+                # no fork of a process that already runs an event loop and threads
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.size, mp_context=multiprocessing.get_context(method))
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=self.name)
+        return self.executor
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.executor = None
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking callable on the pool and awaits its result"""
+        with self._lock:
+            if self.max_pending and self._stats["submitted"] - self._stats["completed"] >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise PoolFull(f'{self.name} pool has {self.max_pending} calls pending')
+            self._stats["submitted"] += 1
+
+        submitted_at = time.perf_counter()
+        call = partial(_timed, partial(func, *args, **kwargs))
+        try:
+            result, started_at, run = await asyncio.get_running_loop().run_in_executor(self.get_executor(), call)
+        except BaseException:
+            with self._lock:
+                self._stats["completed"] += 1
+                self._stats["failed"] += 1
+            raise
+
+        wait = max(started_at - submitted_at, 0.0)
+        with self._lock:
+            self._stats["completed"] += 1
+            self._stats["wait_total"] += wait
+            self._stats["wait_max"] = max(self._stats["wait_max"], wait)
+            self._stats["run_total"] += run
+            self._stats["latency_max"] = max(self._stats["latency_max"], wait + run)
+        return result
+
+    def stats(self) -> dict:
+        """Pool size, in-flight and queued calls, and queue-wait/run times (seconds)"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        completed = stats["completed"]
+        succeeded = completed - stats["failed"]
+        stats["kind"] = self.kind
+        stats["pool_size"] = self.size
+        stats["max_pending"] = self.max_pending
+        stats["in_flight"] = stats["submitted"] - completed
+        stats["queued"] = max(stats["in_flight"] - self.size, 0)
+        stats["wait_avg"] = stats["wait_total"] / succeeded if succeeded else 0.0
+        stats["run_avg"] = stats["run_total"] / succeeded if succeeded else 0.0
+
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.update(
+                submitted=0, completed=0, failed=0, rejected=0,
+                wait_total=0.0, wait_max=0.0, run_total=0.0, latency_max=0.0,
+            )
+
+
+# Bounded pool for the blocking work that is still left inside request handlers
+# (mail HTTP calls, image resizing, report building). Sized like the DB pool by default,
+# so a burst of offloaded calls cannot outnumber the connections the requests are holding.
+pool = WorkerPool('offload', settings.OFFLOAD_POOL_SIZE)
+
+
+def get_executor() -> Executor:
+    return pool.get_executor()
+
+
+def shutdown_executor() -> None:
+    pool.shutdown()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Runs a blocking callable on the offload pool and awaits its result"""
+    return await pool.run(func, *args, **kwargs)
+
+
+def offloaded(func):
+    """Turns a blocking function into a coroutine function that runs it on the offload pool"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_pool(func, *args, **kwargs)
+
+    return wrapper
+
+
+def get_offload_stats() -> dict:
+    """Pool size, in-flight calls and queue-wait/run times (seconds) of the offload pool"""
+    return pool.stats()
+
+
+def reset_offload_stats() -> None:
+    pool.reset_stats()
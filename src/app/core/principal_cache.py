@@ -0,0 +1,72 @@
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from core.cache import TTLCache
+from core.settings import settings
+from db.models import Account, Role, ROLE_MODELS
+
+# email -> column snapshot of an active account and its role row, so authenticated requests skip the accounts query.
+# Per process: crud invalidates its own worker's entry on every write to these rows,
+# other workers pick the change up within PRINCIPAL_CACHE_TTL.
+cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+# blobs stay out of memory, nothing reads them from the principal
+EXCLUDED_COLUMNS = {'profile_picture'}
+
+
+def _columns(obj) -> dict:
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in inspect(type(obj)).column_attrs
+        if attr.key not in EXCLUDED_COLUMNS
+    }
+
+
+def _detached(model, values: dict):
+    obj = model(**values)
+    # a detached "already loaded" instance: no history, so attaching it emits no SQL
+    make_transient_to_detached(obj)
+    return obj
+
+
+def store(user: Account) -> None:
+    role = Role(user.role)
+    role_row = getattr(user, role.value)
+    if role_row is None or user.is_deactivated:
+        return
+
+    cache.set(user.email, {
+        "account_id": user.account_id,
+        "role": role,
+        "is_deactivated": user.is_deactivated,
+        "role_pk": inspect(role_row).identity[0],
+        "account": _columns(user),
+        "role_row": _columns(role_row),
+    })
+
+
+def load(db: AsyncSession, email: str) -> Account | None:
+    """The cached account, attached to db together with its role row, or None on a miss"""
+    entry = cache.get(email)
+    if entry is None or entry["is_deactivated"]:
+        return None
+
+    role = entry["role"]
+    user = _detached(Account, entry["account"])
+    role_row = _detached(ROLE_MODELS[role], entry["role_row"])
+
+    for other in Role:
+        set_committed_value(user, other.value, role_row if other == role else None)
+    set_committed_value(role_row, 'account', user)
+
+    db.add(user)
+    return user
+
+
+def invalidate(email: str) -> None:
+    cache.pop(email)
+
+
+def get_principal_cache_stats() -> dict:
+    return cache.stats()
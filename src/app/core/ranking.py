@@ -0,0 +1,20 @@
+from core.settings import settings
+
+
+def rank_score(rating: float | None, people_rated: int | None) -> float:
+    """
+    Catalog order of a course: the Bayesian average of its ratings, as if CATALOG_RANK_PRIOR_VOTES more students
+    had rated it CATALOG_RANK_PRIOR_MEAN. A single 10 lifts a course only part of the way, a course rated
+    well by many keeps its place and an unrated course sits at the prior mean.
+    """
+    votes = people_rated or 0
+    prior_votes = settings.CATALOG_RANK_PRIOR_VOTES
+    if not prior_votes + votes:
+        return 0.0
+    return (prior_votes * settings.CATALOG_RANK_PRIOR_MEAN + (rating or 0) * votes) / (prior_votes + votes)
+
+
+def default_rank_score(context) -> float:
+    """Column default of Course.rank_score: the score of the rating and people_rated the course is inserted with"""
+    params = context.get_current_parameters()
+    return rank_score(params.get('rating'), params.get('people_rated'))
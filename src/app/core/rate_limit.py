@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict, deque
+from typing import Hashable
+from fastapi import HTTPException, status
+from core.settings import settings
+
+
+class SlidingWindowLimiter:
+    """
+    At most `limit` attempts per key in any `window` seconds, tracked in process.
+    Memory is bounded: a key keeps at most `limit` timestamps and only the `max_keys`
+    most recently used keys are tracked. Meant for the event loop thread, no locking.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int):
+        self.limit = int(limit)
+        self.window = float(window)
+        self.max_keys = int(max_keys)
+        self.rejected = 0
+        self._attempts: OrderedDict[Hashable, deque[float]] = OrderedDict()
+
+    def retry_after(self, key: Hashable) -> float:
+        """Seconds until key may try again, 0 when it may try now"""
+        if self.limit <= 0:
+            return 0.0
+
+        attempts = self._attempts.get(key)
+        if attempts is None or len(attempts) < self.limit:
+            return 0.0
+        return max(attempts[0] + self.window - time.monotonic(), 0.0)
+
+    def hit(self, key: Hashable) -> None:
+        if self.limit <= 0:
+            return
+
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = self._attempts[key] = deque(maxlen=self.limit)
+        attempts.append(time.monotonic())
+
+        self._attempts.move_to_end(key)
+        while len(self._attempts) > self.max_keys:
+            self._attempts.popitem(last=False)
+
+    def reset(self, key: Hashable) -> None:
+        self._attempts.pop(key, None)
+
+    def clear(self) -> None:
+        self._attempts.clear()
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {"keys": len(self._attempts), "limit": self.limit, "window": self.window, "rejected": self.rejected}
+
+
+# Per worker, so the effective limit is the configured one times the number of workers.
+# Behind a proxy the client ip is only right with uvicorn --proxy-headers (X-Forwarded-For).
+ip_limiter = SlidingWindowLimiter(
+    settings.LOGIN_LIMIT_PER_IP, settings.LOGIN_LIMIT_WINDOW, settings.LOGIN_LIMIT_MAX_KEYS)
+username_limiter = SlidingWindowLimiter(
+    settings.LOGIN_LIMIT_PER_USERNAME, settings.LOGIN_LIMIT_WINDOW, settings.LOGIN_LIMIT_MAX_KEYS)
+
+
+def check_login_attempt(ip: str, username: str) -> None:
+    """Counts a login attempt, 429 when the ip or the username is over its limit"""
+    username = username.strip().lower()
+
+    for limiter, key in ((ip_limiter, ip), (username_limiter, username)):
+        wait = limiter.retry_after(key)
+        if wait:
+            limiter.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(int(wait) + 1)},
+            )
+
+    ip_limiter.hit(ip)
+    username_limiter.hit(username)
+
+
+def login_succeeded(username: str) -> None:
+    """A successful login clears the username's failures, the owner is not locked out by their own typos"""
+    username_limiter.reset(username.strip().lower())
+
+
+def get_login_limit_stats() -> dict:
+    return {"ip": ip_limiter.stats(), "username": username_limiter.stats()}
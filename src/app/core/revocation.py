@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from db.models import Account, TokenRevocation
+
+logger = logging.getLogger('poodle.revocation')
+
+# email -> unix millisecond before which that account's tokens are revoked, mirrored from token_revocations.
+# One entry per account that ever revoked, so a check is a dict probe and memory is bounded by the accounts.
+revoked_before: dict[str, int] = {}
+
+
+def is_revoked(email: str, issued_at: float | None) -> bool:
+    """issued_at is the token's `iat` in seconds, tokens without one predate revocation and are covered by any"""
+    cutoff = revoked_before.get(email)
+    return cutoff is not None and round((issued_at or 0) * 1000) < cutoff
+
+
+async def revoke(db: AsyncSession, account: Account) -> None:
+    """
+    Revokes every token of account issued before now, persisted by the caller's commit.
+    The mirror follows on that commit, a rollback leaves the tokens valid here as everywhere else.
+    """
+    cutoff = int(time.time() * 1000)
+    await db.merge(TokenRevocation(account_id=account.account_id, revoked_before=cutoff))
+    pending = db.info.setdefault('revoked_before', {})
+    pending[account.email] = max(pending.get(account.email, 0), cutoff)
+
+
+def _advance(cutoffs: dict[str, int]) -> None:
+    # cutoffs only move forward, see load
+    for email, cutoff in cutoffs.items():
+        revoked_before[email] = max(revoked_before.get(email, 0), cutoff)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session: Session) -> None:
+    _advance(session.info.pop('revoked_before', {}))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session: Session) -> None:
+    session.info.pop('revoked_before', None)
+
+
+async def load(db: AsyncSession) -> int:
+    """Merges the table into the in-memory mirror, picking up the revocations of other workers"""
+    rows = (await db.execute(
+        select(Account.email, TokenRevocation.revoked_before)
+        .join(Account, Account.account_id == TokenRevocation.account_id))).all()
+
+    # cutoffs only move forward, keep a local revocation whose commit this read did not see yet
+    _advance(dict(rows))
+    return len(rows)
+
+
+async def load_on_startup(session_factory) -> int:
+    """
+    The first load, awaited before the app serves whatever TOKEN_REVOCATION_REFRESH is: with an empty mirror
+    every token revoked before the restart would pass again. A failure stops the startup instead.
+    """
+    async with session_factory() as db:
+        return await load(db)
+
+
+async def keep_in_sync(session_factory, interval: float) -> None:
+    """Reloads the table every interval seconds, after the startup load, until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await load(db)
+        except Exception:
+            # keep the last mirror, the next round retries
+            logger.exception('loading token revocations failed')
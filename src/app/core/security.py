@@ -1,17 +1,27 @@
+import hashlib
+import time
 from pydantic import BaseModel
 from typing import Union
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, timezone
 from jose import jwt, JWTError, ExpiredSignatureError
 from fastapi.security import OAuth2PasswordBearer
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from core import revocation
+from core.cache import TTLCache
+from core.settings import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 oauth2_scheme_optional = OAuth2PasswordBearer(
     tokenUrl="/login", auto_error=False)
 
+SIGNING_KEY = settings.AUTH_SECRET_KEY
+VERIFYING_KEY = settings.AUTH_PUBLIC_KEY or settings.AUTH_SECRET_KEY
+ALGORITHMS = [settings.ALGORITHM]
+
+# sha256 of a verified token -> (its TokenData, its iat), each entry expires with the token.
+# A token in here skips the signature check, tokens are never cached before they verified.
+# Revocation is checked on every call, cached or not.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=0)
+
 
 class Token(BaseModel):
     access_token: str
@@ -25,36 +35,58 @@ class TokenData(BaseModel):
 
 async def create_access_token(data: TokenData) -> Token:
     to_encode = dict(data)
-    expire = datetime.now() + \
-        timedelta(days=int(os.environ['ACCESS_TOKEN_EXPIRE_DAYS']))
-    to_encode.update({"expire": expire.strftime("%Y-%m-%d %H:%M:%S")})
+    expire = datetime.now(timezone.utc) + timedelta(days=settings.ACCESS_TOKEN_EXPIRE_DAYS)
+    # iat with millisecond precision, rounded down: a revocation must cover every token issued before it
+    # and no login made right after it
+    to_encode.update({"exp": int(expire.timestamp()), "iat": int(time.time() * 1000) / 1000})
 
-    encoded_jwt = jwt.encode(to_encode, os.environ['AUTH_SECRET_KEY'],
-                             os.environ['ALGORITHM'])
+    encoded_jwt = jwt.encode(to_encode, SIGNING_KEY, settings.ALGORITHM)
     return Token(access_token=encoded_jwt, token_type='bearer')
 
 
-async def is_token_exp_valid(exp: str) -> bool:
-    exp_datetime = datetime.strptime(exp, '%Y-%m-%d %H:%M:%S')
-    return exp_datetime > datetime.now()
+def _expires_at(payload: dict) -> float | None:
+    if "exp" in payload:
+        return float(payload["exp"])
+    # tokens issued before the switch to `exp` carry a local-time string, honoured until they run out
+    if "expire" in payload:
+        return datetime.strptime(payload["expire"], '%Y-%m-%d %H:%M:%S').timestamp()
 
 
 async def verify_token_access(token: str) -> Union[TokenData, str]:
-    try:
-        payload = jwt.decode(
-            token, os.environ['AUTH_SECRET_KEY'], algorithms=os.environ['ALGORITHM'])
-        email: str = payload.get("email")
-        role: str = payload.get("role")
-        exp_at: str = payload.get("expire")
+    key = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        token_data, issued_at = cached
+        if revocation.is_revoked(token_data.email, issued_at):
+            token_cache.pop(key)
+            return "Token has been revoked. Please log in again"
+        return token_data
 
-        if not await is_token_exp_valid(exp_at):
+    try:
+        # jose checks `exp` itself when the claim is present
+        payload = jwt.decode(token, VERIFYING_KEY, algorithms=ALGORITHMS)
+        expires_at = _expires_at(payload)
+        if expires_at is None:
+            raise JWTError('token without expiry')
+        ttl = expires_at - time.time()
+        if ttl <= 0:
             raise ExpiredSignatureError()
 
-        token_data = TokenData(email=email, role=role)
-        return token_data
+        token_data = TokenData(email=payload.get("email"), role=payload.get("role"))
+        issued_at = payload.get("iat")
 
     except ExpiredSignatureError:
         return "Token has expired. Please log in again"
 
-    except JWTError:
+    except (JWTError, ValueError):
         return "Invalid token"
+
+    if revocation.is_revoked(token_data.email, issued_at):
+        return "Token has been revoked. Please log in again"
+
+    token_cache.set(key, (token_data, issued_at), ttl=ttl)
+    return token_data
+
+
+def get_token_cache_stats() -> dict:
+    return token_cache.stats()
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from fastapi import Request
+from sqlalchemy import event, Engine
+from core.settings import settings
+
+
+logger = logging.getLogger('poodle.sql')
+
+# one RequestQueries per http request, filled by the cursor hooks of every engine (primary, replicas, tests)
+current_queries: ContextVar['RequestQueries | None'] = ContextVar('current_queries', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+# expanded IN lists: (?, ?, ?) -> (?) so a batch of any size has one fingerprint
+_PLACEHOLDER_LIST = re.compile(r'\(\s*' + _PLACEHOLDER + r'(?:\s*,\s*' + _PLACEHOLDER + r')*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def fingerprint(statement: str) -> str:
+    """The statement with whitespace, literals and IN list lengths normalized away"""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _NUMBER.sub('?', statement)
+    return _PLACEHOLDER_LIST.sub('(?)', statement)
+
+
+class RequestQueries:
+    __slots__ = ('count', 'duration', 'fingerprints')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        return {sql: count for sql, count in self.fingerprints.most_common() if count >= threshold}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_queries.get() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = current_queries.get()
+    if queries is not None and conn.info.get('query_start'):
+        queries.record(statement, time.perf_counter() - conn.info['query_start'].pop())
+
+
+def _short_id(sql: str) -> str:
+    return hashlib.sha1(sql.encode()).hexdigest()[:8]
+
+
+async def sql_instrumentation_middleware(request: Request, call_next):
+    """
+    Counts and times the SQL each request runs.
+    Adds a `Server-Timing: db` header, logs one structured line per request and,
+    in debug mode, warns about statements repeated often enough to look like an N+1.
+    """
+    queries = RequestQueries()
+    token = current_queries.set(queries)
+    try:
+        response = await call_next(request)
+    finally:
+        current_queries.reset(token)
+
+    db_ms = queries.duration * 1000
+    response.headers.append('Server-Timing', f'db;dur={db_ms:.2f};desc="{queries.count} queries"')
+
+    if queries.count:
+        route = request.scope.get('route')
+        path = getattr(route, 'path', request.url.path)
+        repeated = queries.repeated(threshold=2)
+
+        logger.info(json.dumps({
+            "event": "sql",
+            "method": request.method,
+            "route": path,
+            "status": response.status_code,
+            "queries": queries.count,
+            "db_ms": round(db_ms, 2),
+            "repeated": {_short_id(sql): count for sql, count in repeated.items()},
+        }))
+
+        if settings.DEBUG:
+            for sql, count in repeated.items():
+                if count >= settings.SQL_N_PLUS_ONE_THRESHOLD:
+                    logger.warning(json.dumps({
+                        "event": "n_plus_one",
+                        "method": request.method,
+                        "route": path,
+                        "count": count,
+                        "fingerprint": _short_id(sql),
+                        "statement": sql,
+                    }))
+
+    return response
@@ -0,0 +1,220 @@
+import asyncio
+import bisect
+import logging
+import time
+from array import array
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import CourseTag, Tag
+
+logger = logging.getLogger('poodle.tag_index')
+
+
+def to_ids(courses: int) -> list[int]:
+    """The course ids of a bitmap, ascending"""
+    bits = bin(courses)[:1:-1]  # bit i is character i
+    ids, i = [], bits.find('1')
+    while i != -1:
+        ids.append(i)
+        i = bits.find('1', i + 1)
+    return ids
+
+
+def to_bitmap(course_ids: list[int]) -> int:
+    """One pass over the ids into a byte buffer: OR-ing them into an int one by one copies it every time"""
+    buffer = bytearray(max(course_ids, default=0) // 8 + 1)
+    for course_id in course_ids:
+        buffer[course_id >> 3] |= 1 << (course_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def to_postings(course_ids) -> array | int:
+    """
+    The courses of one tag in whichever form is smaller: a sorted array of ids (4 bytes a course) while the tag
+    is sparse, a bitmap (max course_id / 8 bytes) once more than one course in 32 carries it.
+    """
+    ids = array('I', sorted(course_ids))
+    return to_bitmap(ids) if is_dense(ids) else ids
+
+
+def is_dense(ids: array) -> bool:
+    """A bitmap of the sorted ids would take fewer bytes than the ids themselves"""
+    return bool(ids) and len(ids) * ids.itemsize > ids[-1] // 8 + 1
+
+
+class TagIndex:
+    """
+    Tag -> the courses carrying it. Query results are bitmaps in a Python int (bit n set: course n matches),
+    so AND/OR over tags are & and | on machine words and a count is int.bit_count().
+    A tag is stored as a bitmap only when it is dense enough for one to be smaller than its id array
+    (see to_postings): a bitmap costs max course_id / 8 bytes, 125 KB for a million courses, however few carry it.
+
+    Built from courses_tags by load() and kept current by crud_tag on this worker. Other workers'
+    tag changes show up on the next load(). Until the first load the index is not `ready`
+    and callers filter in SQL instead.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.loaded_at: float | None = None
+        self._courses: dict[int, array | int] = {}  # tag_id -> sorted course ids or bitmap, see to_postings
+        self._names: dict[int, str] = {}  # tag_id -> name
+        self._by_name: dict[str, set[int]] = {}  # lowercased name -> tag_ids
+        self._sorted_names: list[str] = []  # lowercased names, for prefix lookups
+
+    def build(self, rows) -> None:
+        """Replaces the index with rows of (tag_id, name, course_id), course_id None for an unused tag"""
+        course_ids, names = {}, {}
+        for tag_id, name, course_id in rows:
+            names[tag_id] = name
+            ids = course_ids.setdefault(tag_id, [])
+            if course_id is not None:
+                ids.append(course_id)
+
+        courses = {tag_id: to_postings(ids) for tag_id, ids in course_ids.items()}
+        by_name = {}
+        for tag_id, name in names.items():
+            by_name.setdefault(name.lower(), set()).add(tag_id)
+
+        self._courses, self._names, self._by_name = courses, names, by_name
+        self._sorted_names = sorted(by_name)
+        self.ready, self.loaded_at = True, time.time()
+
+    def add(self, tag_id: int, name: str, course_id: int) -> None:
+        if tag_id not in self._names:
+            self._names[tag_id] = name
+            key = name.lower()
+            if key not in self._by_name:
+                bisect.insort(self._sorted_names, key)
+            self._by_name.setdefault(key, set()).add(tag_id)
+        courses = self._courses.get(tag_id, array('I'))
+        if isinstance(courses, int):
+            self._courses[tag_id] = courses | 1 << course_id
+            return
+
+        i = bisect.bisect_left(courses, course_id)
+        if i == len(courses) or courses[i] != course_id:
+            courses.insert(i, course_id)
+        # a tag turning dense becomes a bitmap, removals leave it one until the next load
+        self._courses[tag_id] = to_bitmap(courses) if is_dense(courses) else courses
+
+    def remove(self, tag_id: int, course_id: int) -> None:
+        courses = self._courses.get(tag_id)
+        if isinstance(courses, int):
+            self._courses[tag_id] = courses & ~(1 << course_id)
+        elif courses is not None:
+            i = bisect.bisect_left(courses, course_id)
+            if i < len(courses) and courses[i] == course_id:
+                del courses[i]
+
+    def drop(self, tag_id: int) -> None:
+        name = self._names.pop(tag_id, None)
+        self._courses.pop(tag_id, None)
+        if name is None:
+            return
+
+        key = name.lower()
+        tag_ids = self._by_name.get(key, set())
+        tag_ids.discard(tag_id)
+        if not tag_ids:
+            del self._by_name[key]
+            self._sorted_names.pop(bisect.bisect_left(self._sorted_names, key))
+
+    def tag_ids(self, term: str, prefix: bool = False, case_sensitive: bool = False) -> set[int]:
+        """Tags named term (or starting with it), ignoring case unless case_sensitive"""
+        key = term.lower()
+        if prefix:
+            start = bisect.bisect_left(self._sorted_names, key)
+            keys = []
+            for name in self._sorted_names[start:]:
+                if not name.startswith(key):
+                    break
+                keys.append(name)
+        else:
+            keys = [key]
+
+        found = {tag_id for name in keys for tag_id in self._by_name.get(name, ())}
+        if case_sensitive:
+            found = {tag_id for tag_id in found
+                     if (self._names[tag_id].startswith(term) if prefix else self._names[tag_id] == term)}
+        return found
+
+    def lookup(self, term: str, prefix: bool = False, case_sensitive: bool = False) -> int:
+        """Bitmap of the courses with any tag matching term"""
+        courses, sparse = 0, []
+        for tag_id in self.tag_ids(term, prefix, case_sensitive):
+            postings = self._courses[tag_id]
+            if isinstance(postings, int):
+                courses |= postings
+            else:
+                sparse.extend(postings)
+        return courses | to_bitmap(sparse) if sparse else courses
+
+    def match(self, terms: list[str], match_all: bool = True, case_sensitive: bool = False) -> int:
+        """Bitmap of the courses matching every term (match_all) or any of them, `term*` matches a prefix"""
+        courses = None
+        for term in terms:
+            bitmap = self.lookup(term.rstrip('*'), term.endswith('*'), case_sensitive)
+            if courses is None:
+                courses = bitmap
+            else:
+                courses = courses & bitmap if match_all else courses | bitmap
+        return courses or 0
+
+    def facets(self, courses: int | None = None) -> dict[str, int]:
+        """Courses per tag name, within the courses bitmap when given, tags with no course left out"""
+        counts, members = {}, None
+        for tag_id, postings in self._courses.items():
+            if courses is None:
+                count = postings.bit_count() if isinstance(postings, int) else len(postings)
+            elif isinstance(postings, int):
+                count = (postings & courses).bit_count()
+            else:
+                if members is None:
+                    members = set(to_ids(courses))
+                count = sum(course_id in members for course_id in postings)
+            if count:
+                name = self._names[tag_id]
+                counts[name] = counts.get(name, 0) + count
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "loaded_at": self.loaded_at,
+            "tags": len(self),
+            "bitmaps": sum(isinstance(postings, int) for postings in self._courses.values()),
+            "bytes": sum((postings.bit_length() + 7) // 8 if isinstance(postings, int)
+                         else len(postings) * postings.itemsize for postings in self._courses.values()),
+        }
+
+
+index = TagIndex()
+
+
+async def load(db: AsyncSession) -> int:
+    """Rebuilds the index from courses_tags, returns the number of tags"""
+    rows = await db.execute(
+        select(Tag.tag_id, Tag.name, CourseTag.course_id)
+        .outerjoin(CourseTag, CourseTag.tag_id == Tag.tag_id))
+    index.build(rows)
+    return len(index)
+
+
+async def keep_in_sync(session_factory, interval: float) -> None:
+    """Builds the index now and rebuilds it every interval seconds, until cancelled"""
+    while True:
+        try:
+            async with session_factory() as db:
+                await load(db)
+        except Exception:
+            # keep serving the last index, the next round retries
+            logger.exception('loading the tag index failed')
+        await asyncio.sleep(interval)
+
+
+def get_tag_index_stats() -> dict:
+    return index.stats()
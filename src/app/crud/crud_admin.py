@@ -1,39 +1,47 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import catalog_cache, principal_cache, revocation
 from db.models import Student, StudentCourse, Course, Teacher, StudentRating, Account
 
 
-async def remove_student_from_course(db: Session, student_id: int, course_id) -> bool:
-    query = (db.query(StudentCourse).filter(
+async def remove_student_from_course(db: AsyncSession, student_id: int, course_id) -> bool:
+    query = await db.scalar(select(StudentCourse).where(
         StudentCourse.student_id == student_id,
         StudentCourse.course_id == course_id
-    ).first())
+    ))
     
     if not query:
         return False
 
-    db.delete(query)
-    db.commit()
+    await db.delete(query)
+    await db.commit()
     
     return True
 
-async def hide_course(db: Session, course: Course) -> None:
+async def hide_course(db: AsyncSession, course: Course) -> None:
     course.is_hidden = True
-    db.commit()
-    db.refresh(course)
+    catalog_cache.invalidate_on_commit(db)
+    await db.commit()
+    await db.refresh(course)
 
 
-async def make_student_premium(db: Session, student: Student) -> None:
+async def make_student_premium(db: AsyncSession, student: Student) -> None:
     student.is_premium = True
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    principal_cache.invalidate(student.account.email)
+    await db.refresh(student)
 
 
-async def get_students_ratings_by_course_id(db: Session, course_id: int) -> list[StudentRating]:
-    query = (db.query(StudentRating).filter(StudentRating.course_id == course_id))
+async def get_students_ratings_by_course_id(db: AsyncSession, course_id: int) -> list[StudentRating]:
+    query = await db.scalars(select(StudentRating).where(StudentRating.course_id == course_id))
     return query.all()
 
 
-async def switch_user_activation(db: Session, user: Account):
+async def switch_user_activation(db: AsyncSession, user: Account):
     user.is_deactivated = not user.is_deactivated
-    db.commit()
-    db.refresh(user)
+    if user.is_deactivated:
+        # a later reactivation must not bring the old tokens back
+        await revocation.revoke(db, user)
+    await db.commit()
+    principal_cache.invalidate(user.email)
+    await db.refresh(user)
@@ -1,12 +1,19 @@
+import base64
+import json
 from fastapi import status, HTTPException
-from sqlalchemy.orm import Session
-from db.models import Course, Tag, StudentCourse
-from schemas.course import CourseInfo
+from sqlalchemy import Row, Select, String, cast, func, literal, null, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import catalog_cache, ranking, tag_index
+from core.settings import settings
+from db import search as full_text
+from db.functions import floor, split_list, string_agg
+from db.models import Course, CourseTag, Tag, StudentCourse, Teacher
+from schemas.course import CourseFacets, CourseInfo, OwnerFacet, RatingFacet, TagFacet
 from typing import List
 
 
-async def get_course_by_id(db: Session, course_id: int, auto_error=False) -> Course | None:
-    query = db.query(Course).filter(Course.course_id == course_id, Course.is_hidden == False).first()
+async def get_course_by_id(db: AsyncSession, course_id: int, auto_error=False) -> Course | None:
+    query = await db.scalar(select(Course).where(Course.course_id == course_id, Course.is_hidden == False))
 
     if query:
         return query
@@ -14,86 +21,337 @@ async def get_course_by_id(db: Session, course_id: int, auto_error=False) -> Cou
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No such course')
 
 
+async def get_course_version(db: AsyncSession, course_id: int) -> int | None:
+    """The version of a visible course, None if there is none: an ETag check without reading the row"""
+    return await db.scalar(select(Course.version).where(Course.course_id == course_id, Course.is_hidden == False))
+
+
+async def get_course_owner_and_version(db: AsyncSession, course_id: int) -> Row | None:
+    """(owner_id, version) of a visible course, None if there is none: an owner's ETag check without reading the row"""
+    return (await db.execute(select(Course.owner_id, Course.version)
+                             .where(Course.course_id == course_id, Course.is_hidden == False))).first()
+
+
 async def get_course_by_id_or_raise_404(db, course_id) -> Course | None:
     return await get_course_by_id(db, course_id, auto_error=True)
 
 
-async def get_all_courses(
-        db: Session,
-        pages: int,
-        items_per_page: int,
+# best ranked first (core/ranking.py), course_id makes the order total so a course never shows up on two pages
+CATALOG_ORDER = (Course.rank_score.desc(), Course.course_id.desc())
+
+
+def catalog_page(*filters) -> Select:
+    """
+    The courses of a listing, in catalog order, as ids only: callers add their joins, filters and pagination,
+    get_catalog turns the page into CourseInfo rows.
+    """
+    return select(Course.course_id, Course.rank_score).where(*filters).order_by(*CATALOG_ORDER)
+
+
+async def catalog_rows(db: AsyncSession, page: Select) -> list:
+    """
+    (title, description, is_premium, tag names, course_id, rank_score) of the courses in page, with their tags,
+    in one round trip. Only the listed columns are read, never home_page_picture.
+    A page with a `rank` column (search results) keeps the best ranked first.
+    """
+    page = page.subquery()
+    order = (page.c.rank_score.desc(), page.c.course_id.desc())
+    if 'rank' in page.c:
+        order = (page.c.rank.desc(), *order)
+    tags = (select(string_agg(Tag.name))
+            .join(CourseTag, CourseTag.tag_id == Tag.tag_id)
+            .where(CourseTag.course_id == page.c.course_id)
+            .scalar_subquery())
+
+    rows = await db.execute(
+        select(Course.title, Course.description, Course.is_premium, tags, page.c.course_id, page.c.rank_score)
+        .select_from(page)
+        .join(Course, Course.course_id == page.c.course_id)
+        .order_by(*order))
+    return rows.all()
+
+
+def to_course_info(rows) -> List[CourseInfo]:
+    return [CourseInfo.from_query(title, description, is_premium, split_list(tag_names))
+            for title, description, is_premium, tag_names, *_ in rows]
+
+
+async def get_catalog(db: AsyncSession, page: Select) -> List[CourseInfo]:
+    """CourseInfo rows of the courses in page, see catalog_rows"""
+    return to_course_info(await catalog_rows(db, page))
+
+
+def encode_cursor(rank_score: float, course_id: int) -> str:
+    """Opaque to clients: the catalog position (rank_score, course_id) of the last course they got"""
+    return base64.urlsafe_b64encode(json.dumps([rank_score, course_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank_score, course_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        rank_score = float(rank_score)
+        if not isinstance(course_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+    return rank_score, course_id
+
+
+def after_cursor(listing, cursor: tuple[float, int], limit: int) -> Select:
+    """
+    The next `limit` courses of listing after the cursor position, found by seeking in
+    ix_courses_is_hidden_rank_score instead of skipping rows, so a deep page costs what the first one does.
+    listing(*filters) builds the listing's page with extra filters.
+    """
+    rank_score, course_id = cursor
+    # rank_score <= r is the seekable range, the rest skips the r group's courses already served
+    return listing(Course.rank_score <= rank_score,
+                   or_(Course.rank_score < rank_score, Course.course_id < course_id)).limit(limit)
+
+
+def indexed_courses(tags: list[str], match_all: bool = True) -> int | None:
+    """Bitmap of the courses matching tags, None unless the tag index is loaded and they are few enough to list"""
+    tags = [tag for tag in tags or () if tag.rstrip('*')]
+    if not tags or not tag_index.index.ready:
+        return None
+    courses = tag_index.index.match(tags, match_all)
+    return courses if courses.bit_count() <= settings.TAG_INDEX_MAX_IDS else None
+
+
+def tags_filters(tags: list[str], match_all: bool = True) -> list:
+    """
+    Filters for the courses tagged with every one (match_all) or any of tags, ignoring case, `tag*` matches
+    a prefix. The tag index resolves them to course ids when it is loaded and they are few enough to list,
+    courses_tags does otherwise.
+    """
+    tags = [tag for tag in tags if tag.rstrip('*')]
+    if not tags:
+        return []
+
+    courses = indexed_courses(tags, match_all)
+    if courses is not None:
+        return [Course.course_id.in_(tag_index.to_ids(courses))]
+
+    name = func.lower(Tag.name)
+    conditions = [name.startswith(tag.rstrip('*').lower(), autoescape=True) if tag.endswith('*')
+                  else name == tag.lower() for tag in tags]
+    if match_all:
+        return [Course.tags.any(condition) for condition in conditions]
+    return [Course.tags.any(or_(*conditions))]
+
+
+def catalog_filters(
+        db: AsyncSession,
         tag: str = None,
         rating: float = None,
         name: str = None,
         teacher_id: int = None,
-        student_id: int = None,
-) -> List[CourseInfo]:
+        tags: list[str] = None,
+        match_all_tags: bool = True,
+        is_premium: bool = None,
+) -> list:
+    """
+    The WHERE of a catalog listing: visible courses matching the filters, shared by the pages and the facets.
+    tag and name go through the full-text index, each word matching as a word prefix of a tag name or of
+    the title. tags are exact tag names, see tags_filters.
+    """
     filters = [Course.is_hidden == False]
 
-    if tag:
-        filters.append(Course.tags.any(Tag.name.like(f"%{tag}%")))
+    for text, columns in ((tag, ('tags',)), (name, ('title',))):
+        found = full_text.matches(db, text, columns) if text else None
+        if found is not None:
+            filters.append(Course.course_id.in_(select(found.c.course_id)))
+    if tags:
+        filters.extend(tags_filters(tags, match_all_tags))
     if rating:
         filters.append(Course.rating >= rating)
-    if name:
-        filters.append(Course.title.like(f"%{name}%"))
     if teacher_id:
         filters.append(Course.owner_id == teacher_id)
+    if is_premium is not None:
+        filters.append(Course.is_premium == is_premium)
+    return filters
+
+
+async def get_courses_page(
+        db: AsyncSession,
+        pages: int = 1,
+        items_per_page: int = 5,
+        tag: str = None,
+        rating: float = None,
+        name: str = None,
+        teacher_id: int = None,
+        student_id: int = None,
+        cursor: str = None,
+        search: str = None,
+        tags: list[str] = None,
+        match_all_tags: bool = True,
+        is_premium: bool = None,
+) -> tuple[List[CourseInfo], str | None]:
+    """
+    A page of the catalog and the cursor of the page after it, None on the last page.
+    With a cursor the page starts right after it and `pages` is ignored, without one `pages`
+    picks the page by offset, which gets slower the deeper the page.
+    items_per_page is capped to CATALOG_MAX_PAGE_SIZE.
+
+    search goes through the full-text index, matching title, description, objectives and tags.
+    Search results come best ranked first and are paged by `pages` only.
+    The other filters are described in catalog_filters.
+    """
+    items_per_page = max(1, min(items_per_page, settings.CATALOG_MAX_PAGE_SIZE))
+    filters = catalog_filters(db, tag, rating, name, teacher_id, tags, match_all_tags, is_premium)
+
+    ranked = full_text.matches(db, search) if search else None
+    if ranked is not None and cursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Search results are paged by pages, not by cursor')
+
+    def listing(*extra) -> Select:
+        page = catalog_page(*filters, *extra)
+        if student_id:
+            page = page.join(StudentCourse, StudentCourse.course_id == Course.course_id) \
+                .where(StudentCourse.student_id == student_id)
+        if ranked is not None:
+            page = page.join(ranked, ranked.c.course_id == Course.course_id).add_columns(ranked.c.rank) \
+                .order_by(None).order_by(ranked.c.rank.desc(), *CATALOG_ORDER)
+        return page
+
+    # one row past the page tells whether there is a next one
+    if cursor:
+        page = after_cursor(listing, decode_cursor(cursor), items_per_page + 1)
+    else:
+        page = listing().offset((max(pages, 1) - 1) * items_per_page).limit(items_per_page + 1)
+
+    rows = await catalog_rows(db, page)
+    next_cursor = None
+    if len(rows) > items_per_page:
+        rows = rows[:items_per_page]
+        if ranked is None:
+            next_cursor = encode_cursor(rows[-1].rank_score, rows[-1].course_id)
+
+    return to_course_info(rows), next_cursor
+
 
-    if student_id:
-        filters.append(StudentCourse.student_id == student_id)
-        courses = (db.query(Course).join(StudentCourse, StudentCourse.course_id == Course.course_id)
-                   .filter(*filters).order_by(Course.rating.desc())
-                   .offset((pages - 1) * items_per_page)
-                   .limit(items_per_page).all())
+async def get_facets(db: AsyncSession, search: str = None, **filters) -> CourseFacets:
+    """
+    Counts of the courses matching the filters (see catalog_filters, search as in get_courses_page)
+    by premium/free, tag, whole rating point and owner, in one round trip: the matching courses are
+    read once into a CTE and each facet is a GROUP BY over it, glued by UNION ALL.
+    When the tag index resolves the tags filter the matching courses are few, their ids come back
+    instead of the tag GROUP BY and the index counts their tags.
+    """
+    matching = select(Course.course_id, Course.is_premium, Course.rating, Course.owner_id) \
+        .where(*catalog_filters(db, **filters))
+    found = full_text.matches(db, search) if search else None
+    if found is not None:
+        matching = matching.where(Course.course_id.in_(select(found.c.course_id)))
+    matching = matching.cte('matching')
+
+    # ratings are 1-10, each bucket is a whole rating point: r <= rating < r + 1
+    bucket = floor(matching.c.rating)
+    owner_names = Teacher.first_name + ' ' + Teacher.last_name
+    count = func.count().label('count')
+    indexed = indexed_courses(filters.get('tags'), filters.get('match_all_tags', True))
+    if indexed is None:
+        tag_counts = (select(literal('tag'), Tag.name, cast(null(), String), count)
+                      .select_from(matching)
+                      .join(CourseTag, CourseTag.course_id == matching.c.course_id)
+                      .join(Tag, Tag.tag_id == CourseTag.tag_id)
+                      .group_by(Tag.name))
     else:
-        courses = (db.query(Course)
-                   .filter(*filters).order_by(Course.rating.desc())
-                   .offset((pages - 1) * items_per_page)
-                   .limit(items_per_page).all())
+        # at most TAG_INDEX_MAX_IDS rows
+        tag_counts = select(literal('course'), cast(matching.c.course_id, String), cast(null(), String), literal(1))
+    rows = await db.execute(union_all(
+        select(literal('premium'), cast(matching.c.is_premium, String), cast(null(), String), count)
+        .group_by(matching.c.is_premium),
+        select(literal('rating'), cast(bucket, String), cast(null(), String), count)
+        .group_by(bucket),
+        select(literal('owner'), cast(matching.c.owner_id, String), owner_names, count)
+        .join(Teacher, Teacher.teacher_id == matching.c.owner_id)
+        .group_by(matching.c.owner_id, Teacher.first_name, Teacher.last_name),
+        tag_counts,
+    ))
 
-    courses_list: List[CourseInfo] = []
+    facets = CourseFacets(total=0, premium=0, free=0)
+    course_ids = []
+    for facet, key, label, count in rows:
+        if facet == 'premium':
+            premium = key not in (None, '0', 'false')
+            facets.total += count
+            facets.premium += count if premium else 0
+            facets.free += 0 if premium else count
+        elif facet == 'rating':
+            facets.ratings.append(RatingFacet(rating=None if key is None else int(key), count=count))
+        elif facet == 'owner':
+            facets.owners.append(OwnerFacet(teacher_id=int(key), owner_names=label, count=count))
+        elif facet == 'course':
+            course_ids.append(int(key))
+        else:
+            facets.tags.append(TagFacet(tag=key, count=count))
+    if indexed is not None:
+        facets.tags = [TagFacet(tag=tag, count=count)
+                       for tag, count in tag_index.index.facets(tag_index.to_bitmap(course_ids)).items()]
 
-    for course in courses:
-        # todo refactor n+1 with group concat
-        tags = await get_course_tags(course)
-        response_model = CourseInfo.from_query(
-            *(course.title, course.description, course.is_premium, tags))
-        courses_list.append(response_model)
-    return courses_list
+    facets.tags.sort(key=lambda f: (-f.count, f.tag))
+    facets.owners.sort(key=lambda f: (-f.count, f.teacher_id))
+    # best first, unrated last
+    facets.ratings.sort(key=lambda f: (f.rating is None, -(f.rating or 0)))
+    return facets
 
 
-async def get_course_tags(course: Course) -> list[str]:
-    return [tag.name for tag in course.tags]
+async def get_all_courses(
+        db: AsyncSession,
+        pages: int,
+        items_per_page: int,
+        tag: str = None,
+        rating: float = None,
+        name: str = None,
+        teacher_id: int = None,
+        student_id: int = None,
+) -> List[CourseInfo]:
+    courses, _ = await get_courses_page(
+        db, pages=pages, items_per_page=items_per_page, tag=tag, rating=rating, name=name,
+        teacher_id=teacher_id, student_id=student_id)
+    return courses
 
 
 async def get_course_common_info(db, course_id) -> Course | None:
-    course = db.query(Course).filter(Course.is_hidden == False, Course.course_id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.is_hidden == False, Course.course_id == course_id))
 
     if course:
         return course
 
 
-async def course_exists(db: Session, title: str) -> bool:
-    query = db.query(Course).filter(Course.title == title).first()
+async def course_exists(db: AsyncSession, title: str) -> bool:
+    query = await db.scalar(select(Course.course_id).where(Course.title == title))
 
     return query is not None
 
 
-async def update_rating(db: Session, course_id, new_st_rating, old_st_rating=None) -> None:
-    course = db.query(Course).where(Course.course_id == course_id).first()
+async def update_rating(db: AsyncSession, course_id, new_st_rating, old_st_rating=None) -> None:
+    course = await db.scalar(select(Course).where(Course.course_id == course_id))
+    catalog_cache.invalidate_on_commit(db)
 
     if old_st_rating:
         course.rating = (course.rating * course.people_rated - old_st_rating + new_st_rating) / course.people_rated
-        return
-
-    if not course.rating:
-        course.rating = new_st_rating
     else:
-        course.rating = (course.rating * course.people_rated + new_st_rating) / (course.people_rated + 1)
+        if not course.rating:
+            course.rating = new_st_rating
+        else:
+            course.rating = (course.rating * course.people_rated + new_st_rating) / (course.people_rated + 1)
+
+        course.people_rated += 1
 
-    course.people_rated += 1
+    course.rank_score = ranking.rank_score(course.rating, course.people_rated)
+
+
+async def has_students(db: AsyncSession, course_id: int) -> bool:
+    query = await db.scalar(select(StudentCourse.student_id).where(StudentCourse.course_id == course_id).limit(1))
+
+    return query is not None
 
 
-async def hide_course(db: Session, course: Course) -> None:
+async def hide_course(db: AsyncSession, course: Course) -> None:
     course.is_hidden = True
-    db.commit()
+    catalog_cache.invalidate_on_commit(db)
+    await db.commit()
@@ -1,18 +1,19 @@
+from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.models import Section, StudentSection
 from schemas.section import SectionBase, SectionUpdate
 from typing import List
 
 
 async def get_section_by_id(db, section_id) -> Section:
-    section = db.query(Section).filter(Section.section_id == section_id).first()
+    section = await db.scalar(select(Section).where(Section.section_id == section_id))
 
     if section:
         return section
 
 
-async def create_sections(db: Session, sections: List[SectionBase], course_id: int) -> List[SectionBase]:
+async def create_sections(db: AsyncSession, sections: List[SectionBase], course_id: int) -> List[SectionBase]:
     created_sections = []
     for section in sections:
         section_db = Section(
@@ -23,7 +24,7 @@ async def create_sections(db: Session, sections: List[SectionBase], course_id: i
             course_id=course_id
         )
         db.add(section_db)
-        db.flush()  # get the section_id without committing
+        await db.flush()  # get the section_id without committing
 
         new_section = SectionBase.from_query(
             section_db.section_id, section_db.title, section_db.content_type, section_db.external_link,
@@ -32,20 +33,19 @@ async def create_sections(db: Session, sections: List[SectionBase], course_id: i
 
         created_sections.append(new_section)
 
-    db.commit()
+    await db.commit()
 
     return created_sections
 
 
-async def student_viewed_section(db: Session, section_id, student_id):
-    data = (db.query(StudentSection)
-            .where(StudentSection.section_id == section_id, StudentSection.student_id == student_id)
-            .first()
-            )
+async def student_viewed_section(db: AsyncSession, section_id, student_id):
+    data = await db.scalar(select(StudentSection)
+                           .where(StudentSection.section_id == section_id, StudentSection.student_id == student_id)
+                           )
     return data is not None
 
 
-async def add_student(db: Session, section: Section, student_id) -> None:
+async def add_student(db: AsyncSession, section: Section, student_id) -> None:
     """
     Student views a section (inserts a record in students_sections table)
     IntegrityError means there is already such record and continues
@@ -54,17 +54,17 @@ async def add_student(db: Session, section: Section, student_id) -> None:
         return
     new = StudentSection(section_id=section.section_id, student_id=student_id)
     db.add(new)
-    db.commit()
+    await db.commit()
 
 
-async def update_section_info(db: Session, section: Section, updates: SectionUpdate):
+async def update_section_info(db: AsyncSession, section: Section, updates: SectionUpdate):
     section.title = updates.title
     section.content_type = updates.content_type
     section.external_link = updates.external_link
     section.description = updates.description
 
-    db.commit()
-    db.refresh(section)
+    await db.commit()
+    await db.refresh(section)
 
     return SectionBase.from_query(
         section.section_id, section.title, section.content_type, section.external_link,
@@ -73,12 +73,12 @@ async def update_section_info(db: Session, section: Section, updates: SectionUpd
 
 
 async def delete_section(db, section: Section):
-    db.delete(section)
-    db.commit()
+    await db.delete(section)
+    await db.commit()
 
 
-async def get_sections_count_for_course(db: Session, course_id: int) -> int:
-    count = db.query(Section).where(Section.course_id == course_id).count()
+async def get_sections_count_for_course(db: AsyncSession, course_id: int) -> int:
+    count = await db.scalar(select(func.count()).select_from(Section).where(Section.course_id == course_id))
     return count
 
 
@@ -1,18 +1,21 @@
 from fastapi import HTTPException, status
+from sqlalchemy import select, delete, func, inspect
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
 from crud import crud_course
+from db.functions import split_list
 from db.models import Account, Course, Status, Student, StudentCourse as DBStudentCourse, StudentRating, StudentSection, \
-    Section
+    Section, Teacher
 from schemas.student import StudentEdit, StudentResponseModel
 from schemas.course import CourseInfo, CourseRateResponse, StudentCourseSchema
 from email_notification import send_email, build_student_enroll_request
+from core import principal_cache
 
 
-async def get_student_by_id(db: Session, user_id: int, auto_error=False) -> Account | None:
-    query = (db.query(Account)
-             .filter(Account.account_id == user_id, Account.is_deactivated == False)
-             .first())
+async def get_student_by_id(db: AsyncSession, user_id: int, auto_error=False) -> Account | None:
+    query = await db.scalar(select(Account)
+                            .where(Account.account_id == user_id, Account.is_deactivated == False))
 
     if query:
         return query
@@ -20,48 +23,47 @@ async def get_student_by_id(db: Session, user_id: int, auto_error=False) -> Acco
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'No such user')
 
 
-async def get_by_email(db: Session, email: str) -> Student | None:
-    student = (db.query(Student).join(Student.account).filter(
-        Account.email == email, Account.is_deactivated == False).first())
+async def get_by_email(db: AsyncSession, email: str) -> Student | None:
+    student = await db.scalar(select(Student).join(Student.account).options(contains_eager(Student.account)).where(
+        Account.email == email, Account.is_deactivated == False))
 
     if student:
         return student
 
 
-async def get_student(db: Session, email: str) -> StudentResponseModel | None:
+async def get_student(db: AsyncSession, email: str) -> StudentResponseModel | None:
     student = await get_by_email(db, email)
 
     if student:
         return StudentResponseModel.from_query(student.first_name, student.last_name, student.is_premium)
 
 
-async def edit_account(db: Session, email: str, updates: StudentEdit) -> StudentResponseModel:
+async def edit_account(db: AsyncSession, email: str, updates: StudentEdit) -> StudentResponseModel:
     student = await get_by_email(db, email)
 
     student.first_name, student.last_name = updates.first_name, \
         updates.last_name
 
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    principal_cache.invalidate(email)
+    await db.refresh(student)
 
     return StudentResponseModel.from_query(student.first_name, student.last_name, student.is_premium)
 
 
-async def get_my_courses(student: Student) -> list[CourseInfo]:
-    my_courses = student.courses_enrolled
+async def get_my_courses(db: AsyncSession, student: Student) -> list[CourseInfo]:
+    rows = await crud_course.catalog_rows(db, crud_course.catalog_page(
+        Course.is_hidden == False,
+        DBStudentCourse.student_id == student.student_id,
+        DBStudentCourse.status == Status.active.value,
+    ).join(DBStudentCourse, DBStudentCourse.course_id == Course.course_id))
 
-    my_courses_pydantic: list[CourseInfo] = []
-    for c in my_courses:
-        if c.is_hidden:
-            continue
-        tags = [str(t) for t in c.tags]
-        my_courses_pydantic.append(CourseInfo.from_query(
-            *(c.title, c.description, c.is_premium, tags)))
+    # this listing has always shown tags as str(Tag), '#name', unlike the catalog's bare names
+    return [CourseInfo.from_query(title, description, is_premium, [f'#{tag}' for tag in split_list(tag_names)])
+            for title, description, is_premium, tag_names, *_ in rows]
 
-    return my_courses_pydantic
 
-
-async def add_pending_student_request(db: Session, student: Student, course_id: int) -> None:
+async def add_pending_student_request(db: AsyncSession, student: Student, course_id: int) -> None:
     pending_enrollment = DBStudentCourse(
         student_id=student.student_id,
         course_id=course_id
@@ -69,49 +71,75 @@ async def add_pending_student_request(db: Session, student: Student, course_id:
 
     try:
         db.add(pending_enrollment)
-        db.commit()
+        await db.commit()
 
     except IntegrityError as err:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=err.args)
 
     else:
-        db.refresh(pending_enrollment)
+        await db.refresh(pending_enrollment)
+
+
+async def unsubscribe_from_course(db: AsyncSession, student_id: int, course_id: int) -> None:
+    await db.execute(delete(DBStudentCourse).where(DBStudentCourse.student_id ==
+                                                   student_id, DBStudentCourse.course_id == course_id))
+    await db.commit()
+
+
+def enrollments_loaded(student: Student) -> bool:
+    """True when the principal came with its active enrollments (see oauth.ENROLLED_COURSES)"""
+    return 'courses_enrolled' not in inspect(student).unloaded
+
 
+async def is_student_enrolled(db: AsyncSession, student: Student, course_id: int) -> bool:
+    if enrollments_loaded(student):
+        return any(course.course_id == course_id for course in student.courses_enrolled)
 
-async def unsubscribe_from_course(db: Session, student_id: int, course_id: int) -> None:
-    db.query(DBStudentCourse).filter(DBStudentCourse.student_id ==
-                                     student_id, DBStudentCourse.course_id == course_id).delete()
-    db.commit()
+    query = await db.scalar(select(DBStudentCourse.course_id).where(
+        DBStudentCourse.student_id == student.student_id,
+        DBStudentCourse.course_id == course_id,
+        DBStudentCourse.status == Status.active.value))
 
+    return query is not None
 
-async def is_student_enrolled(student: Student, course_id: int) -> bool:
-    return course_id in set([course.course_id for course in student.courses_enrolled])
 
+async def get_premium_courses_count(db: AsyncSession, student: Student) -> int:
+    if enrollments_loaded(student):
+        return sum(1 for course in student.courses_enrolled if course.is_premium)
 
-async def get_premium_courses_count(student: Student) -> int:
-    return len([course for course in student.courses_enrolled if course.is_premium])
+    return await db.scalar(
+        select(func.count())
+        .select_from(DBStudentCourse)
+        .join(Course, Course.course_id == DBStudentCourse.course_id)
+        .where(DBStudentCourse.student_id == student.student_id,
+               DBStudentCourse.status == Status.active.value,
+               Course.is_premium == True))
 
 
-async def get_student_rating(db: Session, student_id: int, course_id: int) -> StudentRating | None:
-    query = db.query(StudentRating).filter(StudentRating.student_id ==
-                                           student_id, StudentRating.course_id == course_id).first()
+async def get_student_rating(db: AsyncSession, student_id: int, course_id: int) -> StudentRating | None:
+    query = await db.scalar(select(StudentRating).where(StudentRating.student_id ==
+                                                        student_id, StudentRating.course_id == course_id))
 
     if query:
         return query.rating
 
 
-async def get_student_progress(db: Session, student_id: int, course_id: int) -> str:
-    """Gets the count of sections and sections_viewed to calculate the progress in percentage"""
-    total_sections = db.query(Section).where(Section.course_id == course_id).count()
-
-    viewed_sections = (
-        db.query(StudentSection)
+async def count_viewed_sections(db: AsyncSession, student_id: int, course_id: int) -> int:
+    return await db.scalar(
+        select(func.count())
+        .select_from(StudentSection)
         .join(Section, StudentSection.section_id == Section.section_id)
-        .filter(StudentSection.student_id == student_id, Section.course_id == course_id)
-        .count()
+        .where(StudentSection.student_id == student_id, Section.course_id == course_id)
     )
 
+
+async def get_student_progress(db: AsyncSession, student_id: int, course_id: int) -> str:
+    """Gets the count of sections and sections_viewed to calculate the progress in percentage"""
+    total_sections = await db.scalar(select(func.count()).select_from(Section).where(Section.course_id == course_id))
+    viewed_sections = await count_viewed_sections(db, student_id, course_id)
+
     progress = 0.0
     if total_sections > 0:  # avoiding zero division
         progress = (viewed_sections / total_sections) * 100
@@ -119,12 +147,12 @@ async def get_student_progress(db: Session, student_id: int, course_id: int) ->
     return f'{progress:.2f}'
 
 
-async def update_add_student_rating(db: Session, student: Student, course_id: int,
+async def update_add_student_rating(db: AsyncSession, student: Student, course_id: int,
                                     rating: int) -> CourseRateResponse | str:
-    existing_rating = db.query(StudentRating).filter(
+    existing_rating = await db.scalar(select(StudentRating).where(
         StudentRating.student_id == student.student_id,
         StudentRating.course_id == course_id
-    ).first()
+    ))
 
     try:
         if existing_rating:
@@ -136,22 +164,25 @@ async def update_add_student_rating(db: Session, student: Student, course_id: in
             db.add(new_rating)
 
             await crud_course.update_rating(db, course_id, rating)
-        db.commit()
+        await db.commit()
 
-        course = next(
-            (course for course in student.courses_enrolled if course.course_id == course_id), None)
+        enrolled = {course.course_id: course for course in student.courses_enrolled} \
+            if enrollments_loaded(student) else {}
+        course_title = enrolled[course_id].title if course_id in enrolled \
+            else await db.scalar(select(Course.title).where(Course.course_id == course_id))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
 
         return str(e)
 
-    return CourseRateResponse(course=course.title, rating=f'{rating:.2f}')
+    return CourseRateResponse(course=course_title, rating=f'{rating:.2f}')
 
 
-async def get_course_information(db: Session, course_id: int, student: Student) -> StudentCourseSchema:
+async def get_course_information(db: AsyncSession, course_id: int, student: Student) -> StudentCourseSchema:
     course: Course = await crud_course.get_course_common_info(db=db, course_id=course_id)
 
     if course:
+        owner = await db.get(Teacher, course.owner_id)
         student_rating = await get_student_rating(db=db, student_id=student.student_id, course_id=course_id)
         student_progress = await get_student_progress(db=db, student_id=student.student_id, course_id=course_id)
 
@@ -161,7 +192,7 @@ async def get_course_information(db: Session, course_id: int, student: Student)
             description=course.description,
             objectives=course.objectives,
             owner_id=course.owner_id,
-            owner_name=course.owner.first_name + ' ' + course.owner.last_name,
+            owner_name=owner.first_name + ' ' + owner.last_name,
             is_premium=course.is_premium,
             overall_rating=course.rating,
             your_rating=student_rating if student_rating else 0,
@@ -169,8 +200,8 @@ async def get_course_information(db: Session, course_id: int, student: Student)
         )
 
 
-async def subscribe(db: Session, course: Course, student: Student) -> str:
-    teacher_email = course.owner.account.email
+async def subscribe(db: AsyncSession, course: Course, student: Student) -> str:
+    teacher_email = await db.scalar(select(Account.email).where(Account.account_id == course.owner_id))
     student_email = student.account.email
     course_title, course_id = course.title, course.course_id
     await add_pending_student_request(db, student, course_id)
@@ -185,18 +216,15 @@ async def subscribe(db: Session, course: Course, student: Student) -> str:
         return 'Pending approval from course owner'
 
     except Exception:
-        db.rollback()
+        await db.rollback()
         return 'Subscription failed. Please try again later'
 
 
-async def view_pending_requests(db: Session, student: Student) -> list[CourseInfo]:
-    res = db.query(Course).join(DBStudentCourse).filter(DBStudentCourse.student_id == student.student_id,
-                                                        DBStudentCourse.course_id == Course.course_id,
-                                                        DBStudentCourse.status == Status.pending.value).all()
+async def view_pending_requests(db: AsyncSession, student: Student) -> list[CourseInfo]:
+    res = await crud_course.get_catalog(db, crud_course.catalog_page(
+        DBStudentCourse.student_id == student.student_id,
+        DBStudentCourse.status == Status.pending.value,
+    ).join(DBStudentCourse, DBStudentCourse.course_id == Course.course_id))
 
     if res:
-        return [CourseInfo.from_query(course.title,
-                                      course.description,
-                                      course.is_premium,
-                                      [tag.name for tag in course.tags])
-                for course in res]
+        return res
\ No newline at end of file
@@ -1,21 +1,24 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import catalog_cache, tag_index
+from db import search as full_text
 from db.models import Tag, CourseTag
 from schemas.tag import TagBase
 from typing import List, Dict
 from typing import Union
 
 
-async def create_tags(db: Session, tags: List[TagBase], course_id: int) -> Dict[str, List[Union[TagBase, int]]]:
+async def create_tags(db: AsyncSession, tags: List[TagBase], course_id: int) -> Dict[str, List[Union[TagBase, int]]]:
     created_tags = []
     duplicated = []
     for tag in tags:
-        tag_db = db.query(Tag).filter_by(name=tag.name).first()
+        tag_db = await db.scalar(select(Tag).filter_by(name=tag.name))
         if not tag_db:
             tag_db = Tag(name=tag.name)
             db.add(tag_db)
-            db.flush()  # get the tag_id without committing
+            await db.flush()  # get the tag_id without committing
 
-        course_tag = db.query(CourseTag).filter_by(course_id=course_id, tag_id=tag_db.tag_id).first()
+        course_tag = await db.scalar(select(CourseTag).filter_by(course_id=course_id, tag_id=tag_db.tag_id))
         if course_tag:
             duplicated.append(tag_db.tag_id)
         else:
@@ -24,7 +27,15 @@ async def create_tags(db: Session, tags: List[TagBase], course_id: int) -> Dict[
             new_tag = TagBase(tag_id=tag_db.tag_id, name=tag_db.name)
             created_tags.append(new_tag)
 
-    db.commit()
+    if created_tags:
+        await db.flush()
+        await full_text.index_course(db, course_id)
+    await db.commit()
+    for tag in created_tags:
+        tag_index.index.add(tag.tag_id, tag.name, course_id)
+    if created_tags:
+        # once the tag index has the change too, tag filters read it
+        catalog_cache.bump()
 
     result = {
         "created": created_tags,
@@ -33,24 +44,30 @@ async def create_tags(db: Session, tags: List[TagBase], course_id: int) -> Dict[
     return result
 
 
-async def course_has_tag(db: Session, course_id: int, tag_id: int) -> CourseTag:
-    course_tag = db.query(CourseTag).filter_by(course_id=course_id, tag_id=tag_id).first()
+async def course_has_tag(db: AsyncSession, course_id: int, tag_id: int) -> CourseTag:
+    course_tag = await db.scalar(select(CourseTag).filter_by(course_id=course_id, tag_id=tag_id))
 
     return course_tag
 
 
-async def delete_tag_from_course(db: Session, course_tag: CourseTag) -> None:
-    db.delete(course_tag)
-    db.commit()
+async def delete_tag_from_course(db: AsyncSession, course_tag: CourseTag) -> None:
+    await db.delete(course_tag)
+    await db.flush()
+    await full_text.index_course(db, course_tag.course_id)
+    await db.commit()
+    tag_index.index.remove(course_tag.tag_id, course_tag.course_id)
+    catalog_cache.bump()
 
 
-async def check_tag_associations(db: Session, tag_id: int) -> int:
-    tag_associations = db.query(CourseTag).filter_by(tag_id=tag_id).count()
+async def check_tag_associations(db: AsyncSession, tag_id: int) -> int:
+    tag_associations = await db.scalar(select(func.count()).select_from(CourseTag).filter_by(tag_id=tag_id))
     return tag_associations
 
 
-async def delete_tag(db: Session, tag_id: int) -> None:
-    tag = db.query(Tag).filter_by(tag_id=tag_id).first()
+async def delete_tag(db: AsyncSession, tag_id: int) -> None:
+    tag = await db.scalar(select(Tag).filter_by(tag_id=tag_id))
     if tag:
-        db.delete(tag)
-        db.commit()
+        await db.delete(tag)
+        await db.commit()
+        tag_index.index.drop(tag_id)
+        catalog_cache.bump()
@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session, joinedload
-from db.models import Course, Student, StudentCourse, Teacher, Tag, CourseTag, Section, Status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from db.models import Account, Course, Student, StudentCourse, Teacher, Tag, CourseTag, Section, Status
 from schemas.course import CourseCreate, CourseBase, CoursePendingRequests, CourseSectionsTags, CourseUpdate
 from crud.crud_section import create_sections, transfer_object
 from crud.crud_tag import create_tags
@@ -7,19 +8,23 @@ from crud.crud_student import get_student_progress
 from schemas.teacher import TeacherSchema, TeacherEdit
 from schemas.tag import TagBase
 from email_notification import build_teacher_enroll_request, send_email
+from core.offload import run_in_pool
+from core import catalog_cache, principal_cache
+from db import search as full_text
 from schemas.student import StudentResponseModel
 from sqlalchemy.future import select
 from typing import List, Dict
 
 
-async def edit_account(db: Session, teacher: Teacher, updates: TeacherEdit):
+async def edit_account(db: AsyncSession, teacher: Teacher, updates: TeacherEdit):
     teacher.first_name = updates.first_name
     teacher.last_name = updates.last_name
     teacher.phone_number = updates.phone_number
     teacher.linked_in = updates.linked_in
 
-    db.commit()
-    db.refresh(teacher)
+    # nothing here is generated by the server, a refresh would only expire teacher.account for the route
+    await db.commit()
+    principal_cache.invalidate(teacher.account.email)
 
     return teacher
 
@@ -35,14 +40,14 @@ async def get_info(teacher: Teacher, teacher_email: str):
     )
 
 
-async def get_my_courses(db: Session, teacher: Teacher) -> list[CourseBase]:
-    courses = db.query(Course).filter(Course.owner_id == teacher.teacher_id).all()
+async def get_my_courses(db: AsyncSession, teacher: Teacher) -> list[CourseBase]:
+    courses = (await db.scalars(select(Course).where(Course.owner_id == teacher.teacher_id))).all()
 
     teacher_courses = [get_coursebase_model(teacher, course) for course in courses]
     return teacher_courses
 
 
-async def make_course(db: Session, teacher: Teacher, new_course: CourseCreate):
+async def make_course(db: AsyncSession, teacher: Teacher, new_course: CourseCreate):
     course_info = Course(
         title=new_course.title,
         description=new_course.description,
@@ -52,8 +57,11 @@ async def make_course(db: Session, teacher: Teacher, new_course: CourseCreate):
     )
 
     db.add(course_info)
-    db.commit()
-    db.refresh(course_info)
+    await db.flush()
+    await full_text.index_course(db, course_info.course_id)
+    catalog_cache.invalidate_on_commit(db)
+    await db.commit()
+    await db.refresh(course_info)
 
     course_info_response = get_coursebase_model(teacher, course_info)
     course_tags, course_sections = [], []
@@ -70,23 +78,23 @@ async def make_course(db: Session, teacher: Teacher, new_course: CourseCreate):
     )
 
 
-async def get_entire_course(db: Session, course: Course, teacher: Teacher, sort: str | None, sort_by: str | None):
+async def get_entire_course(db: AsyncSession, course: Course, teacher: Teacher, sort: str | None, sort_by: str | None):
     course_info = get_coursebase_model(teacher, course)
 
     course_tags = []
-    tags = db.query(Tag).join(CourseTag).filter(CourseTag.course_id == course.course_id).all()
+    tags = (await db.scalars(select(Tag).join(CourseTag).where(CourseTag.course_id == course.course_id))).all()
     for tag in tags:
         tag_base = TagBase(tag_id=tag.tag_id, name=tag.name)
         course_tags.append(tag_base)
 
     course_sections = []
-    sections_query = db.query(Section).filter(Section.course_id == course.course_id)
+    sections_query = select(Section).where(Section.course_id == course.course_id)
     if sort_by:
         sections_query = sections_query.order_by(
             getattr(Section, sort_by).desc() if sort and sort == 'desc' else getattr(Section, sort_by).asc()
         ) # when sort_by is provided without sort, the sections are sorted in ascending order by default
 
-    sections = sections_query.all()
+    sections = (await db.scalars(sections_query)).all()
     for section in sections:
         section_base = transfer_object(section)
         course_sections.append(section_base)
@@ -98,12 +106,15 @@ async def get_entire_course(db: Session, course: Course, teacher: Teacher, sort:
     )
 
 
-async def edit_course_info(db: Session, course: Course, teacher: Teacher, updates: CourseUpdate):
+async def edit_course_info(db: AsyncSession, course: Course, teacher: Teacher, updates: CourseUpdate):
     course.title = updates.title
     course.description = updates.description
     course.objectives = updates.objectives
-    db.commit()
-    db.refresh(course)
+    await db.flush()
+    await full_text.index_course(db, course.course_id)
+    catalog_cache.invalidate_on_commit(db)
+    await db.commit()
+    await db.refresh(course)
 
     return get_coursebase_model(teacher, course)
 
@@ -132,12 +143,12 @@ def get_coursebase_model(teacher: Teacher, course: Course):
     )
 
 
-async def student_enroll_response(db: Session, student: Student, teacher: Teacher, course: Course, response: str):
-    sc_record = db.query(StudentCourse).filter(StudentCourse.student_id == student.student_id,
-                                               StudentCourse.course_id == course.course_id).first()
+async def student_enroll_response(db: AsyncSession, student: Student, teacher: Teacher, course: Course, response: str):
+    sc_record = await db.scalar(select(StudentCourse).where(StudentCourse.student_id == student.student_id,
+                                                            StudentCourse.course_id == course.course_id))
 
     sc_record.status = Status.active.value if response == 'approve' else Status.declined.value
-    db.commit()
+    await db.commit()
 
     response = True if sc_record.status == Status.active.value else False
     return await send_notification(receiver_mail=student.account.email,
@@ -145,8 +156,8 @@ async def student_enroll_response(db: Session, student: Student, teacher: Teache
                                    response=response)
 
 
-async def is_teacher_owner(course_id: int, teacher: Teacher):
-    return course_id in set([course.course_id for course in teacher.courses])
+async def is_teacher_owner(course: Course, teacher: Teacher):
+    return course.owner_id == teacher.teacher_id
 
 
 async def send_notification(receiver_mail: str, course_title: str, response: bool):
@@ -156,19 +167,18 @@ async def send_notification(receiver_mail: str, course_title: str, response: boo
     return 'Request response submitted'
 
 
-async def view_pending_requests(db: Session, teacher: Teacher):
-    res = (db.query(Course, Student)
-           .join(StudentCourse, StudentCourse.course_id == Course.course_id)
-           .join(Student, Student.student_id == StudentCourse.student_id)
-           .join(Teacher, Course.owner_id == Teacher.teacher_id)
-           .filter(StudentCourse.status == Status.pending.value)
-           .all()
-           )
+async def view_pending_requests(db: AsyncSession, teacher: Teacher):
+    res = (await db.execute(
+        select(Course.title, Account.email)
+        .join(StudentCourse, StudentCourse.course_id == Course.course_id)
+        .join(Account, Account.account_id == StudentCourse.student_id)
+        .where(Course.owner_id == teacher.teacher_id, StudentCourse.status == Status.pending.value)
+    )).all()
 
-    return [CoursePendingRequests.from_query(course.title, student.account.email) for course, student in res]
+    return [CoursePendingRequests.from_query(course_title, student_email) for course_title, student_email in res]
 
 
-async def calculate_student_progresses(db: Session, courses_with_students: List[Course]) -> Dict[tuple[int, int], str]:
+async def calculate_student_progresses(db: AsyncSession, courses_with_students: List[Course]) -> Dict[tuple[int, int], str]:
     student_progress_dict = {}
 
     for course in courses_with_students:
@@ -180,10 +190,10 @@ async def calculate_student_progresses(db: Session, courses_with_students: List[
     return student_progress_dict
 
 
-async def get_courses_reports(db: Session, teacher: Teacher, min_progress: float, sort: str = None):
+async def get_courses_reports(db: AsyncSession, teacher: Teacher, min_progress: float, sort: str = None):
     courses_query = (
-        select(Course)                                 #preventing the "N+1 problem"
-        .options(joinedload(Course.students_enrolled)) #all related students are fetched in the same query as the courses
+        select(Course)                                     #preventing the "N+1 problem"
+        .options(selectinload(Course.students_enrolled))   #one IN query for the students of all courses, a joinedload here scans students
         .where(Course.owner_id == teacher.teacher_id)
     )
     
@@ -192,11 +202,12 @@ async def get_courses_reports(db: Session, teacher: Teacher, min_progress: float
     elif sort == 'desc':
         courses_query = courses_query.order_by(Course.course_id.desc())
     
-    result = db.execute(courses_query) #result contains raw SQL rows
+    result = await db.execute(courses_query) #result contains raw SQL rows
     courses_with_students = result.scalars().unique().all() # scalars() converts raw SQL rows into ORM objects
 
     student_progress_dict = await calculate_student_progresses(db, courses_with_students)
-    courses_reports = generate_reports(courses_with_students, student_progress_dict, min_progress)
+    # everything is loaded by now, building the reports is pure python and can leave the loop
+    courses_reports = await run_in_pool(generate_reports, courses_with_students, student_progress_dict, min_progress)
 
     return courses_reports
 
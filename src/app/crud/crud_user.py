@@ -1,20 +1,26 @@
 from io import BytesIO
-from sqlalchemy import update
-from sqlalchemy.orm import Session
+from sqlalchemy import update, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, defer, joinedload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from schemas.user import UserChangePassword
 from schemas.teacher import TeacherCreate, TeacherSchema
 from schemas.student import StudentCreate, StudentResponseModel
-from db.models import Account, Teacher, Student, Course
-from core.hashing import hash_pass
+from db.models import Account, Admin, Teacher, Student, Course, Role as AccountRole, ROLE_MODELS
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status, UploadFile
 from typing import Union, Type
 from core import hashing
+from core.offload import offloaded
+from core import principal_cache, revocation
 from PIL import Image, UnidentifiedImageError
 
 DEFAULT_PICTURE_WIDTH = 400
 DEFAULT_PICTURE_HEIGHT = 400
 
+# the role row is needed right after the account is loaded, lazy loading it is not possible with AsyncSession
+ROLE_LOADERS = (joinedload(Account.admin), joinedload(Account.student), joinedload(Account.teacher))
+
 
 class Role:
     STUDENT = 'student'
@@ -23,51 +29,56 @@ class Role:
     UNION = Union[Student, Teacher, Account]
 
 
-async def get_user_by_id_deactivated_also(db: Session, user_id: int) -> Account | None:
-    query = (db.query(Account)
-             .filter(Account.account_id == user_id)
-             .first())
+async def get_user_by_id_deactivated_also(db: AsyncSession, user_id: int) -> Account | None:
+    query = await db.scalar(select(Account)
+                            .where(Account.account_id == user_id))
     return query
 
 
-async def get_specific_user_or_raise_404(db: Session, user_id: int, role=None) -> Role.UNION | None:
-    query = (db.query(Account)
-             .filter(Account.account_id == user_id, Account.is_deactivated == False)
-             .first())
+async def get_specific_user_or_raise_404(db: AsyncSession, user_id: int, role=None) -> Role.UNION | None:
+    query = await db.scalar(select(Account)
+                            .options(*ROLE_LOADERS)
+                            .where(Account.account_id == user_id, Account.is_deactivated == False))
 
     if query:  # Just means there is such account
         # Following checks specifically
-        if role == Role.STUDENT and query.student:
-            return query.student
-        if role == Role.TEACHER and query.teacher:
-            return query.teacher
-        if role == Role.ADMIN and query.admin:
-            return query.admin
+        role_row = None
+        if role == Role.STUDENT:
+            role_row = query.student
+        elif role == Role.TEACHER:
+            role_row = query.teacher
+        elif role == Role.ADMIN:
+            role_row = query.admin
+
+        if role_row:
+            # keep the loaded account reachable, role_row.account must not need a lazy load later
+            set_committed_value(role_row, 'account', query)
+            return role_row
 
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'No such {role} user')
 
 
-async def create_user(db: Session, user: Union[StudentCreate, TeacherCreate]):
+async def create_user(db: AsyncSession, user: Union[StudentCreate, TeacherCreate]):
     new_user = Account(
         email=user.email,
-        password=hash_pass(user.password),
+        password=await hashing.hash_pass_async(user.password),
         role=user.get_type()
     )
 
     try:
         db.add(new_user)
-        db.commit()
+        await db.commit()
     except IntegrityError as err:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=err.args)
     else:
-        db.refresh(new_user)
+        await db.refresh(new_user)
         return new_user
 
 
 class TeacherFactory():
     @staticmethod
-    async def create_db_user(db: Session, user_schema: Union[StudentCreate, TeacherCreate]):
+    async def create_db_user(db: AsyncSession, user_schema: Union[StudentCreate, TeacherCreate]):
         new_user = await create_user(db, user_schema)
 
         new_teacher = Teacher(
@@ -79,8 +90,8 @@ class TeacherFactory():
         )
 
         db.add(new_teacher)
-        db.commit()
-        db.refresh(new_teacher)
+        await db.commit()
+        await db.refresh(new_teacher)
         # await send_verification_email([schema.email], new_user)
         return TeacherSchema(
             teacher_id=new_user.account_id,
@@ -94,7 +105,7 @@ class TeacherFactory():
 
 class StudentFactory:
     @staticmethod
-    async def create_db_user(db: Session, user_schema: Union[StudentCreate, TeacherCreate]):
+    async def create_db_user(db: AsyncSession, user_schema: Union[StudentCreate, TeacherCreate]):
         new_user = await create_user(db, user_schema)
 
         new_student = Student(
@@ -104,8 +115,8 @@ class StudentFactory:
         )
 
         db.add(new_student)
-        db.commit()
-        db.refresh(new_student)
+        await db.commit()
+        await db.refresh(new_student)
         return StudentResponseModel.from_query(first_name=new_student.first_name, last_name=new_student.last_name)
 
 
@@ -117,36 +128,94 @@ def create_user_factory(user_type: str):
     return factories.get(user_type)
 
 
-async def create(db: Session, user_schema: Union[StudentCreate, TeacherCreate]) -> Union[
+async def create(db: AsyncSession, user_schema: Union[StudentCreate, TeacherCreate]) -> Union[
     TeacherSchema, StudentResponseModel]:
     user_type = user_schema.get_type()
     factory = create_user_factory(user_type)
     return await factory.create_db_user(db, user_schema)
 
 
-async def exists(db: Session, email: str) -> Account:
-    query = db.query(Account).filter(
-        Account.email == email, Account.is_deactivated == False).first()
+async def exists(db: AsyncSession, email: str) -> Account:
+    query = await db.scalar(select(Account).options(*ROLE_LOADERS).where(
+        Account.email == email, Account.is_deactivated == False))
 
     if query:
         return query
 
 
-async def try_login(db: Session, username: str, password: str) -> Type[Account]:
+async def get_principal(
+        db: AsyncSession, email: str, role: AccountRole, loaders=()
+) -> Admin | Teacher | Student | None:
+    """
+    The active role row of email with its account attached, in one query: the role row joined to its account,
+    blobs left out. `loaders` are extra loader options for collections the calling route reads, e.g. enrollments.
+    """
+    model = ROLE_MODELS[role]
+    options = [defer(model.profile_picture, raiseload=True)] if hasattr(model, 'profile_picture') else []
+    role_row = await db.scalar(
+        select(model)
+        .join(model.account)
+        .options(contains_eager(model.account), *options, *loaders)
+        .where(Account.email == email, Account.is_deactivated == False))
+
+    if role_row:
+        # the account side of the one-to-one is not populated by contains_eager, fill it from what was loaded
+        for other in AccountRole:
+            set_committed_value(role_row.account, other.value, role_row if other == role else None)
+        return role_row
+
+
+async def load_principal_collections(db: AsyncSession, role_row: Admin | Teacher | Student, loaders) -> None:
+    """Runs `loaders` for a role row that is already in the session, e.g. one rebuilt from the principal cache"""
+    model = type(role_row)
+    pk = getattr(model, model.__mapper__.get_property_by_column(model.__mapper__.primary_key[0]).key)
+    # only the pk is selected, the loaders fill their collections on the instance the identity map already holds
+    await db.scalar(select(model).options(load_only(pk), *loaders).where(pk == getattr(role_row, pk.key)))
+
+
+async def try_login(db: AsyncSession, username: str, password: str) -> Type[Account]:
     user = await exists(db, username)
 
-    if user and hashing.verify_password(password, user.password):
-        return user
+    if not user:
+        # same cost as a wrong password, response times don't tell which emails have an account
+        await hashing.verify_password_async(password, await hashing.get_dummy_hash())
+        return None
+
+    valid, new_hash = await hashing.verify_and_update_async(password, user.password)
+    if not valid:
+        return None
+
+    if new_hash:
+        # hashed under an older scheme/cost: store the upgraded hash, unless a password change got there first
+        await db.execute(update(Account)
+                         .where(Account.account_id == user.account_id, Account.password == user.password)
+                         .values(password=new_hash))
+        await db.commit()
+        set_committed_value(user, 'password', new_hash)
+        principal_cache.invalidate(user.email)
+
+    return user
+
 
+async def revoke_tokens(db: AsyncSession, email: str) -> None:
+    account = await email_exists(db, email)
 
-async def change_password(db: Session, pass_update: UserChangePassword, account: Account):
-    hashed_pass = hashing.hash_pass(pass_update.new_password)
+    if account:
+        await revocation.revoke(db, account)
+        await db.commit()
+
+
+async def change_password(db: AsyncSession, pass_update: UserChangePassword, account: Account):
+    hashed_pass = await hashing.hash_pass_async(pass_update.new_password)
     account.password = hashed_pass
+    # sessions opened with the old password end here
+    await revocation.revoke(db, account)
 
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(account.email)
 
 
-async def add_picture(db: Session, picture: UploadFile, entity_type: str, entity_id: int) -> bool:
+async def add_picture(db: AsyncSession, picture: UploadFile, entity_type: str, entity_id: int) -> bool:
     res = await resize_picture(image_data=picture, target_size=(DEFAULT_PICTURE_WIDTH, DEFAULT_PICTURE_HEIGHT))
 
     if isinstance(res, bytes):
@@ -159,8 +228,8 @@ async def add_picture(db: Session, picture: UploadFile, entity_type: str, entity
         else:
             return False
 
-        db.execute(query)
-        db.commit()
+        await db.execute(query)
+        await db.commit()
 
         return True
 
@@ -168,9 +237,15 @@ async def add_picture(db: Session, picture: UploadFile, entity_type: str, entity
 
 
 async def resize_picture(image_data: UploadFile, target_size: tuple) -> bytes | str:
+    return await _resize_picture(image_data.file, target_size)
+
+
+@offloaded
+def _resize_picture(file, target_size: tuple) -> bytes | str:
+    # reading the spooled upload and decoding/encoding the image are both blocking
 
     try:
-        image_data = image_data.file.read()
+        image_data = file.read()
         image = Image.open(BytesIO(image_data))
         resized_image = image.resize(target_size)
         resized_data = BytesIO()
@@ -182,5 +257,5 @@ async def resize_picture(image_data: UploadFile, target_size: tuple) -> bytes |
         return e
 
 
-async def email_exists(db: Session, email: str) -> Account | None:
-   return db.query(Account).filter(Account.email == email).first()
+async def email_exists(db: AsyncSession, email: str) -> Account | None:
+   return await db.scalar(select(Account).where(Account.email == email))
@@ -1,41 +1,298 @@
+import hashlib
+import time
+from itertools import cycle
 from typing import Annotated
-from fastapi import Depends
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event, Engine, NullPool, StaticPool, AsyncAdaptedQueuePool, URL
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.orm import declarative_base, Session
 from sqlalchemy_utils import database_exists, create_database
-from typing import Generator
-from sqlalchemy.orm import Session
+from typing import AsyncGenerator
+from core.settings import settings
 
 
 Base = declarative_base()
 
+# One engine (and therefore one connection pool) per process.
+# Created by init_engine() in the app lifespan, or lazily on first use.
+engine: AsyncEngine | None = None
+SessionLocal: async_sessionmaker | None = None
+
+# Read replicas for the read-only routes, picked round robin by get_read_db()
+replica_engines: list[AsyncEngine] = []
+ReplicaSessionLocals: list[async_sessionmaker] = []
+_replica_sessions = None
+
+# read-your-writes: principal key -> monotonic deadline until which its reads stay on the primary.
+# Per process, so with several workers a request may still land on a worker that has not seen the write.
+_sticky_until: dict[str, float] = {}
+STICKY_MAX_KEYS = 10_000
+# marked by core.catalog_cache on every catalog change, principal keys are hex digests so they never collide
+CATALOG_STICKY_KEY = 'catalog'
+
+# async driver -> its blocking counterpart, used by alembic and sqlalchemy_utils
+SYNC_DRIVERS = {
+    'aiomysql': 'pymysql',
+    'asyncmy': 'pymysql',
+    'aiosqlite': 'pysqlite',
+}
+
+
+def get_sync_url(url: str = None) -> URL:
+    url = make_url(url or settings.DB_URL)
+    driver = SYNC_DRIVERS.get(url.get_driver_name(), url.get_driver_name())
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def get_sync_engine(url: str = None) -> Engine:
+    return create_engine(get_sync_url(url), poolclass=NullPool)
+
+
+def create_db_engine(url: str = None) -> AsyncEngine:
+    url = make_url(url or settings.DB_URL)
+
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # every connection would get its own empty in-memory db
+            return create_async_engine(url, poolclass=StaticPool)
+        # local stand-in: no server-side timeouts, but pool it like the real thing instead of aiosqlite's NullPool
+        return create_async_engine(
+            url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+
+    return create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        connect_args={"connect_timeout": settings.DB_CONNECT_TIMEOUT},
+    )
+
+
+class PrimarySession(Session):
+    """Sync session class behind the primary's AsyncSession, commits that wrote start the read-your-writes window"""
+
+
+@event.listens_for(PrimarySession, 'after_flush')
+def _on_primary_flush(session: Session, flush_context) -> None:
+    session.info['wrote'] = True
+
+
+@event.listens_for(PrimarySession, 'do_orm_execute')
+def _on_primary_execute(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(PrimarySession, 'after_commit')
+def _on_primary_commit(session: Session) -> None:
+    # release_connection() commits read-only transactions too, those must not pin the caller to the primary
+    wrote = session.info.pop('wrote', False)
+    key = session.info.get('sticky_key')
+    if wrote and key:
+        mark_sticky(key)
+
+
+class LazySession:
+    """
+    Stands in for an AsyncSession until the request actually uses it.
+    Requests that return before touching the db (validation errors, cached responses) never build a session,
+    and a session only checks out a pooled connection on its first statement.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, info: dict = None):
+        self._session_factory = session_factory
+        self._info = info or {}
+        self._session: AsyncSession | None = None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+            self._session.info.update(self._info)
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def in_transaction(self) -> bool:
+        return self._session is not None and self._session.in_transaction()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+async def release_connection(db) -> None:
+    """
+    Ends the session's transaction so its connection goes back to the pool right away instead of at the end
+    of the request. Loaded objects stay usable (expire_on_commit=False), the next statement checks out again.
+    """
+    if db is not None and db.in_transaction():
+        await db.commit()
+
+
+def create_session_factory(bind: AsyncEngine, sync_session_class: type[Session] = Session) -> async_sessionmaker:
+    # expire_on_commit=False: an expired attribute would need a lazy refresh, which cannot run on the event loop
+    return async_sessionmaker(
+        bind=bind, autoflush=False, expire_on_commit=False, sync_session_class=sync_session_class
+    )
+
+
+def get_replica_urls() -> list[str]:
+    return [url.strip() for url in settings.DB_REPLICA_URLS.split(',') if url.strip()]
+
+
+def init_engine(url: str = None, replica_urls: list[str] = None) -> tuple:
+    global engine, SessionLocal, _replica_sessions
+
+    if engine is None:
+        engine = create_db_engine(url)
+        SessionLocal = create_session_factory(engine, PrimarySession)
+
+        for replica_url in (get_replica_urls() if replica_urls is None else replica_urls):
+            replica_engine = create_db_engine(replica_url)
+            replica_engines.append(replica_engine)
+            ReplicaSessionLocals.append(create_session_factory(replica_engine))
+        _replica_sessions = cycle(ReplicaSessionLocals) if ReplicaSessionLocals else None
 
-def get_engine_and_session() -> tuple:
-    DB_USER = os.getenv('DB_USER')
-    DB_PASS = os.getenv('DB_PASS')
-    DB_NAME = os.getenv('DB_NAME')
-    SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{
-        DB_PASS}@localhost/{DB_NAME}?charset=utf8mb4"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return engine, SessionLocal
 
 
-def get_db() -> Generator:
-    engine, SessionLocal = get_engine_and_session()
-    # Base.metadata.create_all(bind=engine) # pointless bcs it asks Do these tables exist? each time db created
-    db = SessionLocal()
+async def dispose_engine() -> None:
+    global engine, SessionLocal, _replica_sessions
+
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+    if engine is not None:
+        await engine.dispose()
+
+    engine, SessionLocal, _replica_sessions = None, None, None
+    replica_engines.clear()
+    ReplicaSessionLocals.clear()
+    _sticky_until.clear()
+
+
+def get_engine_and_session() -> tuple:
+    return init_engine()
+
+
+def get_sticky_key(request: Request) -> str | None:
+    """Identifies the caller for read-your-writes, anonymous requests never write so they are never sticky"""
+    auth = request.headers.get('authorization')
+    if not auth:
+        return None
+    return hashlib.blake2b(auth.encode(), digest_size=16).hexdigest()
+
+
+def mark_sticky(key: str) -> None:
+    now = time.monotonic()
+    _sticky_until.pop(key, None)
+    _sticky_until[key] = now + float(settings.DB_STICKY_SECONDS)
+
+    if len(_sticky_until) > STICKY_MAX_KEYS:
+        for stale in [k for k, deadline in _sticky_until.items() if deadline <= now]:
+            del _sticky_until[stale]
+        while len(_sticky_until) > STICKY_MAX_KEYS:
+            # insertion ordered, so this drops the oldest write
+            del _sticky_until[next(iter(_sticky_until))]
+
+
+def is_sticky(key: str | None) -> bool:
+    if key is None:
+        return False
+
+    deadline = _sticky_until.get(key)
+    if deadline is None:
+        return False
+    if deadline <= time.monotonic():
+        _sticky_until.pop(key, None)
+        return False
+    return True
+
+
+async def get_db(request: Request) -> AsyncGenerator:
+    """Primary-bound lazy session, for every route that writes"""
+    _, session_factory = get_engine_and_session()
+    db = LazySession(session_factory, info={'sticky_key': get_sticky_key(request)})
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator:
+    """
+    Replica-bound lazy session for read-only routes.
+    Falls back to the primary when no replicas are configured or the caller wrote within DB_STICKY_SECONDS.
+    """
+    db = read_session(get_sticky_key(request))
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+async def get_catalog_db(request: Request) -> AsyncGenerator:
+    """
+    get_read_db for the cached public catalog, which also stays on the primary for DB_STICKY_SECONDS after
+    a catalog change: a cache miss right after the version bump would otherwise fill the new version
+    with a page from a replica that has not caught up, served until CATALOG_CACHE_TTL.
+    """
+    db = read_session(get_sticky_key(request), CATALOG_STICKY_KEY)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def read_session(key: str | None, *sticky_keys: str) -> LazySession:
+    """A replica session, or the primary's when there are no replicas or key or any of sticky_keys is sticky"""
+    get_engine_and_session()
+
+    if _replica_sessions is None or any(is_sticky(k) for k in (key, *sticky_keys)):
+        return LazySession(SessionLocal, info={'sticky_key': key})
+    return LazySession(next(_replica_sessions))
+
+
+def _get_engine_pool_stats(db_engine: AsyncEngine) -> dict:
+    pool = db_engine.sync_engine.pool
+    stats = {"initialized": True, "pool": type(pool).__name__, "status": pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    if hasattr(pool, '_max_overflow'):
+        stats['max_overflow'] = pool._max_overflow
+
+    return stats
+
+
+def get_pool_stats() -> dict:
+    """Checkout/overflow counters of the process-wide pools (QueuePool only reports all of them)"""
+    if engine is None:
+        return {"initialized": False}
+
+    stats = _get_engine_pool_stats(engine)
+    if replica_engines:
+        stats['replicas'] = [_get_engine_pool_stats(replica_engine) for replica_engine in replica_engines]
+        stats['sticky_keys'] = len(_sticky_until)
+
+    return stats
 
 
 def create_db_if_missing():
-    engine, _ = get_engine_and_session()
-    if not database_exists(engine.url):
-        create_database(engine.url)
+    url = get_sync_url()
+    if not database_exists(url):
+        create_database(url)
 
 
-dbDep = Annotated[Session | None, Depends(get_db)]
+dbDep = Annotated[AsyncSession | None, Depends(get_db)]
+readDbDep = Annotated[AsyncSession | None, Depends(get_read_db)]
+catalogDbDep = Annotated[AsyncSession | None, Depends(get_catalog_db)]
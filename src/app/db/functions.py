@@ -0,0 +1,47 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+# ASCII unit separator: cannot be typed into a tag name, unlike a comma
+LIST_SEPARATOR = '\x1f'
+
+
+class string_agg(FunctionElement):
+    """The group's values joined by LIST_SEPARATOR, NULL for an empty group. Order of the values is unspecified."""
+    type = String()
+    name = 'string_agg'
+    inherit_cache = True
+
+
+@compiles(string_agg)
+def _string_agg_default(element, compiler, **kw):
+    return f"group_concat({compiler.process(element.clauses, **kw)}, '{LIST_SEPARATOR}')"
+
+
+@compiles(string_agg, 'mysql')
+def _string_agg_mysql(element, compiler, **kw):
+    # MariaDB caps the result at group_concat_max_len (1M by default), far above a course's tags
+    return f"GROUP_CONCAT({compiler.process(element.clauses, **kw)} SEPARATOR '{LIST_SEPARATOR}')"
+
+
+class floor(FunctionElement):
+    """The largest integer <= the value, as an integer"""
+    type = Integer()
+    name = 'floor'
+    inherit_cache = True
+
+
+@compiles(floor)
+def _floor_default(element, compiler, **kw):
+    # SQLite: floor() is missing from builds without the math functions, a cast truncates (same for >= 0)
+    return f"CAST({compiler.process(element.clauses, **kw)} AS INTEGER)"
+
+
+@compiles(floor, 'mysql')
+def _floor_mysql(element, compiler, **kw):
+    # not CAST(... AS SIGNED), which rounds 9.6 to 10
+    return f"FLOOR({compiler.process(element.clauses, **kw)})"
+
+
+def split_list(value: str | None) -> list[str]:
+    return value.split(LIST_SEPARATOR) if value else []
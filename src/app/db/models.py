@@ -1,9 +1,15 @@
 from typing import List, Optional
-from sqlalchemy import ForeignKey, Integer, String, text
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import DDL, BigInteger, Double, ForeignKey, Index, Integer, String, event, inspect, text, update
+from sqlalchemy.orm import relationship, backref, Mapped, mapped_column, Session
 from db.database import Base
+from core.settings import settings
+from core.ranking import default_rank_score, rank_score
 from enum import Enum
 
+# Strict loading: a relationship the query did not load raises instead of quietly emitting one SELECT per row.
+# Every crud query has to declare what it needs with selectinload/joinedload/contains_eager.
+LAZY = 'raise_on_sql' if settings.STRICT_LOADING else 'select'
+
 
 class Role(Enum):
     admin = 'admin'
@@ -33,9 +39,9 @@ class Account(Base):
     role: Mapped[Role]
     is_deactivated: Mapped[Optional[bool]] = mapped_column(server_default='0')
 
-    admin = relationship("Admin", uselist=False, backref="account")
-    student = relationship("Student", uselist=False, backref="account")
-    teacher = relationship("Teacher", uselist=False, backref="account")
+    admin = relationship("Admin", uselist=False, backref=backref("account", lazy=LAZY), lazy=LAZY)
+    student = relationship("Student", uselist=False, backref=backref("account", lazy=LAZY), lazy=LAZY)
+    teacher = relationship("Teacher", uselist=False, backref=backref("account", lazy=LAZY), lazy=LAZY)
 
     def __repr__(self):
         return f"<Account(account_id={self.account_id}, email={self.email}, role={self.role.name})>"
@@ -62,7 +68,7 @@ class Teacher(Base):
     linked_in: Mapped[Optional[str]] = mapped_column(String(200))
     profile_picture: Mapped[Optional[bytes]]
 
-    courses: Mapped[List['Course']] = relationship(back_populates="owner")
+    courses: Mapped[List['Course']] = relationship(back_populates="owner", lazy=LAZY)
 
     def __repr__(self):
         return f"<Teacher(teacher_id={self.teacher_id}, first_name={self.first_name}, last_name={self.last_name})>"
@@ -84,14 +90,15 @@ class Student(Base):
         primaryjoin=f"and_(Student.student_id == foreign(StudentCourse.student_id), "
                     f"StudentCourse.status == {Status.active.value})",
         secondaryjoin="Course.course_id == foreign(StudentCourse.course_id)",
-        back_populates="students_enrolled"
+        back_populates="students_enrolled",
+        lazy=LAZY
     )
     courses_rated: Mapped[List['Course']] = relationship(
         secondary="students_ratings",
-        back_populates="students_rated")
+        back_populates="students_rated", lazy=LAZY)
 
     sections_visited: Mapped[List['Section']] = relationship(
-        secondary="students_sections", back_populates="students_visited")
+        secondary="students_sections", back_populates="students_visited", lazy=LAZY)
 
     def __repr__(self):
         return f"<Student(student_id={self.student_id}, first_name={self.first_name}, last_name={self.last_name})>"
@@ -99,30 +106,42 @@ class Student(Base):
 
 class Course(Base):
     __tablename__ = "courses"
+    __table_args__ = (
+        Index('ix_courses_is_hidden_rating', 'is_hidden', 'rating'),  # catalog rating filter: visible courses rated >= r
+        # catalog order: visible courses by rank_score, course_id breaking ties, read in index order
+        Index('ix_courses_is_hidden_rank_score', 'is_hidden', 'rank_score', 'course_id'),
+    )
 
     course_id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(50), unique=True)
     description: Mapped[str] = mapped_column(String(250))
     objectives: Mapped[str] = mapped_column(String(250))
-    owner_id: Mapped[int] = mapped_column(ForeignKey('teachers.teacher_id'))
+    owner_id: Mapped[int] = mapped_column(ForeignKey('teachers.teacher_id'), index=True)
     is_premium: Mapped[Optional[bool]] = mapped_column(server_default='0')
     is_hidden: Mapped[Optional[bool]] = mapped_column(server_default='0')
     home_page_picture: Mapped[Optional[bytes]]
     rating: Mapped[Optional[float]]
     people_rated: Mapped[Optional[int]] = mapped_column(server_default='0')
-
-    owner: Mapped['Teacher'] = relationship(back_populates="courses")
+    # Bayesian average of rating and people_rated (core/ranking.py), kept current by crud_course.update_rating
+    # rows inserted outside the ORM (the seed, raw SQL) start at the score of an unrated course, like ORM inserts
+    rank_score: Mapped[float] = mapped_column(Double, default=default_rank_score,
+                                              server_default=str(rank_score(None, 0)))
+    # bumped by every change to what the course pages show, the ETag of GET .../courses/{course_id}
+    version: Mapped[int] = mapped_column(server_default='1')
+
+    owner: Mapped['Teacher'] = relationship(back_populates="courses", lazy=LAZY)
     students_enrolled: Mapped[List['Student']] = relationship(
         secondary="students_courses",
-        back_populates="courses_enrolled"
+        back_populates="courses_enrolled",
+        lazy=LAZY
     )
     students_rated: Mapped[List['Student']] = relationship(
         secondary="students_ratings",
-        back_populates="courses_rated")
+        back_populates="courses_rated", lazy=LAZY)
 
-    sections: Mapped[List['Section']] = relationship(back_populates="course")
+    sections: Mapped[List['Section']] = relationship(back_populates="course", lazy=LAZY)
     tags: Mapped[List['Tag']] = relationship(
-        secondary="courses_tags", back_populates="courses")
+        secondary="courses_tags", back_populates="courses", lazy=LAZY)
 
     def __repr__(self):
         return f"<Course(course_id={self.course_id}, title={self.title}, owner_id={self.owner_id})>"
@@ -130,6 +149,10 @@ class Course(Base):
 
 class StudentCourse(Base):
     __tablename__ = 'students_courses'
+    __table_args__ = (
+        Index('ix_students_courses_student_id_status', 'student_id', 'status'),  # a student's active/pending courses
+        Index('ix_students_courses_course_id_status', 'course_id', 'status'),  # a course's students, pending requests
+    )
 
     student_id: Mapped[int] = mapped_column(
         ForeignKey('students.student_id'), primary_key=True)
@@ -148,7 +171,7 @@ class StudentRating(Base):
     student_id: Mapped[int] = mapped_column(
         ForeignKey('students.student_id'), primary_key=True)
     course_id: Mapped[int] = mapped_column(
-        ForeignKey('courses.course_id'), primary_key=True)
+        ForeignKey('courses.course_id'), primary_key=True, index=True)
     rating: Mapped[float]
 
     def __repr__(self):
@@ -163,11 +186,11 @@ class Section(Base):
     content_type: Mapped[ContentType]
     external_link: Mapped[Optional[str]] = mapped_column(String(500))
     description: Mapped[Optional[str]] = mapped_column(String(250))
-    course_id: Mapped[int] = mapped_column(ForeignKey('courses.course_id'))
+    course_id: Mapped[int] = mapped_column(ForeignKey('courses.course_id'), index=True)
 
-    course: Mapped['Course'] = relationship(back_populates="sections")
+    course: Mapped['Course'] = relationship(back_populates="sections", lazy=LAZY)
     students_visited: Mapped[List['Student']] = relationship(
-        secondary="students_sections", back_populates="sections_visited")
+        secondary="students_sections", back_populates="sections_visited", lazy=LAZY)
 
     def __repr__(self):
         return f"<Section(section_id={self.section_id}, title={self.title}, course_id={self.course_id})>"
@@ -192,7 +215,7 @@ class Tag(Base):
     name: Mapped[str] = mapped_column(String(45), unique=True)
 
     courses: Mapped[List['Course']] = relationship(
-        secondary="courses_tags", back_populates="tags")
+        secondary="courses_tags", back_populates="tags", lazy=LAZY)
 
     def __repr__(self):
         return f"<Tag(tag_id={self.tag_id}, name={self.name})>"
@@ -201,13 +224,72 @@ class Tag(Base):
         return f'#{self.name}'
 
 
+# Full-text documents of the courses (db/search.py). Not a mapped table: MariaDB and SQLite need different
+# DDL, an InnoDB table with FULLTEXT indexes vs an FTS5 virtual table keyed by rowid.
+COURSE_SEARCH_MARIADB = """CREATE TABLE course_search (
+    course_id INTEGER NOT NULL PRIMARY KEY,
+    title VARCHAR(50) NOT NULL,
+    body TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    FULLTEXT INDEX ft_course_search_title (title),
+    FULLTEXT INDEX ft_course_search_tags (tags),
+    FULLTEXT INDEX ft_course_search_all (title, body, tags),
+    FOREIGN KEY (course_id) REFERENCES courses (course_id)
+) ENGINE=InnoDB"""
+COURSE_SEARCH_FTS5 = \
+    "CREATE VIRTUAL TABLE course_search USING fts5(title, body, tags, tokenize='unicode61 remove_diacritics 2')"
+
+event.listen(Course.__table__, 'after_create', DDL(COURSE_SEARCH_MARIADB).execute_if(dialect='mysql'))
+event.listen(Course.__table__, 'after_create', DDL(COURSE_SEARCH_FTS5).execute_if(dialect='sqlite'))
+event.listen(Course.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS course_search'))
+
+
 class CourseTag(Base):
     __tablename__ = 'courses_tags'
 
     course_id: Mapped[int] = mapped_column(
         ForeignKey('courses.course_id'), primary_key=True)
     tag_id: Mapped[int] = mapped_column(
-        ForeignKey('tags.tag_id'), primary_key=True)
+        ForeignKey('tags.tag_id'), primary_key=True, index=True)
 
     def __repr__(self):
         return f"<CourseTag(course_id={self.course_id}, tag_id={self.tag_id})>"
+
+
+class TokenRevocation(Base):
+    __tablename__ = 'token_revocations'
+
+    account_id: Mapped[int] = mapped_column(ForeignKey('accounts.account_id'), primary_key=True)
+    # unix milliseconds: the account's tokens issued before this are rejected (logout, password change, deactivation)
+    revoked_before: Mapped[int] = mapped_column(BigInteger)
+
+    def __repr__(self):
+        return f"<TokenRevocation(account_id={self.account_id}, revoked_before={self.revoked_before})>"
+
+
+@event.listens_for(Session, 'before_flush')
+def bump_course_versions(session: Session, flush_context, instances) -> None:
+    """
+    Course.version + 1 for every course whose row, sections, tags or owner's name this flush changes.
+    In SQL, so two concurrent changes never end on the same version.
+    """
+    changed, bumped = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Course) and obj in session.dirty and session.is_modified(obj):
+            obj.version = Course.version + 1
+            bumped.add(obj.course_id)
+        elif isinstance(obj, (Section, CourseTag)) and obj.course_id is not None:
+            changed.add(obj.course_id)
+        elif isinstance(obj, Teacher) and obj in session.dirty:
+            state = inspect(obj)
+            if state.attrs.first_name.history.has_changes() or state.attrs.last_name.history.has_changes():
+                session.connection().execute(
+                    update(Course).where(Course.owner_id == obj.teacher_id).values(version=Course.version + 1))
+
+    if changed - bumped:
+        session.connection().execute(
+            update(Course).where(Course.course_id.in_(changed - bumped)).values(version=Course.version + 1))
+
+
+# the table holding each role's profile, keyed by the account id
+ROLE_MODELS = {Role.admin: Admin, Role.student: Student, Role.teacher: Teacher}
@@ -0,0 +1,124 @@
+"""
+Full-text search over the catalog: one document per course (title, body = description + objectives,
+tags = its tag names) in course_search, kept in sync by the crud functions that change any of them.
+
+MariaDB keeps the documents in an InnoDB table with FULLTEXT indexes, SQLite in an FTS5 table
+(created along with courses, see db/models.py).
+Both answer the same question through matches(): the ids of the matching courses and a relevance
+rank (higher is better), so callers join it like any other subquery and never see the dialect.
+"""
+import re
+from sqlalchemy import Select, and_, column, delete, func, insert, literal, literal_column, or_, select, table
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.functions import LIST_SEPARATOR, string_agg
+from db.models import Course, CourseTag, Tag
+
+COLUMNS = ('title', 'body', 'tags')
+# relevance weight of a hit in each column: a title hit outranks a tag hit, which outranks one in the body
+WEIGHTS = {'title': 10.0, 'body': 1.0, 'tags': 5.0}
+
+# word characters only: a search term can never carry the backends' query operators
+_TERM = re.compile(r'\w+')
+
+
+def terms(text: str | None) -> list[str]:
+    """The words of a search string, what both backends index"""
+    return _TERM.findall(text or '')
+
+
+class Fts5Search:
+    """SQLite: the FTS5 rowid is the course_id, bm25 ranks (lower is better, so it is negated)"""
+    documents = table('course_search', column('rowid'), *(column(name) for name in COLUMNS))
+    key = documents.c.rowid
+
+    def matches(self, words: list[str], columns: tuple[str, ...]) -> Select:
+        # every word as a prefix, all of them required, within the given columns
+        query = ' '.join(f'"{word}"*' for word in words)
+        if columns != COLUMNS:
+            query = f'{{{" ".join(columns)}}} : ({query})'
+
+        match = literal_column('course_search')
+        rank = -func.bm25(match, *(WEIGHTS[name] for name in COLUMNS))
+        return select(self.key.label('course_id'), rank.label('rank')).where(match.op('MATCH')(query))
+
+
+class FulltextSearch:
+    """MariaDB: boolean mode, since natural language mode cannot require every word or match prefixes"""
+    documents = table('course_search', column('course_id'), *(column(name) for name in COLUMNS))
+    key = documents.c.course_id
+
+    # InnoDB defaults: shorter words and these stopwords are left out of the FULLTEXT index
+    MIN_TOKEN_SIZE = 3
+    STOPWORDS = frozenset('a about an are as at be by com de en for from how i in is it la of on or that the this '
+                          'to was what when where who will with und www'.split())
+
+    def indexed(self, word: str) -> bool:
+        return len(word) >= self.MIN_TOKEN_SIZE and word.lower() not in self.STOPWORDS
+
+    def matches(self, words: list[str], columns: tuple[str, ...]) -> Select:
+        # each column set used here has its FULLTEXT index, MATCH needs one on exactly those columns
+        indexed = [word for word in words if self.indexed(word)]
+        # words the index does not hold ('AI', 'Go', 'C') are matched as word prefixes by a REGEXP instead,
+        # over what MATCH found, or over every document when no word is indexed
+        unindexed = [or_(*(self.documents.c[name].regexp_match(rf'(?i)\b{word}') for name in columns))
+                     for word in words if not self.indexed(word)]
+        if not indexed:
+            return select(self.key.label('course_id'), literal(0.0).label('rank')).where(and_(*unindexed))
+
+        query = ' '.join(f'+{word}*' for word in indexed)
+        rank = mysql.match(*(self.documents.c[name] for name in columns), against=query).in_boolean_mode()
+        return select(self.key.label('course_id'), rank.label('rank')).where(rank > 0, *unindexed)
+
+
+BACKENDS = {
+    'sqlite': Fts5Search(),
+    'mysql': FulltextSearch(),
+}
+
+
+def get_backend(db: AsyncSession) -> Fts5Search | FulltextSearch:
+    dialect = db.bind.dialect.name
+    if dialect not in BACKENDS:
+        raise NotImplementedError(f'no course search for {dialect}')
+    return BACKENDS[dialect]
+
+
+def matches(db: AsyncSession, text: str, columns: tuple[str, ...] = COLUMNS):
+    """
+    Subquery of (course_id, rank) of the courses whose columns hold every word of text, as a word prefix.
+    None when text has no words, there is nothing to filter by.
+    """
+    words = terms(text)
+    if not words:
+        return None
+    return get_backend(db).matches(words, columns).subquery()
+
+
+def document(*where) -> Select:
+    """(course_id, title, body, tags) of the courses matching where, as course_search stores them"""
+    tags = (select(string_agg(Tag.name))
+            .join(CourseTag, CourseTag.tag_id == Tag.tag_id)
+            .where(CourseTag.course_id == Course.course_id)
+            .scalar_subquery())
+    return select(Course.course_id, Course.title, Course.description + '\n' + Course.objectives,
+                  func.replace(func.coalesce(tags, ''), LIST_SEPARATOR, ' ')).where(*where)
+
+
+async def index_course(db: AsyncSession, course_id: int) -> None:
+    """
+    Rewrites the course's document from its current row and tags, in the caller's transaction:
+    call it after the change is flushed and before the commit.
+    """
+    backend = get_backend(db)
+    await db.execute(delete(backend.documents).where(backend.key == course_id))
+    await db.execute(insert(backend.documents).from_select(
+        [backend.key.name, *COLUMNS], document(Course.course_id == course_id)))
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """Indexes every course again, for a database whose course_search was filled outside the crud layer"""
+    backend = get_backend(db)
+    await db.execute(delete(backend.documents))
+    await db.execute(insert(backend.documents).from_select([backend.key.name, *COLUMNS], document()))
+    await db.commit()
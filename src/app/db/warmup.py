@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from core.settings import settings
+from crud import crud_course, crud_student, crud_teacher, crud_user
+from db import database
+from db.models import Role, Student, Teacher
+
+
+logger = logging.getLogger('poodle.warmup')
+
+# GET /system/ready answers from this, a load balancer should not route here before "ready" is true
+state = {"ready": False, "connections": 0, "duration": None, "error": None}
+
+# Ids that match nothing: the point is compiling and caching the statements, not the rows.
+NO_ID = 0
+
+
+async def open_connections(engine: AsyncEngine, count: int) -> int:
+    """Opens count connections at once and hands them back to the pool, which keeps up to pool_size of them"""
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    await asyncio.gather(*(ping() for _ in range(count)))
+    return count
+
+
+async def run_hot_queries(session_factory) -> None:
+    """Runs each hot query once so its compiled form is in the engine's statement cache before real traffic"""
+    student, teacher = Student(student_id=NO_ID), Teacher(teacher_id=NO_ID)
+
+    async with session_factory() as db:
+        await crud_user.exists(db, email='')
+        for role in Role:
+            await crud_user.get_principal(db, email='', role=role)
+        await crud_course.get_all_courses(db, pages=1, items_per_page=1)
+        await crud_course.get_course_by_id(db, NO_ID)
+        await crud_student.get_my_courses(db, student)
+        await crud_student.is_student_enrolled(db, student, NO_ID)
+        await crud_student.view_pending_requests(db, student)
+        await crud_teacher.view_pending_requests(db, teacher)
+
+
+async def warm_up(count: int = None) -> dict:
+    """Pre-opens pooled connections and primes the statement cache on the primary and every replica"""
+    count = settings.DB_WARMUP_CONNECTIONS if count is None else count
+    state.update(ready=False, connections=0, duration=None, error=None)
+    started_at = time.perf_counter()
+
+    try:
+        if count > 0:
+            _, session_factory = database.init_engine()
+            targets = [(database.engine, session_factory)]
+            targets += zip(database.replica_engines, database.ReplicaSessionLocals)
+
+            for engine, factory in targets:
+                state["connections"] += await open_connections(engine, count)
+                await run_hot_queries(factory)
+    except Exception as e:
+        # stay not ready, the orchestrator keeps the old instance until this one is restarted
+        state["error"] = repr(e)
+        logger.exception('db warm-up failed')
+        return state
+
+    state.update(ready=True, duration=round(time.perf_counter() - started_at, 3))
+    return state
@@ -1,5 +1,6 @@
 from mailjet_rest import Client
 import os
+from core.offload import run_in_pool
 
 
 def email_vars_setup():
@@ -66,4 +67,5 @@ async def build_teacher_enroll_request(receiver_mail: str,
 
 
 async def send_email(data):
-    mailjet.send.create(data)
+    # the mailjet client is blocking HTTP
+    await run_in_pool(mailjet.send.create, data)
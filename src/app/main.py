@@ -1,15 +1,43 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from db import models
-from db import database
-from db.database import get_engine_and_session
+from db import database, warmup
+from core import hashing, offload, revocation, tag_index
+from core.settings import settings
+from core.sql_instrumentation import sql_instrumentation_middleware
 from api.api_v1.api import api_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_engine()
+    # in the background, the app answers /system/ready with 503 until the pool is warm
+    warmup_task = asyncio.create_task(warmup.warm_up())
+    tasks = [warmup_task]
+    # before serving: made on the first unknown-email login, it would make that one login a hash slower
+    await hashing.get_dummy_hash()
+    await revocation.load_on_startup(database.SessionLocal)
+    if settings.TOKEN_REVOCATION_REFRESH > 0:
+        tasks.append(asyncio.create_task(
+            revocation.keep_in_sync(database.SessionLocal, settings.TOKEN_REVOCATION_REFRESH)))
+    if settings.TAG_INDEX_REFRESH > 0:
+        tasks.append(asyncio.create_task(
+            tag_index.keep_in_sync(database.SessionLocal, settings.TAG_INDEX_REFRESH)))
+    yield
+    for task in tasks:
+        task.cancel()
+    await database.dispose_engine()
+    offload.shutdown_executor()
+    hashing.pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.middleware('http')(sql_instrumentation_middleware)
 app.include_router(api_router)
 
 if __name__ == '__main__':
     database.create_db_if_missing()
-    engine = get_engine_and_session()[0]
-    models.Base.metadata.create_all(bind=engine)
+    models.Base.metadata.create_all(bind=database.get_sync_engine())
     uvicorn.run('main:app', host='127.0.0.1', port=8000)
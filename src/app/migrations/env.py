@@ -9,9 +9,11 @@ from alembic import context
 # !
 from core.settings import settings
 from db.models import *
+from db.database import get_sync_url
 
 config = context.config  # the .replace below is bcs alembic requires %'s to be escaped with %
-config.set_main_option('sqlalchemy.url', settings.DB_URL.replace('%', '%%'))
+# alembic runs on the blocking driver, the app itself uses the async one
+config.set_main_option('sqlalchemy.url', get_sync_url(settings.DB_URL).render_as_string(hide_password=False).replace('%', '%%'))
 # !
 
 # Interpret the config file for Python logging.
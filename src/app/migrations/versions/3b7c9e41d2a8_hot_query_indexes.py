@@ -0,0 +1,65 @@
+"""hot query indexes
+
+Revision ID: 3b7c9e41d2a8
+Revises: f6ec6e5b7618
+Create Date: 2026-10-16 10:12:31.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7c9e41d2a8'
+down_revision: Union[str, None] = 'f6ec6e5b7618'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns), matched to the filters/sorts in crud_course, crud_student, crud_teacher and crud_section.
+# accounts(email, is_deactivated) is left out on purpose: the unique index on email already makes those lookups
+# a single-row probe, a second index would only cost writes.
+INDEXES = [
+    # get_all_courses: is_hidden = 0 ORDER BY rating DESC
+    ('ix_courses_is_hidden_rating', 'courses', ['is_hidden', 'rating']),
+    # teacher's courses, reports, pending requests
+    ('ix_courses_owner_id', 'courses', ['owner_id']),
+    # get_my_courses, is_student_enrolled, premium courses count (the PK only covers student_id, course_id)
+    ('ix_students_courses_student_id_status', 'students_courses', ['student_id', 'status']),
+    # has_students, teacher pending requests, enrolled students of a course
+    ('ix_students_courses_course_id_status', 'students_courses', ['course_id', 'status']),
+    # sections of a course, progress counts
+    ('ix_sections_course_id', 'sections', ['course_id']),
+    # admin rating lookup per course
+    ('ix_students_ratings_course_id', 'students_ratings', ['course_id']),
+    # courses of a tag, tag usage count
+    ('ix_courses_tags_tag_id', 'courses_tags', ['tag_id']),
+]
+
+# On MariaDB these become the index backing the foreign key on their first column, so InnoDB drops its own
+# implicit one and refuses to drop ours later. Downgrade leaves a plain index on that column in their place.
+FK_BACKING = {
+    'ix_courses_owner_id',
+    'ix_students_courses_course_id_status',
+    'ix_sections_course_id',
+    'ix_students_ratings_course_id',
+    'ix_courses_tags_tag_id',
+}
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    is_mysql = op.get_context().dialect.name == 'mysql'
+
+    for name, table, columns in reversed(INDEXES):
+        if is_mysql and name in FK_BACKING:
+            if len(columns) == 1:
+                # already the plain FK index InnoDB would have created
+                continue
+            op.create_index(f'{table}_{columns[0]}_fk', table, columns[:1])
+        op.drop_index(name, table_name=table)
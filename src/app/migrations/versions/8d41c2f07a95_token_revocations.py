@@ -0,0 +1,32 @@
+"""token revocations
+
+Revision ID: 8d41c2f07a95
+Revises: 3b7c9e41d2a8
+Create Date: 2026-10-16 15:02:47.530921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41c2f07a95'
+down_revision: Union[str, None] = '3b7c9e41d2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'token_revocations',
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('revoked_before', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.account_id']),
+        sa.PrimaryKeyConstraint('account_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('token_revocations')
@@ -0,0 +1,40 @@
+"""course rank score
+
+Revision ID: a93d5e07b2f4
+Revises: e1b94f3a6c28
+Create Date: 2026-10-16 20:48:36.201587
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from core import ranking
+from core.settings import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93d5e07b2f4'
+down_revision: Union[str, None] = 'e1b94f3a6c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# core/ranking.py in SQL, one statement for all the courses. Re-run it after changing the prior settings;
+# the server default (the score of an unrated course) keeps the prior it was migrated with.
+BACKFILL = """UPDATE courses SET rank_score = COALESCE(
+    (:prior_votes * :prior_mean + COALESCE(rating, 0) * COALESCE(people_rated, 0))
+    / NULLIF(:prior_votes + COALESCE(people_rated, 0), 0), 0)"""
+
+
+def upgrade() -> None:
+    op.add_column('courses', sa.Column('rank_score', sa.Double(), server_default=str(ranking.rank_score(None, 0)),
+                                       nullable=False))
+    op.execute(sa.text(BACKFILL).bindparams(prior_votes=float(settings.CATALOG_RANK_PRIOR_VOTES),
+                                            prior_mean=float(settings.CATALOG_RANK_PRIOR_MEAN)))
+    op.create_index('ix_courses_is_hidden_rank_score', 'courses', ['is_hidden', 'rank_score', 'course_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_courses_is_hidden_rank_score', table_name='courses')
+    op.drop_column('courses', 'rank_score')
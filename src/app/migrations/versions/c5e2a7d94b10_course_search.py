@@ -0,0 +1,57 @@
+"""course search
+
+Revision ID: c5e2a7d94b10
+Revises: 8d41c2f07a95
+Create Date: 2026-10-16 17:40:12.804113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a7d94b10'
+down_revision: Union[str, None] = '8d41c2f07a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# one document per course, see db/search.py. MATCH needs a FULLTEXT index on exactly the columns it searches:
+# title for the name filter, tags for the tag filter, all three for the ranked search.
+MARIADB_DDL = """CREATE TABLE course_search (
+    course_id INTEGER NOT NULL PRIMARY KEY,
+    title VARCHAR(50) NOT NULL,
+    body TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    FULLTEXT INDEX ft_course_search_title (title),
+    FULLTEXT INDEX ft_course_search_tags (tags),
+    FULLTEXT INDEX ft_course_search_all (title, body, tags),
+    FOREIGN KEY (course_id) REFERENCES courses (course_id)
+) ENGINE=InnoDB"""
+
+MARIADB_BACKFILL = """INSERT INTO course_search (course_id, title, body, tags)
+SELECT c.course_id, c.title, CONCAT(c.description, '\\n', c.objectives),
+       COALESCE((SELECT GROUP_CONCAT(t.name SEPARATOR ' ') FROM tags t
+                 JOIN courses_tags ct ON ct.tag_id = t.tag_id WHERE ct.course_id = c.course_id), '')
+FROM courses c"""
+
+FTS5_DDL = "CREATE VIRTUAL TABLE course_search USING fts5(title, body, tags, tokenize='unicode61 remove_diacritics 2')"
+
+FTS5_BACKFILL = """INSERT INTO course_search (rowid, title, body, tags)
+SELECT c.course_id, c.title, c.description || char(10) || c.objectives,
+       COALESCE((SELECT group_concat(t.name, ' ') FROM tags t
+                 JOIN courses_tags ct ON ct.tag_id = t.tag_id WHERE ct.course_id = c.course_id), '')
+FROM courses c"""
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == 'mysql':
+        op.execute(MARIADB_DDL)
+        op.execute(MARIADB_BACKFILL)
+    else:
+        op.execute(FTS5_DDL)
+        op.execute(FTS5_BACKFILL)
+
+
+def downgrade() -> None:
+    op.execute('DROP TABLE course_search')
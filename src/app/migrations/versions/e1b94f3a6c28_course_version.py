@@ -0,0 +1,27 @@
+"""course version
+
+Revision ID: e1b94f3a6c28
+Revises: c5e2a7d94b10
+Create Date: 2026-10-16 19:21:05.417836
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b94f3a6c28'
+down_revision: Union[str, None] = 'c5e2a7d94b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing courses start at 1 like new ones, clients holding no ETag yet lose nothing
+    op.add_column('courses', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('courses', 'version')
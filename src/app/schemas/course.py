@@ -33,6 +33,31 @@ class CourseInfo(BaseModel):
         )
 
 
+class TagFacet(BaseModel):
+    tag: str
+    count: int
+
+
+class RatingFacet(BaseModel):
+    rating: int | None  # courses rated rating <= r < rating + 1, None for unrated courses
+    count: int
+
+
+class OwnerFacet(BaseModel):
+    teacher_id: int
+    owner_names: str
+    count: int
+
+
+class CourseFacets(BaseModel):
+    total: int
+    premium: int
+    free: int
+    tags: list[TagFacet] = []
+    ratings: list[RatingFacet] = []
+    owners: list[OwnerFacet] = []
+
+
 class CourseUpdate(BaseModel):
     title: Annotated[str, StringConstraints(min_length=1)]
     description: Annotated[str, StringConstraints(min_length=1)]
@@ -1,7 +1,9 @@
+import pytest
 from fastapi.testclient import TestClient
+from core import catalog_cache, rate_limit
 from db.models import Account
-from core.security import Token
-from schemas.course import CourseInfo
+from core.security import Token, TokenData
+from schemas.course import CourseFacets, CourseInfo, TagFacet
 from fastapi import status
 
 
@@ -15,6 +17,15 @@ token = Token(access_token='valid_token',
               token_type='bearer')
 
 
+@pytest.fixture(autouse=True)
+def clear_login_limits():
+    rate_limit.ip_limiter.clear()
+    rate_limit.username_limiter.clear()
+    yield
+    rate_limit.ip_limiter.clear()
+    rate_limit.username_limiter.clear()
+
+
 def create_course():
     return CourseInfo(title='title1',
                       description='Test Course',
@@ -49,11 +60,47 @@ def test_login_raises_401_when_incorrect_credentials(client: TestClient, mocker)
     assert response.json() == {'detail': 'Invalid credentials'}
 
 
+def test_login_returns_429_before_checking_credentials_when_over_limit(client: TestClient, mocker):
+    try_login = mocker.patch('api.api_v1.routes.public.crud_user.try_login', return_value=None)
+    login_data = {
+        'username': 'dummy@mail.com',
+        'password': 'dummy pass'
+    }
+
+    for _ in range(rate_limit.username_limiter.limit):
+        client.post('/login', data=login_data)
+    response = client.post('/login', data=login_data)
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert 'Retry-After' in response.headers
+    assert try_login.call_count == rate_limit.username_limiter.limit
+
+
+def test_logout_revokes_tokens_of_account(client: TestClient, mocker):
+    mocker.patch('api.api_v1.routes.public.verify_token_access',
+                 return_value=TokenData(email='dummy@mail.com', role='student'))
+    revoke = mocker.patch('api.api_v1.routes.public.crud_user.revoke_tokens')
+
+    response = client.post('/logout', headers={'Authorization': 'Bearer valid_token'})
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    revoke.assert_awaited_once_with(None, 'dummy@mail.com')
+
+
+def test_logout_raises_401_when_token_invalid(client: TestClient, mocker):
+    mocker.patch('api.api_v1.routes.public.verify_token_access', return_value='Invalid token')
+
+    response = client.post('/logout', headers={'Authorization': 'Bearer bad_token'})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json() == {'detail': 'Invalid token'}
+
+
 def test_get_all_courses_returns_all_courses_if_courses(client: TestClient, mocker):
     courses = [create_course(),
                create_course(),
                create_course()]
-    mocker.patch('api.api_v1.routes.public.crud_course.get_all_courses', return_value=courses)
+    mocker.patch('api.api_v1.routes.public.crud_course.get_courses_page', return_value=(courses, None))
 
     response = client.get('/courses/')
     assert response.status_code == status.HTTP_200_OK
@@ -72,8 +119,79 @@ def test_get_all_courses_returns_all_courses_if_courses(client: TestClient, mock
 
 def test_get_all_courses_returns_empty_list_if_no_courses(client: TestClient, mocker):
     courses = []
-    mocker.patch('api.api_v1.routes.public.crud_course.get_all_courses', return_value=courses)
+    mocker.patch('api.api_v1.routes.public.crud_course.get_courses_page', return_value=(courses, None))
 
     response = client.get('/courses/')
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == []
+    assert 'x-next-cursor' not in response.headers
+
+
+def test_get_course_facets_passes_the_catalog_filters(client: TestClient, mocker):
+    facets = CourseFacets(total=2, premium=1, free=1, tags=[TagFacet(tag='python', count=2)])
+    get_facets = mocker.patch('api.api_v1.routes.public.crud_course.get_facets', return_value=facets)
+
+    response = client.get('/courses/facets', params={'tags': ['python', 'web*'], 'is_premium': 'true', 'rating': 3})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == facets.model_dump()
+    assert get_facets.call_args.kwargs['tags'] == ['python', 'web*']
+    assert get_facets.call_args.kwargs['is_premium'] is True
+    assert get_facets.call_args.kwargs['rating'] == 3
+
+
+def test_get_all_courses_returns_next_cursor_header_and_passes_cursor(client: TestClient, mocker):
+    get_page = mocker.patch('api.api_v1.routes.public.crud_course.get_courses_page',
+                            return_value=([create_course()], 'next'))
+
+    response = client.get('/courses', params={'cursor': 'abc', 'items_per_page': 1})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['x-next-cursor'] == 'next'
+    assert get_page.call_args.kwargs['cursor'] == 'abc'
+    assert get_page.call_args.kwargs['items_per_page'] == 1
+
+
+def test_get_all_courses_is_served_from_the_cache_until_the_catalog_changes(client: TestClient, mocker):
+    get_page = mocker.patch('api.api_v1.routes.public.crud_course.get_courses_page',
+                            return_value=([create_course()], 'next'))
+
+    first = client.get('/courses', params={'tag': 'Python', 'items_per_page': 1})
+    second = client.get('/courses', params={'tag': 'python!', 'items_per_page': 1})
+    catalog_cache.bump()
+    third = client.get('/courses', params={'tag': 'python', 'items_per_page': 1})
+
+    assert first.content == second.content == third.content
+    assert second.headers['x-next-cursor'] == 'next'
+    assert get_page.call_count == 2
+
+
+def test_get_course_facets_is_cached(client: TestClient, mocker):
+    get_facets = mocker.patch('api.api_v1.routes.public.crud_course.get_facets',
+                              return_value=CourseFacets(total=0, premium=0, free=0))
+
+    responses = [client.get('/courses/facets', params={'rating': 5}) for _ in range(3)]
+
+    assert all(r.json() == responses[0].json() for r in responses)
+    assert get_facets.call_count == 1
+
+
+def test_get_all_courses_answers_a_matching_if_none_match_with_304(client: TestClient, mocker):
+    get_page = mocker.patch('api.api_v1.routes.public.crud_course.get_courses_page',
+                            return_value=([create_course()], 'next'))
+
+    first = client.get('/courses')
+    catalog_cache.bump()
+    unchanged = client.get('/courses', headers={'If-None-Match': first.headers['etag']})
+    from_cache = client.get('/courses', headers={'If-None-Match': '*'})
+    get_page.return_value = ([], None)
+    catalog_cache.bump()
+    changed = client.get('/courses', headers={'If-None-Match': first.headers['etag']})
+
+    assert first.headers['cache-control'].startswith('public, max-age=')
+    assert unchanged.status_code == from_cache.status_code == status.HTTP_304_NOT_MODIFIED
+    assert unchanged.content == b''
+    assert unchanged.headers['x-next-cursor'] == 'next'
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.json() == []
+    assert get_page.call_count == 3
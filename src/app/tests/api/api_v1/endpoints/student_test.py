@@ -1,7 +1,7 @@
 import io
 import pytest
 from fastapi.testclient import TestClient
-from core.oauth import get_student_required
+from core.oauth import get_student_required, get_student_with_enrollments
 from db.models import Account, Student, Course, Teacher, Section
 from core.security import Token
 from fastapi import status
@@ -243,7 +243,7 @@ def test_view_pending_courses_returns_empty_list_when_no_courses(client: TestCli
 
 
 def test_view_course_raises_404_when_no_such_course(client: TestClient, mocker):
-    mocker.patch('api.api_v1.routes.students.crud_course.get_course_by_id', return_value=None)
+    mocker.patch('api.api_v1.routes.students.crud_course.get_course_version', return_value=None)
     course_id = 1
 
     response = client.get(f'/students/courses/{course_id}')
@@ -254,7 +254,7 @@ def test_view_course_raises_404_when_no_such_course(client: TestClient, mocker):
 
 
 def test_view_course_raises_409_when_not_enrolled(client: TestClient, mocker):
-    mocker.patch('api.api_v1.routes.students.crud_course.get_course_by_id', return_value=dummy_course)
+    mocker.patch('api.api_v1.routes.students.crud_course.get_course_version', return_value=1)
     mocker.patch('api.api_v1.routes.students.crud_student.is_student_enrolled', return_value=False)
     course_id = 1
 
@@ -266,10 +266,11 @@ def test_view_course_raises_409_when_not_enrolled(client: TestClient, mocker):
 
 
 def test_view_course_returns_course_info(client: TestClient, mocker):
-    mocker.patch('api.api_v1.routes.students.crud_course.get_course_by_id',
-                 return_value=dummy_course)
+    mocker.patch('api.api_v1.routes.students.crud_course.get_course_version', return_value=1)
     mocker.patch('api.api_v1.routes.students.crud_student.is_student_enrolled',
                  return_value=True)
+    mocker.patch('api.api_v1.routes.students.crud_student.count_viewed_sections',
+                 return_value=0)
     mocker.patch('api.api_v1.routes.students.crud_student.get_course_information',
                  return_value=dummy_student_course_info)
     course_id = 1
@@ -279,6 +280,28 @@ def test_view_course_returns_course_info(client: TestClient, mocker):
 
     assert response.status_code == status.HTTP_200_OK
     assert data == dummy_student_course_info
+    assert response.headers['cache-control'] == 'private, no-cache'
+
+
+def test_view_course_returns_304_until_course_or_progress_change(client: TestClient, mocker):
+    version = mocker.patch('api.api_v1.routes.students.crud_course.get_course_version', return_value=1)
+    mocker.patch('api.api_v1.routes.students.crud_student.is_student_enrolled', return_value=True)
+    viewed = mocker.patch('api.api_v1.routes.students.crud_student.count_viewed_sections', return_value=0)
+    get_info = mocker.patch('api.api_v1.routes.students.crud_student.get_course_information',
+                            return_value=dummy_student_course_info)
+
+    etag = client.get('/students/courses/1').headers['etag']
+    not_modified = client.get('/students/courses/1', headers={'If-None-Match': etag})
+    viewed.return_value = 1
+    progressed = client.get('/students/courses/1', headers={'If-None-Match': etag})
+    viewed.return_value, version.return_value = 0, 2
+    edited = client.get('/students/courses/1', headers={'If-None-Match': etag})
+
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not_modified.headers['etag'] == etag
+    assert not_modified.content == b''
+    assert progressed.status_code == edited.status_code == status.HTTP_200_OK
+    assert get_info.call_count == 3
 
 
 def test_view_course_section_raises_404_when_no_course(client: TestClient, mocker):
@@ -399,7 +422,7 @@ def test_subscribe_for_course_raises_403_when_premium_required(client: TestClien
 
 def test_subscribe_for_course_raises_400_when_premium_limit_reached(client: TestClient, mocker):
     course = Course(title='Test Course', is_premium=True)
-    client.app.dependency_overrides[get_student_required] = override_get_current_student
+    client.app.dependency_overrides[get_student_with_enrollments] = override_get_current_student
     course_limit_reached = 6
 
     mocker.patch('api.api_v1.routes.students.crud_course.get_course_by_id', return_value=course)
@@ -415,7 +438,7 @@ def test_subscribe_for_course_raises_400_when_premium_limit_reached(client: Test
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert data['detail'] == 'Premium courses limit reached'
 
-    client.app.dependency_overrides[get_student_required] = lambda: dummy_student
+    client.app.dependency_overrides[get_student_with_enrollments] = lambda: dummy_student
 
 
 def test_subscribe_for_course_returns_correct_msg_when_success(client: TestClient, mocker):
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+from fastapi import status
+from main import app
+
+
+def test_get_stats_returns_db_pool_stats(client: TestClient, mocker):
+    pool_stats = {'initialized': True, 'pool': 'QueuePool', 'size': 10, 'checkedout': 1, 'overflow': -9}
+    mocker.patch('api.api_v1.routes.system.get_pool_stats', return_value=pool_stats)
+
+    response = client.get('/system/stats')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['db_pool'] == pool_stats
+
+
+def test_get_stats_returns_offload_stats(client: TestClient, mocker):
+    offload_stats = {'pool_size': 10, 'submitted': 3, 'completed': 3, 'in_flight': 0, 'wait_avg': 0.001}
+    mocker.patch('api.api_v1.routes.system.get_offload_stats', return_value=offload_stats)
+
+    response = client.get('/system/stats')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['offload'] == offload_stats
+
+
+def test_readiness_returns_503_until_warm_up_completes(mocker):
+    mocker.patch.dict('db.warmup.state', {'ready': False})
+
+    # no lifespan, so no warm-up task racing the patched state
+    response = TestClient(app).get('/system/ready')
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_readiness_returns_200_when_warm(mocker):
+    mocker.patch.dict('db.warmup.state', {'ready': True})
+
+    response = TestClient(app).get('/system/ready')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['ready'] is True
@@ -364,6 +364,7 @@ def test_get_courses_returns_list_of_courses(client: TestClient, mocker):
     ]    
 
 def test_view_course_by_id_returns_CourseSectionsTags_object(client: TestClient, mocker):
+    mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_owner_and_version', return_value=dummy_course)
     mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_common_info', return_value=dummy_course)
     mocker.patch('api.api_v1.routes.teachers.crud_teacher.validate_course_access', return_value=(True, "OK"))
     mocker.patch('api.api_v1.routes.teachers.crud_teacher.get_entire_course', 
@@ -388,6 +389,28 @@ def test_view_course_by_id_returns_CourseSectionsTags_object(client: TestClient,
         "sections": []
     }
     
+def test_view_course_by_id_returns_304_when_etag_matches(client: TestClient, mocker):
+    course = Course(course_id=1, version=1, owner_id=dummy_teacher.teacher_id)
+    mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_owner_and_version', return_value=course)
+    common_info = mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_common_info', return_value=course)
+    mocker.patch('api.api_v1.routes.teachers.crud_teacher.validate_course_access', return_value=(True, "OK"))
+    get_entire_course = mocker.patch('api.api_v1.routes.teachers.crud_teacher.get_entire_course',
+                                     return_value=CourseSectionsTags(course=dummy_coursebase, tags=[], sections=[]))
+
+    first = client.get('/teachers/courses/1')
+    cached = client.get('/teachers/courses/1', headers={'If-None-Match': f'W/{first.headers["etag"]}, "other"'})
+    sorted_ = client.get('/teachers/courses/1?sort=desc', headers={'If-None-Match': first.headers['etag']})
+    sorted_upper = client.get('/teachers/courses/1?sort=DESC', headers={'If-None-Match': sorted_.headers['etag']})
+    course.version = 2
+    changed = client.get('/teachers/courses/1', headers={'If-None-Match': first.headers['etag']})
+
+    assert first.headers['cache-control'] == 'private, no-cache'
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert sorted_.status_code == changed.status_code == status.HTTP_200_OK
+    assert sorted_upper.status_code == status.HTTP_304_NOT_MODIFIED
+    assert changed.headers['etag'] != first.headers['etag']
+    assert get_entire_course.call_count == common_info.call_count == 3
+    
 def test_view_course_by_id_invalid_sort(client: TestClient, mocker):
     response = client.get('/teachers/courses/1?sort=invalid')
 
@@ -401,7 +424,7 @@ def test_view_course_by_id_invalid_sort_by(client: TestClient, mocker):
     assert response.json() == {'detail': 'Invalid sort_by parameter'}
     
 def test_view_course_by_id_access_denied(client: TestClient, mocker):
-    mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_common_info', return_value=dummy_course)
+    mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_owner_and_version', return_value=dummy_course)
     mocker.patch('api.api_v1.routes.teachers.crud_teacher.validate_course_access', return_value=(False, "You do not have permission to access this course"))
 
     response = client.get('/teachers/courses/1')
@@ -580,8 +603,7 @@ def test_deactivate_course(client: TestClient, mocker):
     mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_common_info', return_value=dummy_course)
     mocker.patch('api.api_v1.routes.teachers.crud_teacher.validate_course_access', return_value=(True, "OK"))
     mocker.patch('api.api_v1.routes.teachers.crud_course.hide_course', return_value=None)
-
-    dummy_course.students_enrolled = []
+    mocker.patch('api.api_v1.routes.teachers.crud_course.has_students', return_value=False)
 
     response = client.patch('/teachers/courses/1/deactivate')
 
@@ -592,8 +614,7 @@ def test_deactivate_course(client: TestClient, mocker):
 def test_deactivate_course_with_enrolled_students(client: TestClient, mocker):
     mocker.patch('api.api_v1.routes.teachers.crud_course.get_course_common_info', return_value=dummy_course)
     mocker.patch('api.api_v1.routes.teachers.crud_teacher.validate_course_access', return_value=(True, "OK"))
-
-    dummy_course.students_enrolled = [dummy_student]
+    mocker.patch('api.api_v1.routes.teachers.crud_course.has_students', return_value=True)
 
     response = client.patch('/teachers/courses/1/deactivate')
 
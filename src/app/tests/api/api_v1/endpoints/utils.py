@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.models import Account, Student
 from api.api_v1.routes.utils import change_pass_raise
 from fastapi import HTTPException
@@ -9,7 +9,7 @@ from core.hashing import hash_pass
 from tests import dummies
 
 
-async def create_dummy_student(db: Session) -> tuple[Account, Student]:
+async def create_dummy_student(db: AsyncSession) -> tuple[Account, Student]:
     account_id = 1
     account = Account(
         account_id=account_id,
@@ -23,7 +23,7 @@ async def create_dummy_student(db: Session) -> tuple[Account, Student]:
         last_name='Student'
     )
     db.add_all([account, student])
-    db.commit()
+    await db.commit()
     return account, student
 
 
@@ -1,47 +1,70 @@
+import os
+
+# must be set before the models are imported, an N+1 regression then fails the suite instead of reaching production
+os.environ['STRICT_LOADING'] = 'true'
+# TestClient runs the lifespan, there is no database behind the app to warm up
+os.environ['DB_WARMUP_CONNECTIONS'] = '0'
+os.environ['TOKEN_REVOCATION_REFRESH'] = '0'
+os.environ['TAG_INDEX_REFRESH'] = '0'
+
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, StaticPool
-from sqlalchemy.orm import Session, sessionmaker
-from core.oauth import get_student_required, get_admin_required, get_teacher_required
-from db.database import get_db, Base
+from sqlalchemy import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from core import catalog_cache
+from core.oauth import get_student_required, get_admin_required, get_teacher_required, get_student_with_enrollments
+from db.database import get_catalog_db, get_db, get_read_db, Base
 from main import app
 from tests.api.api_v1.endpoints.student_test import dummy_student
 from tests.api.api_v1.endpoints.teacher_test import dummy_teacher
 from tests import dummies
-from typing import Generator
+from typing import AsyncGenerator
 
 
 @pytest.fixture
-def client():
+def client(mocker):
+    # no token_revocations table to load from
+    mocker.patch('main.revocation.load_on_startup', return_value=0)
     with TestClient(app) as c:
         yield c
 
 
-@pytest.fixture(scope='function')
-def db() -> Generator:
+@pytest_asyncio.fixture(scope='function')
+async def db() -> AsyncGenerator:
     """
-    This fixture returns a session connected to an in-memory SQLite db.
+    This fixture returns an async session connected to an in-memory SQLite db (aiosqlite).
     It's intended for use in tests that require db access but should not
     affect the production db.
     """
 
-    SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
-    )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+    engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=StaticPool)
+    TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     db = TestingSessionLocal()
 
     try:
         yield db
     finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+        await db.close()
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clear_catalog_cache():
+    # routes tests mock crud per test, a response cached by an earlier test would hide the mock
+    catalog_cache.cache.clear()
 
 
 app.dependency_overrides[get_db] = lambda: None
+app.dependency_overrides[get_read_db] = lambda: None
+app.dependency_overrides[get_catalog_db] = lambda: None
 app.dependency_overrides[get_student_required] = lambda: dummy_student
+app.dependency_overrides[get_student_with_enrollments] = lambda: dummy_student
 app.dependency_overrides[get_teacher_required] = lambda: dummy_teacher
 app.dependency_overrides[get_admin_required] = lambda: dummies.get_mock_admin()
@@ -0,0 +1,58 @@
+import pytest
+from core import catalog_cache
+from core.cache import TTLCache
+from crud import crud_admin, crud_course
+from db.models import Course
+from tests import dummies
+
+
+@pytest.fixture
+def small_cache(mocker):
+    cache = TTLCache(maxsize=2, ttl=60)
+    mocker.patch.object(catalog_cache, 'cache', cache)
+    return cache
+
+
+def test_normalized_filters_fold_equivalent_spellings():
+    assert catalog_cache.normalized_filters(tag=' Python!', tags=['Web', 'art', 'web'], match_all_tags=False) == \
+        catalog_cache.normalized_filters(tag='python', tags=['ART', 'web'], match_all_tags=False)
+    # with one tag, all and any are the same filter
+    assert catalog_cache.normalized_filters(tags=['web'], match_all_tags=False) == \
+        catalog_cache.normalized_filters(tags=['web'])
+    assert catalog_cache.normalized_filters(tags=['web', 'art'], match_all_tags=False) != \
+        catalog_cache.normalized_filters(tags=['web', 'art'])
+
+
+def test_key_changes_with_the_version():
+    key = catalog_cache.key('courses', pages=1)
+
+    catalog_cache.bump()
+
+    assert catalog_cache.key('courses', pages=1) != key
+
+
+def test_cache_is_lru_bounded_and_counts_hits(small_cache):
+    for pages in (1, 2, 3):
+        catalog_cache.store(catalog_cache.key('courses', pages=pages), b'[]')
+
+    assert catalog_cache.get(catalog_cache.key('courses', pages=1)) is None
+    assert catalog_cache.get(catalog_cache.key('courses', pages=3)) == b'[]'
+    assert catalog_cache.get_catalog_cache_stats()['hit_ratio'] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_version_moves_on_commit_not_on_rollback(db):
+    course = await dummies.create_dummy_course(db)
+    course_id, version = course.course_id, catalog_cache.version
+
+    await crud_course.update_rating(db, course_id, 8)
+    await db.rollback()
+    assert catalog_cache.version == version
+
+    await crud_course.update_rating(db, course_id, 8)
+    assert catalog_cache.version == version
+    await db.commit()
+    assert catalog_cache.version == version + 1
+
+    await crud_admin.hide_course(db, await db.get(Course, course_id))
+    assert catalog_cache.version == version + 2
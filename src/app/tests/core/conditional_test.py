@@ -0,0 +1,20 @@
+from core import conditional
+
+
+def test_etag_is_strong_and_follows_its_parts():
+    etag = conditional.etag(1, 2, None)
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == conditional.etag(1, 2, None)
+    assert etag != conditional.etag(1, 3, None)
+    assert conditional.etag(b'[]') != conditional.etag(b'[', b']')
+
+
+def test_matches_lists_weak_tags_and_star():
+    etag = conditional.etag(b'[]')
+
+    assert conditional.matches(etag, etag)
+    assert conditional.matches(f'"x", W/{etag}', etag)
+    assert conditional.matches('*', etag)
+    assert not conditional.matches('"x"', etag)
+    assert not conditional.matches(None, etag)
@@ -0,0 +1,92 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from core import hashing
+from core.offload import PoolFull
+from main import app
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    hashing.pool.reset_stats()
+    yield
+    hashing.pool.reset_stats()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_run_on_the_hashing_pool():
+    hashed = await hashing.hash_pass_async('pass')
+
+    assert await hashing.verify_password_async('pass', hashed)
+    assert not await hashing.verify_password_async('wrong', hashed)
+    assert hashing.get_hashing_stats()['completed'] == 3
+
+
+@pytest.mark.asyncio
+async def test_full_pool_raises_503(mocker):
+    mocker.patch.object(hashing.pool, 'run', side_effect=PoolFull())
+
+    with pytest.raises(HTTPException) as e:
+        await hashing.verify_password_async('pass', 'hash')
+
+    assert e.value.status_code == 503
+    assert e.value.headers == {'Retry-After': '1'}
+
+
+def test_build_context_hashes_with_first_scheme_at_configured_cost():
+    context = hashing.build_context(schemes='argon2,bcrypt', bcrypt_rounds=4)
+
+    assert context.default_scheme() == 'argon2'
+    assert context.needs_update(hashing.build_context(bcrypt_rounds=4).hash('pass'))
+
+
+def test_build_context_flags_other_costs_for_update():
+    old_hash = hashing.build_context(bcrypt_rounds=4).hash('pass')
+
+    assert not hashing.build_context(bcrypt_rounds=4).needs_update(old_hash)
+    assert hashing.build_context(bcrypt_rounds=5).needs_update(old_hash)
+
+
+@pytest.mark.asyncio
+async def test_verify_and_update_rehashes_outdated_hashes_on_the_pool(mocker):
+    old_hash = hashing.build_context(bcrypt_rounds=4).hash('pass')
+    mocker.patch.object(hashing, 'pass_context', hashing.build_context(bcrypt_rounds=5))
+
+    assert await hashing.verify_and_update_async('wrong', old_hash) == (False, None)
+    valid, new_hash = await hashing.verify_and_update_async('pass', old_hash)
+
+    assert valid and new_hash.startswith('$2b$05$')
+    assert await hashing.verify_and_update_async('pass', new_hash) == (True, None)
+    # three verifications and the one rehash
+    assert hashing.get_hashing_stats()['completed'] == 4
+
+
+@pytest.mark.asyncio
+async def test_rehash_is_skipped_when_the_pool_is_full(mocker):
+    old_hash = hashing.build_context(bcrypt_rounds=4).hash('pass')
+    mocker.patch.object(hashing, 'pass_context', hashing.build_context(bcrypt_rounds=5))
+    mocker.patch.object(hashing.pool, 'run', side_effect=PoolFull())
+
+    assert await hashing.rehash_async('pass', old_hash) is None
+
+
+@pytest.mark.asyncio
+async def test_dummy_hash_is_made_once(mocker):
+    mocker.patch.object(hashing, '_dummy_hash', None)
+    mocker.patch.object(hashing, 'pass_context', hashing.build_context(bcrypt_rounds=4))
+
+    first = await hashing.get_dummy_hash()
+    second = await hashing.get_dummy_hash()
+
+    assert first is second
+    assert hashing.verify_password(hashing.DUMMY_PASSWORD, first)
+    assert hashing.get_hashing_stats()['submitted'] == 1
+
+
+def test_lifespan_makes_the_dummy_hash_before_serving(mocker):
+    mocker.patch.object(hashing, '_dummy_hash', None)
+    mocker.patch.object(hashing, 'pass_context', hashing.build_context(bcrypt_rounds=4))
+    mocker.patch('main.revocation.load_on_startup', return_value=0)
+
+    with TestClient(app):
+        assert hashing.verify_password(hashing.DUMMY_PASSWORD, hashing._dummy_hash)
@@ -0,0 +1,100 @@
+import pytest
+from fastapi import HTTPException
+from core import oauth, principal_cache
+from core.security import TokenData
+from core.sql_instrumentation import RequestQueries, current_queries
+from crud import crud_student
+from tests import dummies
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    principal_cache.cache.clear()
+    principal_cache.cache.hits = principal_cache.cache.misses = 0
+    yield
+    principal_cache.cache.clear()
+
+
+def token_for(mocker, email='s@s.com', role='student'):
+    mocker.patch('core.oauth.verify_token_access', return_value=TokenData(email=email, role=role))
+    return 'token'
+
+
+async def count_queries(coro) -> tuple:
+    queries = RequestQueries()
+    token = current_queries.set(queries)
+    try:
+        return await coro, queries.count
+    finally:
+        current_queries.reset(token)
+
+
+async def create_enrolled_student(db):
+    course = await dummies.create_dummy_course(db)
+    course.is_premium = True
+    _, student = await dummies.create_dummy_student(db)
+    await dummies.subscribe_dummy_student(db, student.student_id, course.course_id)
+    db.expunge_all()
+    return student, course
+
+
+@pytest.mark.asyncio
+async def test_principal_is_loaded_with_its_account_in_one_query(db, mocker):
+    account, _ = await dummies.create_dummy_student(db)
+    db.expunge_all()
+
+    student, count = await count_queries(oauth.get_student_required(db, token_for(mocker)))
+
+    assert count == 1
+    assert student.account.email == account.email
+    assert student.account.student is student
+
+
+@pytest.mark.asyncio
+async def test_role_claim_mismatch_raises_403_without_queries(db, mocker):
+    await dummies.create_dummy_student(db)
+    queries = RequestQueries()
+    token = current_queries.set(queries)
+
+    try:
+        with pytest.raises(HTTPException) as e:
+            await oauth.get_teacher_required(db, token_for(mocker))
+    finally:
+        current_queries.reset(token)
+
+    assert e.value.status_code == 403
+    assert e.value.detail == 'Teacher required'
+    assert queries.count == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_email_raises_404(db, mocker):
+    with pytest.raises(HTTPException) as e:
+        await oauth.get_student_required(db, token_for(mocker, email='nobody@s.com'))
+
+    assert e.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_enrollments_are_preloaded_for_the_enrollment_checks(db, mocker):
+    _, course = await create_enrolled_student(db)
+    student = await oauth.get_student_with_enrollments(db, token_for(mocker))
+
+    enrolled, enrolled_count = await count_queries(crud_student.is_student_enrolled(db, student, course.course_id))
+    premium, premium_count = await count_queries(crud_student.get_premium_courses_count(db, student))
+
+    assert (enrolled, premium) == (True, 1)
+    assert enrolled_count == premium_count == 0
+
+
+@pytest.mark.asyncio
+async def test_enrollments_are_loaded_for_a_cached_principal(db, mocker):
+    _, course = await create_enrolled_student(db)
+    await oauth.get_student_required(db, token_for(mocker))
+    db.expunge_all()
+
+    student, count = await count_queries(oauth.get_student_with_enrollments(db, token_for(mocker)))
+
+    assert count == 2
+    assert crud_student.enrollments_loaded(student)
+    assert [c.course_id for c in student.courses_enrolled] == [course.course_id]
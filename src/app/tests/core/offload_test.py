@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+import pytest
+from core import offload
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    offload.reset_offload_stats()
+    yield
+    offload.reset_offload_stats()
+
+
+@pytest.mark.asyncio
+async def test_run_in_pool_runs_off_the_event_loop_thread():
+    loop_thread = threading.get_ident()
+
+    res = await offload.run_in_pool(threading.get_ident)
+
+    assert res != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_offloaded_returns_result_and_records_stats():
+    @offload.offloaded
+    def add(a, b):
+        return a + b
+
+    res = await add(1, b=2)
+    stats = offload.get_offload_stats()
+
+    assert res == 3
+    assert stats['submitted'] == 1
+    assert stats['completed'] == 1
+    assert stats['in_flight'] == 0
+    assert stats['wait_max'] >= 0
+
+
+@pytest.mark.asyncio
+async def test_run_in_pool_propagates_exceptions_and_counts_failure():
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        await offload.run_in_pool(fail)
+
+    assert offload.get_offload_stats()['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_rejects_when_max_pending_reached():
+    pool = offload.WorkerPool('test', 1, max_pending=1)
+    release = threading.Event()
+    try:
+        blocked = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0)
+
+        with pytest.raises(offload.PoolFull):
+            await pool.run(int)
+
+        release.set()
+        await blocked
+        stats = pool.stats()
+    finally:
+        release.set()
+        pool.shutdown()
+
+    assert stats['rejected'] == 1
+    assert stats['completed'] == 1
+    assert stats['in_flight'] == 0
+
+
+@pytest.mark.asyncio
+async def test_process_worker_pool_runs_in_another_process():
+    pool = offload.WorkerPool('test', 1, kind='process')
+    try:
+        pid = await pool.run(os.getpid)
+    finally:
+        pool.shutdown()
+
+    assert pid != os.getpid()
+    assert pool.stats()['completed'] == 1
@@ -0,0 +1,89 @@
+import pytest
+from core import oauth, principal_cache
+from core.security import TokenData
+from core.sql_instrumentation import RequestQueries, current_queries
+from crud import crud_admin, crud_user
+from db.models import Role
+from schemas.user import UserChangePassword
+from tests import dummies
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    principal_cache.cache.clear()
+    principal_cache.cache.hits = principal_cache.cache.misses = 0
+    yield
+    principal_cache.cache.clear()
+
+
+async def create_student(db):
+    account, student = await dummies.create_dummy_student(db)
+    # start from what the db returns, not the objects the dummies built
+    db.expunge_all()
+    return account, student
+
+
+async def get_student_required(db, mocker, email='s@s.com'):
+    mocker.patch('core.oauth.verify_token_access', return_value=TokenData(email=email, role='student'))
+    return await oauth.get_student_required(db, token='token')
+
+
+async def count_queries(coro) -> tuple:
+    queries = RequestQueries()
+    token = current_queries.set(queries)
+    try:
+        return await coro, queries.count
+    finally:
+        current_queries.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_second_lookup_is_served_without_queries(db, mocker):
+    account, student = await create_student(db)
+    await get_student_required(db, mocker)
+    db.expunge_all()
+
+    cached, count = await count_queries(get_student_required(db, mocker))
+
+    assert count == 0
+    assert cached.student_id == student.student_id
+    assert cached.account.email == account.email
+    assert principal_cache.cache.stats()['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_principal_is_attached_and_writable(db, mocker):
+    await create_student(db)
+    await get_student_required(db, mocker)
+    db.expunge_all()
+
+    student = await get_student_required(db, mocker)
+    student.first_name = 'Changed'
+    await db.commit()
+    db.expunge_all()
+
+    reloaded = await crud_user.get_specific_user_or_raise_404(db, student.student_id, role=Role.student.value)
+    assert reloaded.first_name == 'Changed'
+
+
+@pytest.mark.asyncio
+async def test_switch_user_activation_invalidates_entry(db, mocker):
+    await create_student(db)
+    student = await get_student_required(db, mocker)
+
+    await crud_admin.switch_user_activation(db, student.account)
+
+    assert principal_cache.cache.get(student.account.email) is None
+
+
+@pytest.mark.asyncio
+async def test_change_password_invalidates_entry(db, mocker):
+    await create_student(db)
+    student = await get_student_required(db, mocker)
+    mocker.patch('crud.crud_user.hashing.hash_pass', return_value='hashed')
+
+    await crud_user.change_password(
+        db, UserChangePassword(old_password='pass', new_password='newpass', confirm_password='newpass'),
+        student.account)
+
+    assert principal_cache.cache.get(student.account.email) is None
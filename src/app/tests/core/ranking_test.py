@@ -0,0 +1,26 @@
+import pytest
+from core import ranking
+
+
+@pytest.fixture
+def prior(mocker):
+    mocker.patch.object(ranking.settings, 'CATALOG_RANK_PRIOR_VOTES', 5)
+    mocker.patch.object(ranking.settings, 'CATALOG_RANK_PRIOR_MEAN', 5.5)
+
+
+def test_unrated_course_scores_the_prior_mean(prior):
+    assert ranking.rank_score(None, 0) == 5.5
+    assert ranking.rank_score(None, None) == 5.5
+
+
+def test_few_ratings_move_the_score_a_little_many_move_it_to_the_rating(prior):
+    assert ranking.rank_score(10, 1) == pytest.approx((5 * 5.5 + 10) / 6)
+    assert ranking.rank_score(9, 1000) == pytest.approx(9, abs=0.02)
+    assert ranking.rank_score(9, 100) > ranking.rank_score(10, 1)
+
+
+def test_no_prior_is_the_plain_average(mocker):
+    mocker.patch.object(ranking.settings, 'CATALOG_RANK_PRIOR_VOTES', 0)
+
+    assert ranking.rank_score(7, 3) == 7
+    assert ranking.rank_score(None, 0) == 0
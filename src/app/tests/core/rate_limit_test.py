@@ -0,0 +1,77 @@
+import pytest
+from fastapi import HTTPException
+from core import rate_limit
+from core.rate_limit import SlidingWindowLimiter
+
+
+@pytest.fixture
+def clock(mocker):
+    now = [1000.0]
+    mocker.patch('core.rate_limit.time.monotonic', side_effect=lambda: now[0])
+    return now
+
+
+def test_limiter_allows_limit_attempts_per_window(clock):
+    limiter = SlidingWindowLimiter(limit=2, window=60, max_keys=10)
+    limiter.hit('k')
+    limiter.hit('k')
+
+    assert limiter.retry_after('k') == 60
+
+    clock[0] += 30
+    assert limiter.retry_after('k') == 30
+
+
+def test_limiter_window_slides(clock):
+    limiter = SlidingWindowLimiter(limit=2, window=60, max_keys=10)
+    limiter.hit('k')
+    clock[0] += 40
+    limiter.hit('k')
+    clock[0] += 21
+
+    # the first attempt left the window, then the second one is the oldest with 39 s to go
+    assert limiter.retry_after('k') == 0
+    limiter.hit('k')
+    assert limiter.retry_after('k') == pytest.approx(39)
+
+
+def test_limiter_memory_is_bounded(clock):
+    limiter = SlidingWindowLimiter(limit=3, window=60, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        for _ in range(5):
+            limiter.hit(key)
+
+    assert limiter.stats()['keys'] == 2
+    assert all(len(attempts) == 3 for attempts in limiter._attempts.values())
+    assert limiter.retry_after('a') == 0
+
+
+def test_zero_limit_disables_limiter(clock):
+    limiter = SlidingWindowLimiter(limit=0, window=60, max_keys=10)
+    limiter.hit('k')
+
+    assert limiter.retry_after('k') == 0
+    assert limiter.stats()['keys'] == 0
+
+
+def test_check_login_attempt_limits_username_case_insensitively(clock, mocker):
+    mocker.patch.object(rate_limit, 'username_limiter', SlidingWindowLimiter(limit=2, window=60, max_keys=10))
+    mocker.patch.object(rate_limit, 'ip_limiter', SlidingWindowLimiter(limit=10, window=60, max_keys=10))
+    rate_limit.check_login_attempt('1.1.1.1', 'S@s.com')
+    rate_limit.check_login_attempt('2.2.2.2', 's@s.com ')
+
+    with pytest.raises(HTTPException) as e:
+        rate_limit.check_login_attempt('3.3.3.3', 's@s.com')
+
+    assert e.value.status_code == 429
+    assert e.value.headers == {'Retry-After': '61'}
+    assert rate_limit.username_limiter.rejected == 1
+
+
+def test_login_succeeded_clears_username_attempts(clock, mocker):
+    mocker.patch.object(rate_limit, 'username_limiter', SlidingWindowLimiter(limit=1, window=60, max_keys=10))
+    rate_limit.check_login_attempt('1.1.1.1', 's@s.com')
+
+    rate_limit.login_succeeded('s@s.com')
+
+    rate_limit.check_login_attempt('1.1.1.1', 's@s.com')
@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+from core import revocation
+from crud import crud_admin, crud_user
+from db.models import TokenRevocation
+from schemas.user import UserChangePassword
+from main import app
+from tests import dummies
+
+
+@pytest.fixture(autouse=True)
+def empty_mirror():
+    revocation.revoked_before.clear()
+    yield
+    revocation.revoked_before.clear()
+
+
+@pytest.mark.asyncio
+async def test_revoke_persists_and_updates_mirror(db):
+    account, _ = await dummies.create_dummy_student(db)
+
+    await revocation.revoke(db, account)
+    assert account.email not in revocation.revoked_before
+    await db.commit()
+
+    row = await db.get(TokenRevocation, account.account_id)
+    assert revocation.revoked_before[account.email] == row.revoked_before
+    assert revocation.is_revoked(account.email, row.revoked_before / 1000 - 1)
+    assert not revocation.is_revoked(account.email, row.revoked_before / 1000 + 1)
+
+
+@pytest.mark.asyncio
+async def test_revoke_leaves_the_mirror_alone_when_the_commit_does_not_happen(db):
+    account, _ = await dummies.create_dummy_student(db)
+    account_id = account.account_id
+
+    await revocation.revoke(db, account)
+    await db.rollback()
+    await db.commit()
+
+    assert await db.get(TokenRevocation, account_id) is None
+    assert revocation.revoked_before == {}
+
+
+@pytest.mark.asyncio
+async def test_load_picks_up_rows_and_keeps_newer_local_cutoffs(db):
+    account, _ = await dummies.create_dummy_student(db)
+    db.add(TokenRevocation(account_id=account.account_id, revoked_before=1000))
+    await db.commit()
+
+    assert await revocation.load(db) == 1
+    assert revocation.revoked_before[account.email] == 1000
+
+    revocation.revoked_before[account.email] = 5000
+    await revocation.load(db)
+    assert revocation.revoked_before[account.email] == 5000
+
+
+@pytest.mark.asyncio
+async def test_change_password_revokes_tokens(db, mocker):
+    account, _ = await dummies.create_dummy_student(db)
+    mocker.patch('crud.crud_user.hashing.hash_pass', return_value='hashed')
+
+    await crud_user.change_password(
+        db, UserChangePassword(old_password='pass', new_password='newpass', confirm_password='newpass'), account)
+
+    assert await db.get(TokenRevocation, account.account_id) is not None
+    assert account.email in revocation.revoked_before
+
+
+@pytest.mark.asyncio
+async def test_only_deactivation_revokes_tokens(db):
+    account, _ = await dummies.create_dummy_student(db)
+
+    await crud_admin.switch_user_activation(db, account)
+    cutoff = revocation.revoked_before[account.email]
+    await crud_admin.switch_user_activation(db, account)
+
+    assert not account.is_deactivated
+    assert revocation.revoked_before[account.email] == cutoff
+
+
+@pytest.mark.asyncio
+async def test_revoke_tokens_by_email(db):
+    account, _ = await dummies.create_dummy_student(db)
+
+    await crud_user.revoke_tokens(db, account.email)
+    await crud_user.revoke_tokens(db, 'nobody@s.com')
+
+    assert await db.get(TokenRevocation, account.account_id) is not None
+    assert list(revocation.revoked_before) == [account.email]
+
+
+def test_lifespan_loads_the_mirror_before_serving_even_without_refresh(mocker):
+    async def load(db):
+        revocation.revoked_before['s@s.com'] = 1000
+        return 1
+
+    mocker.patch('main.settings.TOKEN_REVOCATION_REFRESH', 0)
+    mocker.patch.object(revocation, 'load', side_effect=load)
+
+    with TestClient(app):
+        assert revocation.revoked_before == {'s@s.com': 1000}
@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from jose import jwt
+from core import revocation, security
+from core.security import TokenData
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    security.token_cache.clear()
+    revocation.revoked_before.clear()
+    yield
+    security.token_cache.clear()
+    revocation.revoked_before.clear()
+
+
+def encode(claims: dict) -> str:
+    return jwt.encode(claims, security.SIGNING_KEY, security.ALGORITHMS[0])
+
+
+@pytest.mark.asyncio
+async def test_created_token_has_numeric_exp_and_verifies():
+    token = await security.create_access_token(TokenData(email='s@s.com', role='student'))
+
+    claims = jwt.get_unverified_claims(token.access_token)
+    token_data = await security.verify_token_access(token.access_token)
+
+    assert isinstance(claims['exp'], int)
+    assert token_data == TokenData(email='s@s.com', role='student')
+
+
+@pytest.mark.asyncio
+async def test_repeat_verification_is_served_from_cache(mocker):
+    token = await security.create_access_token(TokenData(email='s@s.com', role='student'))
+    await security.verify_token_access(token.access_token)
+    decode = mocker.spy(security.jwt, 'decode')
+
+    token_data = await security.verify_token_access(token.access_token)
+
+    assert token_data.email == 's@s.com'
+    assert decode.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_rejected_and_not_cached():
+    token = encode({'email': 's@s.com', 'role': 'student', 'exp': int(datetime.now().timestamp()) - 10})
+
+    assert await security.verify_token_access(token) == 'Token has expired. Please log in again'
+    assert len(security.token_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_tampered_token_is_invalid():
+    token = await security.create_access_token(TokenData(email='s@s.com', role='student'))
+
+    assert await security.verify_token_access(token.access_token[:-2] + 'xx') == 'Invalid token'
+
+
+@pytest.mark.asyncio
+async def test_token_without_expiry_is_rejected():
+    token = encode({'email': 's@s.com', 'role': 'student'})
+
+    assert await security.verify_token_access(token) == 'Invalid token'
+
+
+@pytest.mark.asyncio
+async def test_legacy_expire_claim_is_honoured():
+    expire = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    token = encode({'email': 's@s.com', 'role': 'student', 'expire': expire})
+
+    token_data = await security.verify_token_access(token)
+
+    assert token_data == TokenData(email='s@s.com', role='student')
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected_even_when_cached():
+    token = await security.create_access_token(TokenData(email='s@s.com', role='student'))
+    await security.verify_token_access(token.access_token)
+
+    revocation.revoked_before['s@s.com'] = int(time.time() * 1000) + 1000
+
+    assert await security.verify_token_access(token.access_token) == 'Token has been revoked. Please log in again'
+    assert len(security.token_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_token_issued_after_revocation_is_valid():
+    revocation.revoked_before['s@s.com'] = int(time.time() * 1000) - 1000
+    token = await security.create_access_token(TokenData(email='s@s.com', role='student'))
+
+    assert await security.verify_token_access(token.access_token) == TokenData(email='s@s.com', role='student')
+
+
+@pytest.mark.asyncio
+async def test_legacy_token_is_covered_by_any_revocation():
+    expire = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    token = encode({'email': 's@s.com', 'role': 'student', 'expire': expire})
+    revocation.revoked_before['s@s.com'] = 1
+
+    assert await security.verify_token_access(token) == 'Token has been revoked. Please log in again'
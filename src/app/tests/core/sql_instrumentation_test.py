@@ -0,0 +1,71 @@
+import json
+import logging
+import pytest
+from fastapi import Response
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from starlette.requests import Request
+from core import sql_instrumentation
+from core.sql_instrumentation import RequestQueries, current_queries, fingerprint, sql_instrumentation_middleware
+from db.models import Tag
+
+
+def test_fingerprint_normalizes_whitespace_literals_and_in_lists():
+    a = fingerprint('SELECT * FROM tags\n WHERE tag_id IN (?, ?, ?) LIMIT 10')
+    b = fingerprint('SELECT *  FROM tags WHERE tag_id IN (?) LIMIT 20')
+
+    assert a == b == 'SELECT * FROM tags WHERE tag_id IN (?) LIMIT ?'
+
+
+@pytest.mark.asyncio
+async def test_cursor_hooks_record_queries_of_current_request(db):
+    queries = RequestQueries()
+    token = current_queries.set(queries)
+    try:
+        for tag_id in range(3):
+            await db.scalar(select(Tag).where(Tag.tag_id == tag_id))
+    finally:
+        current_queries.reset(token)
+
+    assert queries.count == 3
+    assert queries.duration > 0
+    assert list(queries.repeated(threshold=3).values()) == [3]
+
+
+@pytest.mark.asyncio
+async def test_cursor_hooks_ignore_queries_outside_a_request(db):
+    await db.scalar(select(Tag))
+
+    assert current_queries.get() is None
+
+
+def test_middleware_adds_server_timing_header(client: TestClient, mocker):
+    mocker.patch('api.api_v1.routes.public.crud_course.get_courses_page', return_value=([], None))
+
+    response = client.get('/courses')
+
+    assert response.headers['server-timing'].startswith('db;dur=')
+    assert 'desc="0 queries"' in response.headers['server-timing']
+
+
+@pytest.mark.asyncio
+async def test_middleware_flags_repeated_statements_in_debug(db, mocker, caplog):
+    mocker.patch.object(sql_instrumentation.settings, 'DEBUG', True)
+    mocker.patch.object(sql_instrumentation.settings, 'SQL_N_PLUS_ONE_THRESHOLD', 3)
+
+    async def call_next(request):
+        for tag_id in range(3):
+            await db.scalar(select(Tag).where(Tag.tag_id == tag_id))
+        return Response()
+
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/courses', 'headers': [], 'query_string': b''})
+    with caplog.at_level(logging.INFO, logger='poodle.sql'):
+        response = await sql_instrumentation_middleware(request, call_next)
+
+    summary, warning = [json.loads(record.message) for record in caplog.records]
+    assert 'desc="3 queries"' in response.headers['server-timing']
+    assert summary['queries'] == 3
+    assert list(summary['repeated'].values()) == [3]
+    assert warning['event'] == 'n_plus_one'
+    assert warning['count'] == 3
+    assert warning['route'] == '/courses'
@@ -0,0 +1,107 @@
+import pytest
+from core import tag_index
+from core.tag_index import TagIndex, to_bitmap, to_ids
+from crud import crud_tag
+from schemas.tag import TagBase
+from tests import dummies
+
+
+@pytest.fixture
+def index() -> TagIndex:
+    index = TagIndex()
+    index.build([(1, 'Python', 1), (1, 'Python', 2), (1, 'Python', 5), (2, 'python-web', 2), (2, 'python-web', 3),
+                 (3, 'Art', 4), (4, 'unused', None)])
+    return index
+
+
+@pytest.fixture
+def loaded_index():
+    tag_index.index = TagIndex()
+    yield tag_index.index
+    tag_index.index = TagIndex()
+
+
+def test_bitmap_round_trip():
+    ids = [0, 3, 64, 65, 1_000_000]
+
+    assert to_ids(to_bitmap(ids)) == ids
+    assert to_ids(0) == []
+
+
+def test_lookup_is_case_insensitive_by_default(index):
+    assert to_ids(index.lookup('python')) == [1, 2, 5]
+    assert to_ids(index.lookup('python', case_sensitive=True)) == []
+    assert to_ids(index.lookup('Python', case_sensitive=True)) == [1, 2, 5]
+
+
+def test_lookup_by_prefix(index):
+    assert to_ids(index.lookup('pyth', prefix=True)) == [1, 2, 3, 5]
+    assert to_ids(index.lookup('python-', prefix=True)) == [2, 3]
+    assert index.lookup('pyth') == 0
+
+
+def test_match_all_intersects_and_match_any_unites(index):
+    assert to_ids(index.match(['python', 'python-web'])) == [2]
+    assert to_ids(index.match(['python', 'art'], match_all=False)) == [1, 2, 4, 5]
+    assert to_ids(index.match(['py*', 'ART'])) == []
+    assert index.match([]) == 0
+
+
+def test_facets_count_courses_per_tag_within_a_result_set(index):
+    assert index.facets() == {'Python': 3, 'python-web': 2, 'Art': 1}
+    assert index.facets(to_bitmap([2, 4])) == {'Art': 1, 'Python': 1, 'python-web': 1}
+
+
+def test_add_remove_and_drop_update_the_index(index):
+    index.add(5, 'Music', 7)
+    index.add(1, 'Python', 7)
+    index.remove(1, 1)
+    index.drop(2)
+
+    assert to_ids(index.lookup('music')) == [7]
+    assert to_ids(index.lookup('python')) == [2, 5, 7]
+    assert to_ids(index.lookup('py', prefix=True)) == [2, 5, 7]
+    assert index.stats()['tags'] == 4
+
+
+def test_sparse_tags_keep_their_ids_and_dense_ones_a_bitmap():
+    index = TagIndex()
+    index.build([(1, 'Rare', 1_000_000), (1, 'Rare', 2_000_000), (2, 'Common', 1), (2, 'Common', 2),
+                 (2, 'Common', 1_000_000)] + [(2, 'Common', course_id) for course_id in range(3, 40)])
+
+    assert index.stats()['bitmaps'] == 0
+    assert index.stats()['bytes'] == 8 + 40 * 4
+    assert to_ids(index.match(['rare', 'common'])) == [1_000_000]
+    assert to_ids(index.match(['rare', 'common'], match_all=False))[-2:] == [1_000_000, 2_000_000]
+    assert index.facets(to_bitmap([2, 1_000_000])) == {'Common': 2, 'Rare': 1}
+
+    index.remove(1, 1_000_000)
+    index.remove(1, 5)
+    assert index.facets() == {'Common': 40, 'Rare': 1}
+
+    for course_id in range(40, 31_300):
+        index.add(2, 'Common', course_id)
+    assert index.stats()['bitmaps'] == 1
+    assert index.facets() == {'Common': 31_300, 'Rare': 1}
+    assert to_ids(index.lookup('common'))[-2:] == [31_299, 1_000_000]
+
+
+@pytest.mark.asyncio
+async def test_load_builds_from_courses_tags_and_crud_tag_keeps_it_current(db, loaded_index):
+    course = await dummies.create_dummy_course(db)
+    await crud_tag.create_tags(db, [TagBase(name='Chess')], course.course_id)
+    assert not loaded_index.ready
+
+    assert await tag_index.load(db) == 1
+    assert loaded_index.ready
+    assert to_ids(loaded_index.lookup('chess')) == [course.course_id]
+
+    created = await crud_tag.create_tags(db, [TagBase(name='Strategy')], course.course_id)
+    tag_id = created['created'][0].tag_id
+    assert to_ids(loaded_index.lookup('strategy')) == [course.course_id]
+
+    await crud_tag.delete_tag_from_course(db, await crud_tag.course_has_tag(db, course.course_id, tag_id))
+    assert loaded_index.lookup('strategy') == 0
+
+    await crud_tag.delete_tag(db, tag_id)
+    assert loaded_index.tag_ids('strategy') == set()
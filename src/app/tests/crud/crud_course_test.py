@@ -0,0 +1,300 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import column, event
+from sqlalchemy.dialects import mysql
+from core import ranking, tag_index
+from core.tag_index import TagIndex
+from crud import crud_course, crud_student
+from db.functions import floor
+from db.models import Course, CourseTag, Status, StudentCourse, Tag
+from tests import dummies
+
+
+async def create_courses(db, count: int, tags_per_course: int = 2) -> None:
+    _, teacher = await dummies.create_dummy_teacher(db)
+    db.add_all(Tag(tag_id=i, name=f'tag{i}') for i in range(1, tags_per_course + 1))
+    for course_id in range(1, count + 1):
+        db.add(Course(course_id=course_id, title=f'course{course_id}', description='d', objectives='o',
+                      owner_id=teacher.teacher_id, rating=course_id % 3, people_rated=1,
+                      home_page_picture=b'\x00' * 1024))
+        db.add_all(CourseTag(course_id=course_id, tag_id=i) for i in range(1, tags_per_course + 1))
+    await db.commit()
+    db.expunge_all()
+
+
+def capture_selects(db) -> list[str]:
+    statements = []
+
+    @event.listens_for(db.bind.sync_engine, 'before_cursor_execute')
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    return statements
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('count', [1, 5, 20])
+async def test_get_all_courses_is_one_query_for_any_page_size(db, count):
+    await create_courses(db, count)
+    statements = capture_selects(db)
+
+    courses = await crud_course.get_all_courses(db, pages=1, items_per_page=count)
+
+    assert len(courses) == count
+    assert all(course.tags == ['tag1', 'tag2'] for course in courses)
+    assert len(statements) == 1
+    assert 'home_page_picture' not in statements[0]
+
+
+@pytest.mark.asyncio
+async def test_get_course_version_reads_only_the_version_of_visible_courses(db):
+    await create_courses(db, 2)
+    (await db.get(Course, 2)).is_hidden = True
+    await db.commit()
+    statements = capture_selects(db)
+
+    assert await crud_course.get_course_version(db, 1) == 1
+    assert await crud_course.get_course_version(db, 2) is None
+    assert await crud_course.get_course_version(db, 3) is None
+    assert not any('home_page_picture' in statement for statement in statements)
+
+
+@pytest.mark.asyncio
+async def test_get_course_owner_and_version_reads_only_those_columns(db):
+    await create_courses(db, 1)
+    statements = capture_selects(db)
+
+    owner_id, version = await crud_course.get_course_owner_and_version(db, 1)
+
+    assert (owner_id, version) == (2, 1)
+    assert await crud_course.get_course_owner_and_version(db, 2) is None
+    assert not any('home_page_picture' in statement for statement in statements)
+
+
+@pytest.mark.asyncio
+async def test_get_all_courses_orders_by_rank_score_then_course_id_and_paginates(db):
+    await create_courses(db, 6)
+
+    first = await crud_course.get_all_courses(db, pages=1, items_per_page=3)
+    second = await crud_course.get_all_courses(db, pages=2, items_per_page=3)
+
+    # one rater each, so rank_score follows the rating: 5 -> 2, 2 -> 2, 4 -> 1, 1 -> 1, 6 -> 0, 3 -> 0
+    assert [c.title for c in first + second] == ['course5', 'course2', 'course4', 'course1', 'course6', 'course3']
+
+
+@pytest.mark.asyncio
+async def test_get_all_courses_lists_course_without_tags(db):
+    await create_courses(db, 1, tags_per_course=0)
+
+    courses = await crud_course.get_all_courses(db, pages=1, items_per_page=5)
+
+    assert courses[0].tags == []
+
+
+@pytest.mark.asyncio
+async def test_student_listings_are_one_query(db):
+    await create_courses(db, 4)
+    _, student = await dummies.create_dummy_student(db)
+    for course_id, status in ((1, Status.active), (2, Status.active), (3, Status.pending)):
+        db.add(StudentCourse(student_id=student.student_id, course_id=course_id, status=status.value))
+    await db.commit()
+    statements = capture_selects(db)
+
+    my_courses = await crud_student.get_my_courses(db, student)
+    pending = await crud_student.view_pending_requests(db, student)
+
+    assert sorted(c.title for c in my_courses) == ['course1', 'course2']
+    assert [c.title for c in pending] == ['course3']
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_update_rating_keeps_rank_score_so_many_good_ratings_beat_a_single_perfect_one(db):
+    await create_courses(db, 2)
+    for course_id in (1, 2):
+        course = await db.get(Course, course_id)
+        course.rating, course.people_rated, course.rank_score = None, 0, ranking.rank_score(None, 0)
+    await db.commit()
+
+    await crud_course.update_rating(db, 1, 10)
+    for _ in range(20):
+        await crud_course.update_rating(db, 2, 9)
+    await crud_course.update_rating(db, 2, 8, old_st_rating=9)
+    await db.commit()
+
+    one, many = await db.get(Course, 1), await db.get(Course, 2)
+    assert one.rank_score == pytest.approx(ranking.rank_score(10, 1))
+    assert many.rank_score == pytest.approx(ranking.rank_score(many.rating, 20))
+    assert [c.title for c in await crud_course.get_all_courses(db, pages=1, items_per_page=2)] == \
+        ['course2', 'course1']
+
+
+async def walk_catalog(db, items_per_page: int, **filters) -> list[str]:
+    titles, cursor = [], None
+    while True:
+        courses, cursor = await crud_course.get_courses_page(db, items_per_page=items_per_page, cursor=cursor, **filters)
+        titles += [c.title for c in courses]
+        if cursor is None:
+            return titles
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('items_per_page', [1, 2, 4, 10])
+async def test_cursor_pages_match_offset_order_without_gaps_or_repeats(db, items_per_page):
+    await create_courses(db, 9)
+    # unrated courses sit at the prior mean, above these poorly rated ones
+    for course_id in (3, 7):
+        course = await db.get(Course, course_id)
+        course.rating, course.people_rated, course.rank_score = None, 0, ranking.rank_score(None, 0)
+    await db.commit()
+
+    titles = await walk_catalog(db, items_per_page)
+
+    assert titles == [c.title for c in await crud_course.get_all_courses(db, pages=1, items_per_page=9)]
+    assert titles[:2] == ['course7', 'course3']
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_keep_filters(db):
+    await create_courses(db, 9)
+
+    titles = await walk_catalog(db, 2, rating=1)
+
+    assert titles == ['course8', 'course5', 'course2', 'course7', 'course4', 'course1']
+
+
+@pytest.mark.asyncio
+async def test_courses_page_returns_no_cursor_on_last_page(db):
+    await create_courses(db, 3)
+
+    _, next_cursor = await crud_course.get_courses_page(db, pages=1, items_per_page=2)
+    _, last_cursor = await crud_course.get_courses_page(db, pages=2, items_per_page=2)
+
+    assert next_cursor is not None
+    assert last_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_courses_page_caps_items_per_page(db, mocker):
+    mocker.patch.object(crud_course.settings, 'CATALOG_MAX_PAGE_SIZE', 2)
+    await create_courses(db, 3)
+
+    courses, next_cursor = await crud_course.get_courses_page(db, items_per_page=1000)
+
+    assert len(courses) == 2
+    assert next_cursor is not None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cursor', ['garbage', crud_course.encode_cursor(1.0, 'x')[:-2] + '!', 'WzEsICJ4Il0'])
+async def test_courses_page_rejects_invalid_cursor(db, cursor):
+    with pytest.raises(HTTPException) as exc:
+        await crud_course.get_courses_page(db, cursor=cursor)
+
+    assert exc.value.status_code == 400
+
+
+@pytest.fixture(params=['sql', 'tag index'])
+def tags_resolved_by(request, db):
+    tag_index.index = TagIndex()
+    yield request.param
+    tag_index.index = TagIndex()
+
+
+async def tagged_courses(db):
+    # course1: tag1 tag2, course2: tag1 tag2, course3: tag1 tag2 Music, course4: tag1 tag2 musical
+    await create_courses(db, 4)
+    db.add_all([Tag(tag_id=10, name='Music'), Tag(tag_id=11, name='musical'),
+                CourseTag(course_id=3, tag_id=10), CourseTag(course_id=4, tag_id=11)])
+    await db.commit()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('tags, match_all, expected', [
+    (['music'], True, ['course3']),
+    (['MUSIC', 'tag1'], True, ['course3']),
+    (['mus*'], True, ['course4', 'course3']),
+    (['music', 'musical'], True, []),
+    (['music', 'musical'], False, ['course4', 'course3']),
+    (['nope', 'tag2'], False, ['course2', 'course4', 'course1', 'course3']),
+    (['100%*'], True, []),
+])
+async def test_tags_filter_matches_in_sql_and_in_the_tag_index(db, tags_resolved_by, tags, match_all, expected):
+    await tagged_courses(db)
+    if tags_resolved_by == 'tag index':
+        await tag_index.load(db)
+
+    courses, _ = await crud_course.get_courses_page(db, items_per_page=10, tags=tags, match_all_tags=match_all)
+
+    assert [c.title for c in courses] == expected
+
+
+@pytest.mark.asyncio
+async def test_tags_filter_falls_back_to_sql_for_many_matches(db, mocker):
+    mocker.patch.object(crud_course.settings, 'TAG_INDEX_MAX_IDS', 1)
+    await tagged_courses(db)
+    await tag_index.load(db)
+    statements = capture_selects(db)
+
+    courses, _ = await crud_course.get_courses_page(db, items_per_page=10, tags=['mus*'])
+
+    assert [c.title for c in courses] == ['course4', 'course3']
+    assert 'courses_tags' in statements[0]
+
+
+@pytest.mark.asyncio
+async def test_facets_count_the_filtered_courses_in_one_query(db):
+    await tagged_courses(db)
+    (await db.get(Course, 2)).is_premium = True
+    (await db.get(Course, 4)).rating = None
+    await db.commit()
+    statements = capture_selects(db)
+
+    facets = await crud_course.get_facets(db)
+    filtered = await crud_course.get_facets(db, tags=['mus*'], match_all_tags=True)
+
+    assert len(statements) == 2
+    assert (facets.total, facets.premium, facets.free) == (4, 1, 3)
+    assert [(f.tag, f.count) for f in facets.tags] == [('tag1', 4), ('tag2', 4), ('Music', 1), ('musical', 1)]
+    assert [(f.rating, f.count) for f in facets.ratings] == [(2, 1), (1, 1), (0, 1), (None, 1)]
+    assert [(f.owner_names, f.count) for f in facets.owners] == [('Dummy Teacher', 4)]
+    assert (filtered.total, filtered.premium) == (2, 0)
+    assert [(f.tag, f.count) for f in filtered.tags] == [('tag1', 2), ('tag2', 2), ('Music', 1), ('musical', 1)]
+
+
+@pytest.mark.asyncio
+async def test_facets_count_tags_in_the_tag_index_when_it_resolves_the_tags_filter(db, tags_resolved_by, mocker):
+    await tagged_courses(db)
+    (await db.get(Course, 3)).is_premium = True
+    await db.commit()
+    if tags_resolved_by == 'tag index':
+        await tag_index.load(db)
+    index_facets = mocker.spy(tag_index.index, 'facets')
+    statements = capture_selects(db)
+
+    facets = await crud_course.get_facets(db, tags=['mus*'], is_premium=False)
+
+    assert len(statements) == 1
+    assert index_facets.called == (tags_resolved_by == 'tag index')
+    assert facets.total == 1
+    assert [(f.tag, f.count) for f in facets.tags] == [('musical', 1), ('tag1', 1), ('tag2', 1)]
+
+
+@pytest.mark.asyncio
+async def test_facets_rating_buckets_truncate_on_every_dialect(db):
+    await create_courses(db, 2)
+    (await db.get(Course, 1)).rating = 9.6
+    (await db.get(Course, 2)).rating = 9.5
+    await db.commit()
+
+    facets = await crud_course.get_facets(db)
+
+    assert [(f.rating, f.count) for f in facets.ratings] == [(9, 2)]
+    assert str(floor(column('rating')).compile(dialect=mysql.dialect())) == 'FLOOR(rating)'
+
+
+@pytest.mark.asyncio
+async def test_facets_of_no_courses_are_empty(db):
+    facets = await crud_course.get_facets(db, is_premium=True)
+
+    assert (facets.total, facets.tags, facets.ratings, facets.owners) == (0, [], [], [])
@@ -1,6 +1,6 @@
 import pytest
 from crud.crud_student import is_student_enrolled
-from db.models import Status, Section
+from db.models import CourseTag, Status, Section, Tag
 from crud import crud_student
 from fastapi import status, HTTPException
 from schemas.course import CourseInfo, CourseRateResponse, StudentCourseSchema
@@ -16,7 +16,7 @@ async def create_dummy_section(db, course_id):
         course_id=course_id
     )
     db.add(section)
-    db.commit()
+    await db.commit()
 
     return section
 
@@ -87,7 +87,7 @@ async def test_get_edit_student_account_returns_edited_student_response_model(db
 async def test_get_courses_returns_empty_list_when_no_courses(db):
     _, student = await dummies.create_dummy_student(db)
 
-    res = await crud_student.get_my_courses(student)
+    res = await crud_student.get_my_courses(db, student)
 
     assert res == []
 
@@ -100,11 +100,24 @@ async def test_get_courses_returns_courses_list(db):
 
     assert enrollment1.status == Status.active.value
 
-    res = await crud_student.get_my_courses(student)
+    res = await crud_student.get_my_courses(db, student)
 
     assert res == [CourseInfo(title='dummy', description='dummy', is_premium=False, tags=[])]
 
 
+@pytest.mark.asyncio
+async def test_get_courses_shows_tags_with_a_hash_prefix(db):
+    _, student = await dummies.create_dummy_student(db)
+    course = await dummies.create_dummy_course(db)
+    db.add_all([Tag(tag_id=1, name='python'), CourseTag(course_id=course.course_id, tag_id=1)])
+    await db.commit()
+    await dummies.subscribe_dummy_student(db, student.student_id, course.course_id)
+
+    res = await crud_student.get_my_courses(db, student)
+
+    assert res[0].tags == ['#python']
+
+
 @pytest.mark.asyncio
 async def test_add_pending_request_raises_http_exception_when_already_enrolled(db):
     _, student = await dummies.create_dummy_student(db)
@@ -128,7 +141,7 @@ async def test_unsubscribe_student(db):
     # act
     await crud_student.unsubscribe_from_course(db, student.student_id, course.course_id)
 
-    res = await is_student_enrolled(student, course.course_id)
+    res = await is_student_enrolled(db, student, course.course_id)
     assert res is False
 
 
@@ -137,7 +150,7 @@ async def test_is_student_enrolled_returns_false_when_not_enrolled(db):
     _, student = await dummies.create_dummy_student(db)
     course = await dummies.create_dummy_course(db)
 
-    res = await crud_student.is_student_enrolled(student, course.course_id)
+    res = await crud_student.is_student_enrolled(db, student, course.course_id)
 
     assert res is False
 
@@ -150,11 +163,22 @@ async def test_is_student_enrolled_returns_true_when_enrolled(db):
 
     assert enrollment.status == Status.active.value
 
-    res = await crud_student.is_student_enrolled(student, course.course_id)
+    res = await crud_student.is_student_enrolled(db, student, course.course_id)
 
     assert res is True
 
 
+@pytest.mark.asyncio
+async def test_is_student_enrolled_returns_false_when_request_pending(db):
+    _, student = await dummies.create_dummy_student(db)
+    course = await dummies.create_dummy_course(db)
+    await dummies.subscribe_dummy_student(db, student.student_id, course.course_id, status=Status.pending.value)
+
+    res = await crud_student.is_student_enrolled(db, student, course.course_id)
+
+    assert res is False
+
+
 @pytest.mark.asyncio
 async def test_get_premium_courses_count_returns_correct_count(db):
     _, student = await dummies.create_dummy_student(db)
@@ -164,7 +188,7 @@ async def test_get_premium_courses_count_returns_correct_count(db):
 
     assert enrollment.status == Status.active.value
 
-    res = await crud_student.get_premium_courses_count(student)
+    res = await crud_student.get_premium_courses_count(db, student)
 
     assert res == 1
 
@@ -177,7 +201,7 @@ async def test_get_premium_courses_count_returns_correct_zero_when_no_premium_co
 
     assert enrollment.status == Status.active.value
 
-    res = await crud_student.get_premium_courses_count(student)
+    res = await crud_student.get_premium_courses_count(db, student)
 
     assert res == 0
 
@@ -377,4 +401,4 @@ async def test_view_pending_requests_returns_list_of_courses_when_requests(db):
     assert res[0].title == course.title
     assert res[0].description == course.description
     assert res[0].is_premium == course.is_premium
-    assert res[0].tags == course.tags
+    assert res[0].tags == []
@@ -1,7 +1,7 @@
 import pytest
-from sqlalchemy.orm import Session
-from crud import crud_teacher
-from db.models import Teacher, Course, Section, Account, Student
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import crud_teacher, crud_user
+from db.models import Teacher, Course, Section, Account, Role, Student, Status
 from schemas.course import CourseCreate, CourseUpdate
 from schemas.teacher import TeacherEdit
 from schemas.tag import TagBase
@@ -20,7 +20,7 @@ def get_dummy_course(teacher_id: int, course_id: int):
     owner_id=teacher_id
 )
 
-async def create_dummy_student(db: Session, id: int, email: str, first_name: str, is_premium=0) -> tuple[Account, Student]:
+async def create_dummy_student(db: AsyncSession, id: int, email: str, first_name: str, is_premium=0) -> tuple[Account, Student]:
     account_id = id
     account = Account(
         account_id=account_id,
@@ -35,10 +35,10 @@ async def create_dummy_student(db: Session, id: int, email: str, first_name: str
         is_premium=is_premium
     )
     db.add_all([account, student])
-    db.commit()
+    await db.commit()
     return account, student
 
-async def create_dummy_teacher(db: Session, id: int) -> tuple[Account, Teacher]:
+async def create_dummy_teacher(db: AsyncSession, id: int) -> tuple[Account, Teacher]:
     account_id = id
     account = Account(
         account_id=account_id,
@@ -52,10 +52,10 @@ async def create_dummy_teacher(db: Session, id: int) -> tuple[Account, Teacher]:
         last_name='Teacher',
     )
     db.add_all([account, teacher])
-    db.commit()
+    await db.commit()
     return account, teacher
 
-async def create_dummy_course(db: Session, teacher: Teacher):
+async def create_dummy_course(db: AsyncSession, teacher: Teacher):
     course = Course(
         course_id=1,
         title="dummy",
@@ -64,7 +64,7 @@ async def create_dummy_course(db: Session, teacher: Teacher):
         owner_id=teacher.teacher_id,
     )
     db.add(course)
-    db.commit()
+    await db.commit()
     return course
 
 
@@ -76,7 +76,7 @@ async def create_dummy_section(db, section_id, course_id):
         course_id=course_id
     )
     db.add(section)
-    db.commit()
+    await db.commit()
 
     return section
 
@@ -107,6 +107,21 @@ async def test_edit_account_returns_updated_teacher_account(db):
     assert updated_teacher.last_name == "UpdatedLast"
     assert updated_teacher.phone_number == "1234567890"
     assert updated_teacher.linked_in == "newLinkedInProfile"
+
+
+@pytest.mark.asyncio
+async def test_edit_account_keeps_the_account_of_an_authenticated_teacher_loaded(db):
+    account, _ = await dummies.create_dummy_teacher(db)
+    db.expunge_all()
+    # the teacher as get_teacher_required hands it to the route, account attached
+    teacher = await crud_user.get_principal(db, account.email, Role.teacher)
+    updates = TeacherEdit(first_name="UpdatedFirst", last_name="UpdatedLast")
+
+    updated_teacher = await crud_teacher.edit_account(db, teacher, updates)
+    info = await crud_teacher.get_info(updated_teacher, updated_teacher.account.email)
+
+    assert info.email == account.email
+    assert info.first_name == "UpdatedFirst"
  
     
 @pytest.mark.asyncio
@@ -175,6 +190,22 @@ async def test_edit_course_info_returns_updated_course(db):
     assert updated_course.objectives == "Updated Objectives"
     
     
+@pytest.mark.asyncio
+async def test_view_pending_requests_returns_only_own_courses_requests(db):
+    _, teacher = await create_dummy_teacher(db, id=1)
+    course = await create_dummy_course(db, teacher)
+    account, student = await create_dummy_student(db, id=2, email="student@dummymail.com", first_name="DummyName")
+    await dummies.subscribe_dummy_student(db, student.student_id, course.course_id, status=Status.pending.value)
+
+    own_requests = await crud_teacher.view_pending_requests(db, teacher)
+    other_requests = await crud_teacher.view_pending_requests(db, get_dummy_teacher(3))
+
+    assert len(own_requests) == 1
+    assert own_requests[0].course == course.title
+    assert own_requests[0].requested_by == account.email
+    assert other_requests == []
+
+
 def test_validate_course_access_returns_error_message_when_course_not_exists():
     teacher = get_dummy_teacher(1)
 
@@ -206,7 +237,7 @@ def test_validate_course_access_returns_OK_message_when_teacher_owns_existing_co
  
  
 @pytest.mark.asyncio
-async def test_get_courses_reports_returns_correct_report_with_filters_by_min_progress(db: Session):
+async def test_get_courses_reports_returns_correct_report_with_filters_by_min_progress(db: AsyncSession):
     _, teacher = await create_dummy_teacher(db, id=1)
     course = await create_dummy_course(db, teacher)
     _, student1 = await create_dummy_student(db, id=2,  email="student1@dummymail.com", first_name="DummyName_1")
@@ -237,7 +268,7 @@ async def test_get_courses_reports_returns_correct_report_with_filters_by_min_pr
 
 
 @pytest.mark.asyncio
-async def test_calculate_student_progresses_returns_dict_with_student_progresses(db: Session):
+async def test_calculate_student_progresses_returns_dict_with_student_progresses(db: AsyncSession):
     _, teacher = await create_dummy_teacher(db, id=1)
     course = await create_dummy_course(db, teacher)
     _, student1 = await create_dummy_student(db, id=2,  email="student1@dummymail.com", first_name="DummyName_1")
@@ -256,6 +287,7 @@ async def test_calculate_student_progresses_returns_dict_with_student_progresses
     await dummies.dummy_view_section(db, student1.student_id, section_3.section_id)
     await dummies.dummy_view_section(db, student2.student_id, section_4.section_id)
      
+    await db.refresh(course, attribute_names=['students_enrolled'])
     courses_with_students = [course]
     
     student_progress_dict = await crud_teacher.calculate_student_progresses(db, courses_with_students)
@@ -265,13 +297,14 @@ async def test_calculate_student_progresses_returns_dict_with_student_progresses
  
     
 @pytest.mark.asyncio
-async def test_calculate_student_progresses_returns_zero_for_courses_with_no_sections(db: Session):
+async def test_calculate_student_progresses_returns_zero_for_courses_with_no_sections(db: AsyncSession):
     _, teacher = await create_dummy_teacher(db, id=1)
     course = await create_dummy_course(db, teacher)
     _, student = await create_dummy_student(db, id=2, email="student@dummymail.com", first_name="DummyName_1")
     
     await dummies.subscribe_dummy_student(db, student.student_id, course.course_id)
     
+    await db.refresh(course, attribute_names=['students_enrolled'])
     courses_with_students = [course]
     
     student_progress_dict = await crud_teacher.calculate_student_progresses(db, courses_with_students)
@@ -280,7 +313,7 @@ async def test_calculate_student_progresses_returns_zero_for_courses_with_no_sec
 
    
 @pytest.mark.asyncio
-async def test_generate_reports_returns_reports_filtered_by_min_progress(db: Session):
+async def test_generate_reports_returns_reports_filtered_by_min_progress(db: AsyncSession):
     _, teacher = await create_dummy_teacher(db, id=1)
     course = await create_dummy_course(db, teacher)
     _, student1 = await create_dummy_student(db, id=2, email="student1@dummymail.com", first_name="DummyName_1")
@@ -296,6 +329,7 @@ async def test_generate_reports_returns_reports_filtered_by_min_progress(db: Ses
     await dummies.dummy_view_section(db, student1.student_id, section_2.section_id)
     await dummies.dummy_view_section(db, student2.student_id, section_1.section_id)
      
+    await db.refresh(course, attribute_names=['students_enrolled'])
     student_progress_dict = {
         (student1.student_id, course.course_id): '100.00',
         (student2.student_id, course.course_id): '50.00'
@@ -321,10 +355,11 @@ async def test_generate_reports_returns_reports_filtered_by_min_progress(db: Ses
     
     
 @pytest.mark.asyncio
-async def test_generate_reports_returns_report_with_empty_list_of_students_when_no_students(db: Session):
+async def test_generate_reports_returns_report_with_empty_list_of_students_when_no_students(db: AsyncSession):
     _, teacher = await create_dummy_teacher(db, id=1)
     course = await create_dummy_course(db, teacher)
     
+    await db.refresh(course, attribute_names=['students_enrolled'])
     student_progress_dict = {}
     
     reports = crud_teacher.generate_reports([course], student_progress_dict, min_progress=0.0)
@@ -2,6 +2,7 @@ from unittest.mock import Mock
 import pytest
 from fastapi import HTTPException, status
 from tests import dummies
+from core import hashing
 from crud import crud_user
 
 
@@ -73,10 +74,52 @@ async def test_get_create_user_happy_case(db):
 @pytest.mark.asyncio
 async def test_try_login_happy_case(db, mocker):
     account, admin = await dummies.create_dummy_admin(db)
-    mocker.patch('crud.crud_user.hashing.verify_password', return_value=True)
+    mocker.patch('crud.crud_user.hashing.verify_and_update_async', return_value=(True, None))
 
     res_user = await crud_user.try_login(
         db=db, username=account.email, password=account.password
     )
 
     assert res_user.email == account.email
+
+
+async def create_admin_with_hash(db, bcrypt_rounds):
+    account, _ = await dummies.create_dummy_admin(db)
+    account.password = hashing.build_context(bcrypt_rounds=bcrypt_rounds).hash('pass')
+    await db.commit()
+    return account
+
+
+@pytest.mark.asyncio
+async def test_try_login_upgrades_hash_with_outdated_cost(db, mocker):
+    account = await create_admin_with_hash(db, bcrypt_rounds=4)
+    mocker.patch('core.hashing.pass_context', hashing.build_context(bcrypt_rounds=5))
+
+    res_user = await crud_user.try_login(db=db, username=account.email, password='pass')
+
+    assert res_user.password.startswith('$2b$05$')
+    assert hashing.pass_context.verify('pass', res_user.password)
+
+
+@pytest.mark.asyncio
+async def test_try_login_keeps_hash_on_wrong_password(db, mocker):
+    account = await create_admin_with_hash(db, bcrypt_rounds=4)
+    old_hash = account.password
+    mocker.patch('core.hashing.pass_context', hashing.build_context(bcrypt_rounds=5))
+
+    res_user = await crud_user.try_login(db=db, username=account.email, password='wrong')
+
+    assert res_user is None
+    assert account.password == old_hash
+
+
+@pytest.mark.asyncio
+async def test_try_login_verifies_dummy_hash_for_unknown_email(mocker):
+    mocker.patch('crud.crud_user.exists', return_value=None)
+    mocker.patch('crud.crud_user.hashing.get_dummy_hash', return_value='dummy hash')
+    verify = mocker.patch('crud.crud_user.hashing.verify_password_async', return_value=False)
+
+    res_user = await crud_user.try_login(db=None, username='nobody@mail.com', password='pass')
+
+    assert res_user is None
+    verify.assert_awaited_once_with('pass', 'dummy hash')
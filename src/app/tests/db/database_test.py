@@ -0,0 +1,164 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from starlette.requests import Request
+from core import catalog_cache
+from db import database
+from db.database import Base
+from db.models import Tag
+
+
+def make_request(token: str = None) -> Request:
+    headers = [(b'authorization', f'Bearer {token}'.encode())] if token else []
+    return Request({'type': 'http', 'headers': headers})
+
+
+async def open_session(dependency, request: Request):
+    gen = dependency(request)
+    return gen, await anext(gen)
+
+
+@pytest_asyncio.fixture
+async def primary_and_replica(tmp_path):
+    primary_url = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    replica_url = f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+
+    await database.dispose_engine()
+    database.init_engine(primary_url, replica_urls=[replica_url])
+    for engine in (database.engine, *database.replica_engines):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    yield primary_url, replica_url
+
+    await database.dispose_engine()
+
+
+async def write_tag(token: str, name: str):
+    gen, db = await open_session(database.get_db, make_request(token))
+    db.add(Tag(name=name))
+    await db.commit()
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_uses_primary_when_no_replicas(tmp_path):
+    primary_url = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    await database.dispose_engine()
+    database.init_engine(primary_url, replica_urls=[])
+
+    gen, db = await open_session(database.get_read_db, make_request())
+
+    assert db.bind is database.engine
+    await gen.aclose()
+    await database.dispose_engine()
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_routes_anonymous_reads_to_replica(primary_and_replica):
+    await write_tag('writer', 'python')
+
+    gen, db = await open_session(database.get_read_db, make_request())
+
+    assert db.bind is database.replica_engines[0]
+    assert (await db.scalars(select(Tag))).all() == []
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_reads_own_writes_from_primary(primary_and_replica):
+    await write_tag('writer', 'python')
+
+    gen, db = await open_session(database.get_read_db, make_request('writer'))
+
+    assert db.bind is database.engine
+    assert [tag.name for tag in (await db.scalars(select(Tag))).all()] == ['python']
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_keeps_other_users_on_replica(primary_and_replica):
+    await write_tag('writer', 'python')
+
+    gen, db = await open_session(database.get_read_db, make_request('reader'))
+
+    assert db.bind is database.replica_engines[0]
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_returns_to_replica_when_window_expires(primary_and_replica, mocker):
+    mocker.patch.object(database.settings, 'DB_STICKY_SECONDS', 0)
+    await write_tag('writer', 'python')
+
+    gen, db = await open_session(database.get_read_db, make_request('writer'))
+
+    assert db.bind is database.replica_engines[0]
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_catalog_db_reads_the_primary_after_a_catalog_change(primary_and_replica, mocker):
+    mocker.patch.dict(database._sticky_until, clear=True)
+
+    gen, before = await open_session(database.get_catalog_db, make_request())
+    catalog_cache.bump()
+    gen_after, after = await open_session(database.get_catalog_db, make_request())
+    gen_read, read = await open_session(database.get_read_db, make_request())
+
+    assert before.bind is database.replica_engines[0]
+    assert after.bind is database.engine
+    assert read.bind is database.replica_engines[0]
+    for g in (gen, gen_after, gen_read):
+        await g.aclose()
+
+
+def test_mark_sticky_drops_oldest_keys_over_the_limit(mocker):
+    mocker.patch.object(database, 'STICKY_MAX_KEYS', 2)
+    mocker.patch.dict(database._sticky_until, clear=True)
+
+    for key in ('a', 'b', 'c'):
+        database.mark_sticky(key)
+
+    assert list(database._sticky_until) == ['b', 'c']
+
+
+def checked_out() -> int:
+    return database.engine.sync_engine.pool.checkedout()
+
+
+@pytest.mark.asyncio
+async def test_get_db_does_not_check_out_a_connection_until_first_use(primary_and_replica):
+    gen, db = await open_session(database.get_db, make_request('reader'))
+
+    assert db._session is None
+    assert checked_out() == 0
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_release_connection_returns_connection_and_keeps_objects(primary_and_replica):
+    await write_tag('writer', 'python')
+    gen, db = await open_session(database.get_db, make_request('reader'))
+
+    tag = await db.scalar(select(Tag))
+    assert checked_out() == 1
+
+    await database.release_connection(db)
+
+    assert checked_out() == 0
+    assert tag.name == 'python'
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_release_connection_after_reads_does_not_pin_reads_to_primary(primary_and_replica):
+    gen, db = await open_session(database.get_db, make_request('reader'))
+    await db.scalar(select(Tag))
+    await database.release_connection(db)
+    await gen.aclose()
+
+    gen, db = await open_session(database.get_read_db, make_request('reader'))
+
+    assert db.bind is database.replica_engines[0]
+    await gen.aclose()
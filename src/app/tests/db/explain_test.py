@@ -0,0 +1,267 @@
+import importlib.util
+import os
+import random
+import re
+from pathlib import Path
+import pytest
+import pytest_asyncio
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, desc, event, func, insert, inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from core import ranking
+from crud import crud_admin, crud_course, crud_student, crud_teacher
+from db import search as full_text
+from db.database import Base
+from db.models import (Account, ContentType, Course, CourseTag, Role, Section, Status, Student, StudentCourse,
+                       StudentRating, StudentSection, Tag, Teacher)
+
+VERSIONS = Path(__file__).parents[2] / 'migrations' / 'versions'
+MIGRATIONS = ['0d99d1b2e865_first_revision.py', 'f6ec6e5b7618_test_migration_1.py', '3b7c9e41d2a8_hot_query_indexes.py',
+              '8d41c2f07a95_token_revocations.py', 'c5e2a7d94b10_course_search.py',
+              'e1b94f3a6c28_course_version.py', 'a93d5e07b2f4_course_rank_score.py']
+
+
+def load_migration(file_name: str):
+    spec = importlib.util.spec_from_file_location(file_name[:-3], VERSIONS / file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def index_set(indexes) -> set:
+    return {(index['name'], tuple(index['column_names'])) for index in indexes}
+
+
+async def explain(db, stmt) -> str:
+    """SQLite's EXPLAIN QUERY PLAN of the statement, one plan step per line"""
+    sql = stmt.compile(dialect=db.bind.dialect, compile_kwargs={'literal_binds': True})
+    rows = (await db.execute(text(f'EXPLAIN QUERY PLAN {sql}'))).all()
+    return '\n'.join(row[-1] for row in rows)
+
+
+def test_migrations_create_the_indexes_declared_on_the_models():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            for file_name in MIGRATIONS:
+                load_migration(file_name).upgrade()
+
+        migrated = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            declared = index_set({'name': i.name, 'column_names': [c.name for c in i.columns]} for i in table.indexes)
+            assert index_set(migrated.get_indexes(table.name)) == declared, table.name
+
+
+def test_rank_score_migration_backfills_existing_courses_and_defaults_new_ones():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            *before, rank_score_migration = MIGRATIONS
+            for file_name in before:
+                load_migration(file_name).upgrade()
+            conn.execute(text("INSERT INTO accounts (account_id, email, password, role) VALUES (1, 't', 'p', 'teacher')"))
+            conn.execute(text("INSERT INTO teachers (teacher_id, first_name, last_name) VALUES (1, 'T', 'D')"))
+            conn.execute(text(
+                "INSERT INTO courses (course_id, title, description, objectives, owner_id, rating, people_rated) "
+                "VALUES (1, 'one', 'd', 'o', 1, 10, 1), (2, 'many', 'd', 'o', 1, 9, 100), (3, 'new', 'd', 'o', 1, NULL, 0)"))
+            load_migration(rank_score_migration).upgrade()
+        # inserted outside the ORM after the migration: the server default, the score of an unrated course
+        conn.execute(text("INSERT INTO courses (course_id, title, description, objectives, owner_id) "
+                          "VALUES (4, 'raw', 'd', 'o', 1)"))
+
+        scores = dict(conn.execute(text('SELECT course_id, rank_score FROM courses')).all())
+
+    assert scores == pytest.approx({1: ranking.rank_score(10, 1), 2: ranking.rank_score(9, 100),
+                                    3: ranking.rank_score(None, 0), 4: ranking.rank_score(None, 0)})
+    assert scores[2] > scores[1] > scores[3]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('stmt, index', [
+    (select(Course.course_id).where(Course.is_hidden == False, Course.rating >= 5),
+     'ix_courses_is_hidden_rating'),
+    (select(Course.course_id).where(Course.is_hidden == False)
+     .order_by(desc(Course.rank_score), desc(Course.course_id)).limit(10),
+     'ix_courses_is_hidden_rank_score'),
+    (select(Course.course_id).where(Course.owner_id == 1),
+     'ix_courses_owner_id'),
+    (select(StudentCourse.course_id).where(StudentCourse.student_id == 1, StudentCourse.status == Status.active.value),
+     'ix_students_courses_student_id_status'),
+    (select(StudentCourse.student_id).where(StudentCourse.course_id == 1, StudentCourse.status == Status.pending.value),
+     'ix_students_courses_course_id_status'),
+    (select(func.count()).select_from(Section).where(Section.course_id == 1),
+     'ix_sections_course_id'),
+    (select(StudentRating).where(StudentRating.course_id == 1),
+     'ix_students_ratings_course_id'),
+    (select(func.count()).select_from(CourseTag).where(CourseTag.tag_id == 1),
+     'ix_courses_tags_tag_id'),
+])
+async def test_hot_query_shape_uses_its_index(db, stmt, index):
+    plan = await explain(db, stmt)
+
+    assert f'INDEX {index}' in plan, plan
+
+
+# --- EXPLAIN-plan regression suite: the critical queries exactly as the crud layer builds them ---
+
+# set to a throwaway MariaDB database to also check the plans with MariaDB's EXPLAIN
+MARIADB_URL = os.environ.get('EXPLAIN_MARIADB_URL')
+
+LARGE_TABLES = {'accounts', 'students', 'teachers', 'courses', 'students_courses', 'students_ratings',
+                'sections', 'students_sections', 'courses_tags'}
+TEACHERS, STUDENTS, COURSES, SECTIONS_PER_COURSE, TAGS = 20, 200, 500, 5, 30
+TEACHER_ID, STUDENT_ID, COURSE_ID = 1, TEACHERS + 1, 5
+
+
+async def seed(db) -> None:
+    """Enough rows that a planner with statistics prefers an index whenever there is a usable one"""
+    rnd = random.Random(0)
+    student_ids = range(TEACHERS + 1, TEACHERS + STUDENTS + 1)
+    enrollments = {(student_id, rnd.randint(1, COURSES)) for student_id in student_ids for _ in range(5)}
+    enrollments.add((STUDENT_ID, COURSE_ID))
+
+    await db.execute(insert(Account), [
+        {'account_id': i, 'email': f'user{i}@poodle.com', 'password': 'pass',
+         'role': Role.teacher if i <= TEACHERS else Role.student}
+        for i in range(1, TEACHERS + STUDENTS + 1)
+    ])
+    await db.execute(insert(Teacher), [
+        {'teacher_id': i, 'first_name': 'Teacher', 'last_name': 'Dummy'} for i in range(1, TEACHERS + 1)
+    ])
+    await db.execute(insert(Student), [
+        {'student_id': i, 'first_name': 'Student', 'last_name': 'Dummy'} for i in student_ids
+    ])
+    await db.execute(insert(Course), [
+        {'course_id': i, 'title': f'course {i}', 'description': 'description', 'objectives': 'objectives',
+         'owner_id': rnd.randint(1, TEACHERS), 'is_hidden': i % 10 == 0, 'is_premium': i % 3 == 0,
+         'rating': round(rnd.uniform(0, 10), 2), 'people_rated': rnd.randint(1, 50)}
+        for i in range(1, COURSES + 1)
+    ])
+    await db.execute(insert(Section), [
+        {'section_id': i, 'title': 'section', 'content_type': ContentType.text,
+         'course_id': (i - 1) // SECTIONS_PER_COURSE + 1}
+        for i in range(1, COURSES * SECTIONS_PER_COURSE + 1)
+    ])
+    await db.execute(insert(Tag), [{'tag_id': i, 'name': f'tag{i}'} for i in range(1, TAGS + 1)])
+    await db.execute(insert(CourseTag), [
+        {'course_id': course_id, 'tag_id': tag_id}
+        for course_id in range(1, COURSES + 1) for tag_id in {rnd.randint(1, TAGS), rnd.randint(1, TAGS)}
+    ])
+    await db.execute(insert(StudentCourse), [
+        {'student_id': student_id, 'course_id': course_id, 'status': rnd.choice([1, 2, 2, 3])}
+        for student_id, course_id in enrollments
+    ])
+    await db.execute(insert(StudentRating), [
+        {'student_id': student_id, 'course_id': course_id, 'rating': rnd.randint(1, 10)}
+        for student_id, course_id in enrollments
+    ])
+    await db.execute(insert(StudentSection), [
+        {'student_id': student_id, 'section_id': (course_id - 1) * SECTIONS_PER_COURSE + 1}
+        for student_id, course_id in enrollments
+    ])
+    await db.commit()
+    await full_text.rebuild(db)
+
+
+@pytest_asyncio.fixture(params=['sqlite', 'mariadb'])
+async def seeded_db(request):
+    if request.param == 'mariadb' and not MARIADB_URL:
+        pytest.skip('EXPLAIN_MARIADB_URL is not set')
+
+    engine = create_async_engine(MARIADB_URL if request.param == 'mariadb' else 'sqlite+aiosqlite://')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+        await seed(db)
+        await db.execute(text('ANALYZE' if request.param == 'sqlite' else 'ANALYZE TABLE ' + ', '.join(LARGE_TABLES)))
+        yield db
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+async def explain_crud_call(db, crud_call) -> list[tuple[str, list[str]]]:
+    """Runs the crud call, then EXPLAINs every statement it sent. Returns (statement, full scans) pairs."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, 'before_cursor_execute', capture)
+    try:
+        await crud_call(db)
+    finally:
+        event.remove(sync_engine, 'before_cursor_execute', capture)
+
+    conn = await db.connection()
+    dialect = db.bind.dialect.name
+    plans = []
+    for statement, parameters in dict.fromkeys(statements):
+        if dialect == 'sqlite':
+            rows = (await conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)).all()
+            scans = [row[-1] for row in rows if is_large(re.match(r'SCAN (\w+)', row[-1]))]
+        else:
+            rows = (await conn.exec_driver_sql(f'EXPLAIN {statement}', parameters)).mappings().all()
+            scans = [f"ALL {row['table']}" for row in rows if row['type'] == 'ALL' and is_large(row['table'])]
+        plans.append((statement, scans))
+
+    return plans
+
+
+def is_large(table) -> bool:
+    if isinstance(table, re.Match):
+        table = table.group(1)
+    # sqlalchemy aliases a table as <name>_<n>
+    return bool(table) and re.sub(r'_\d+$', '', table) in LARGE_TABLES
+
+
+async def as_student(db, crud_func, **kwargs):
+    return await crud_func(db, await db.get(Student, STUDENT_ID), **kwargs)
+
+
+async def as_teacher(db, crud_func, **kwargs):
+    return await crud_func(db, await db.get(Teacher, TEACHER_ID), **kwargs)
+
+
+CRITICAL_QUERIES = {
+    'catalog': lambda db: crud_course.get_all_courses(db, pages=1, items_per_page=10),
+    'catalog page 5': lambda db: crud_course.get_all_courses(db, pages=5, items_per_page=10),
+    'catalog after cursor': lambda db: crud_course.get_courses_page(
+        db, items_per_page=10, cursor=crud_course.encode_cursor(5.5, COURSE_ID)),
+    'catalog filtered': lambda db: crud_course.get_all_courses(
+        db, pages=1, items_per_page=10, tag='tag1', rating=5, name='course'),
+    'catalog by tags in sql': lambda db: crud_course.get_courses_page(
+        db, items_per_page=10, tags=['tag1', 'tag2*'], match_all_tags=False),
+    'catalog facets': lambda db: crud_course.get_facets(db),
+    'catalog facets filtered': lambda db: crud_course.get_facets(db, tags=['tag1'], rating=5, is_premium=True),
+    'catalog search': lambda db: crud_course.get_courses_page(db, items_per_page=10, search='course descr'),
+    'catalog by teacher': lambda db: crud_course.get_all_courses(
+        db, pages=1, items_per_page=10, teacher_id=TEACHER_ID),
+    'catalog by student': lambda db: crud_course.get_all_courses(
+        db, pages=1, items_per_page=10, student_id=STUDENT_ID),
+    'student progress': lambda db: crud_student.get_student_progress(db, STUDENT_ID, COURSE_ID),
+    'teacher reports': lambda db: as_teacher(db, crud_teacher.get_courses_reports, min_progress=0.0),
+    'teacher pending requests': lambda db: as_teacher(db, crud_teacher.view_pending_requests),
+    'student pending requests': lambda db: as_student(db, crud_student.view_pending_requests),
+    'student courses': lambda db: as_student(db, crud_student.get_my_courses),
+    'premium courses count': lambda db: as_student(db, crud_student.get_premium_courses_count),
+    'enrollment check': lambda db: as_student(db, crud_student.is_student_enrolled, course_id=COURSE_ID),
+    'course has students': lambda db: crud_course.has_students(db, COURSE_ID),
+    'course ratings': lambda db: crud_admin.get_students_ratings_by_course_id(db, COURSE_ID),
+    'student rating': lambda db: crud_student.get_student_rating(db, STUDENT_ID, COURSE_ID),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('name', CRITICAL_QUERIES)
+async def test_critical_query_does_not_scan_large_tables(seeded_db, name):
+    plans = await explain_crud_call(seeded_db, CRITICAL_QUERIES[name])
+
+    assert plans, f'{name} sent no SELECT'
+    for statement, scans in plans:
+        assert not scans, f'{name} scans {scans}:\n{statement}'
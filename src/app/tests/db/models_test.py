@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import selectinload
+from db.models import Course, CourseTag, Section, Teacher
+from tests import dummies
+
+
+@pytest.mark.asyncio
+async def test_unloaded_relationship_raises_in_strict_mode(db):
+    course = await dummies.create_dummy_course(db)
+    db.expunge_all()
+
+    course = await db.scalar(select(Course).where(Course.course_id == course.course_id))
+
+    with pytest.raises(InvalidRequestError):
+        course.tags
+
+
+@pytest.mark.asyncio
+async def test_declared_relationship_loads_in_strict_mode(db):
+    course = await dummies.create_dummy_course(db)
+    db.expunge_all()
+
+    course = await db.scalar(
+        select(Course).options(selectinload(Course.tags)).where(Course.course_id == course.course_id)
+    )
+
+    assert course.tags == []
+
+
+
+async def course_version(db, course_id: int) -> int:
+    return await db.scalar(select(Course.version).where(Course.course_id == course_id))
+
+
+@pytest.mark.asyncio
+async def test_course_version_follows_course_sections_tags_and_owner_name(db):
+    course = await dummies.create_dummy_course(db)
+    course_id = course.course_id
+    versions = [await course_version(db, course_id)]
+
+    course.description = 'changed'
+    await db.commit()
+    versions.append(await course_version(db, course_id))
+
+    section = Section(title='s', content_type='text', course_id=course_id)
+    db.add(section)
+    await db.commit()
+    versions.append(await course_version(db, course_id))
+
+    tag = await dummies.create_dummy_tag(db)
+    db.add(CourseTag(course_id=course_id, tag_id=tag.tag_id))
+    await db.commit()
+    versions.append(await course_version(db, course_id))
+
+    teacher = await db.get(Teacher, course.owner_id)
+    teacher.first_name = 'Renamed'
+    await db.commit()
+    versions.append(await course_version(db, course_id))
+
+    teacher.phone_number = '123'
+    await db.delete(section)
+    await db.commit()
+    versions.append(await course_version(db, course_id))
+
+    assert versions == [1, 2, 3, 4, 5, 6]
@@ -0,0 +1,131 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import mysql
+from crud import crud_course, crud_tag, crud_teacher
+from db import search as full_text
+from db.models import Course
+from schemas.course import CourseCreate, CourseUpdate
+from schemas.tag import TagBase
+from tests import dummies
+
+
+async def make_course(db, teacher, title, description='d', objectives='o', tags=()):
+    new_course = CourseCreate(title=title, description=description, objectives=objectives, is_premium=False,
+                              tags=[TagBase(name=tag) for tag in tags], sections=[])
+    return (await crud_teacher.make_course(db, teacher, new_course)).course
+
+
+async def titles(db, **filters) -> list[str]:
+    courses, _ = await crud_course.get_courses_page(db, items_per_page=20, **filters)
+    return [course.title for course in courses]
+
+
+@pytest.mark.asyncio
+async def test_make_course_indexes_title_body_and_tags(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    await make_course(db, teacher, 'Python basics', description='Loops and functions', tags=['programming'])
+    await make_course(db, teacher, 'Watercolor', objectives='Paint landscapes', tags=['art'])
+
+    assert await titles(db, search='pyth') == ['Python basics']
+    assert await titles(db, search='functions') == ['Python basics']
+    assert await titles(db, search='landscape') == ['Watercolor']
+    assert await titles(db, search='program') == ['Python basics']
+    assert await titles(db, search='python paint') == []
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_title_hits_above_body_hits(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    await make_course(db, teacher, 'Cooking', description='Italian food, a bit of history')
+    await make_course(db, teacher, 'History of Rome', description='From the kings to the empire')
+
+    assert await titles(db, search='history') == ['History of Rome', 'Cooking']
+
+
+@pytest.mark.asyncio
+async def test_edit_course_info_and_create_tags_keep_the_index_in_sync(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    course = await make_course(db, teacher, 'Old title')
+    course = await db.get(Course, course.course_id)
+
+    await crud_teacher.edit_course_info(db, course, teacher, CourseUpdate(
+        title='Gardening', description='Soil', objectives='Grow tomatoes'))
+    await crud_tag.create_tags(db, [TagBase(name='outdoors')], course.course_id)
+
+    assert await titles(db, search='old') == []
+    assert await titles(db, search='tomato') == ['Gardening']
+    assert await titles(db, tag='outdo') == ['Gardening']
+
+
+@pytest.mark.asyncio
+async def test_delete_tag_from_course_removes_it_from_the_index(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    course = await make_course(db, teacher, 'Chess', tags=['strategy'])
+    tag_id = (await crud_tag.create_tags(db, [TagBase(name='strategy')], course.course_id))['duplicated_tags_ids'][0]
+
+    await crud_tag.delete_tag_from_course(db, await crud_tag.course_has_tag(db, course.course_id, tag_id))
+
+    assert await titles(db, tag='strategy') == []
+
+
+@pytest.mark.asyncio
+async def test_name_and_tag_filters_search_their_own_column_and_keep_catalog_order(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    await make_course(db, teacher, 'Data science', tags=['python'])
+    await make_course(db, teacher, 'Python for data', tags=['programming'])
+
+    assert await titles(db, name='python') == ['Python for data']
+    assert await titles(db, tag='python') == ['Data science']
+    assert await titles(db, name='data') == ['Python for data', 'Data science']
+
+
+@pytest.mark.asyncio
+async def test_search_without_words_does_not_filter(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    await make_course(db, teacher, 'Chess')
+
+    assert await titles(db, search='%%', name='!') == ['Chess']
+
+
+@pytest.mark.asyncio
+async def test_search_rejects_cursor(db):
+    with pytest.raises(HTTPException) as exc:
+        await crud_course.get_courses_page(db, search='chess', cursor=crud_course.encode_cursor(1.0, 1))
+
+    assert exc.value.status_code == 400
+
+
+def test_terms_drop_query_operators():
+    assert full_text.terms('"c++" AND -java* title:x') == ['c', 'AND', 'java', 'title', 'x']
+
+
+def test_mariadb_search_is_a_boolean_mode_match_on_an_indexed_column_set():
+    sql = str(full_text.FulltextSearch().matches(['intro', 'pyth'], ('title',)).compile(
+        dialect=mysql.dialect(), compile_kwargs={'literal_binds': True}))
+
+    assert "MATCH (course_search.title) AGAINST ('+intro* +pyth*' IN BOOLEAN MODE)" in sql
+
+
+def test_mariadb_search_matches_words_the_fulltext_index_drops_by_regexp():
+    def compiled(words, columns):
+        return str(full_text.FulltextSearch().matches(words, columns).compile(
+            dialect=mysql.dialect(), compile_kwargs={'literal_binds': True}))
+
+    mixed = compiled(['machine', 'AI'], ('title', 'tags'))
+    only_short = compiled(['Go', 'the'], ('tags',))
+
+    assert "AGAINST ('+machine*' IN BOOLEAN MODE)" in mixed
+    assert "course_search.title REGEXP '(?i)\\\\bAI' OR course_search.tags REGEXP '(?i)\\\\bAI'" in mixed
+    assert 'MATCH' not in only_short
+    assert "course_search.tags REGEXP '(?i)\\\\bGo' AND course_search.tags REGEXP '(?i)\\\\bthe'" in only_short
+
+
+@pytest.mark.asyncio
+async def test_short_words_and_stopwords_filter_like_any_other(db):
+    _, teacher = await dummies.create_dummy_teacher(db)
+    await make_course(db, teacher, 'C for the web', tags=['Go', 'UX'])
+    await make_course(db, teacher, 'Cooking', tags=['food'])
+
+    assert await titles(db, tag='ux') == ['C for the web']
+    assert await titles(db, tag='go') == ['C for the web']
+    assert await titles(db, name='c the') == ['C for the web']
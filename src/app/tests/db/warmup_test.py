@@ -0,0 +1,46 @@
+import pytest
+import pytest_asyncio
+from db import database, warmup
+from db.database import Base
+
+
+@pytest_asyncio.fixture
+async def file_db(tmp_path):
+    await database.dispose_engine()
+    database.init_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}", replica_urls=[])
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield database.engine
+
+    await database.dispose_engine()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_connections_and_caches_hot_statements(file_db):
+    state = await warmup.warm_up(count=3)
+
+    assert state['ready'] is True
+    assert state['connections'] == 3
+    assert file_db.sync_engine.pool.checkedin() >= 3
+    assert len(file_db.sync_engine._compiled_cache) >= 7
+
+
+@pytest.mark.asyncio
+async def test_warm_up_stays_not_ready_when_db_is_unreachable(mocker):
+    mocker.patch('db.warmup.open_connections', side_effect=ConnectionRefusedError())
+    await database.dispose_engine()
+
+    state = await warmup.warm_up(count=3)
+
+    assert state['ready'] is False
+    assert 'ConnectionRefusedError' in state['error']
+    await database.dispose_engine()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_is_ready_at_once_when_disabled():
+    state = await warmup.warm_up(count=0)
+
+    assert state['ready'] is True
+    assert state['connections'] == 0
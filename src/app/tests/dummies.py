@@ -1,6 +1,6 @@
 from unittest.mock import Mock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import Account, Student, Teacher, Course, StudentCourse, Status, Admin, Section, StudentRating, \
     StudentSection, Tag, CourseTag
@@ -38,7 +38,7 @@ async def get_default_tst_rating():
     return default_tst_rating
 
 
-async def create_dummy_student(db: Session, is_premium=0) -> tuple[Account, Student]:
+async def create_dummy_student(db: AsyncSession, is_premium=0) -> tuple[Account, Student]:
     account_id = 1
     account = Account(
         account_id=account_id,
@@ -53,11 +53,11 @@ async def create_dummy_student(db: Session, is_premium=0) -> tuple[Account, Stud
         # is_premium=is_premium,
     )
     db.add_all([account, student])
-    db.commit()
+    await db.commit()
     return account, student
 
 
-async def create_dummy_teacher(db: Session) -> tuple[Account, Teacher]:
+async def create_dummy_teacher(db: AsyncSession) -> tuple[Account, Teacher]:
     account_id = 2
     account = Account(
         account_id=account_id,
@@ -71,11 +71,11 @@ async def create_dummy_teacher(db: Session) -> tuple[Account, Teacher]:
         last_name='Teacher',
     )
     db.add_all([account, teacher])
-    db.commit()
+    await db.commit()
     return account, teacher
 
 
-async def create_dummy_course(db: Session):
+async def create_dummy_course(db: AsyncSession):
     _, teacher = await create_dummy_teacher(db)
     course = Course(
         course_id=1,
@@ -86,33 +86,33 @@ async def create_dummy_course(db: Session):
     )
 
     db.add(course)
-    db.commit()
-    db.refresh(course)
+    await db.commit()
+    await db.refresh(course)
     return course
 
 
-async def subscribe_dummy_student(db: Session, student_id, course_id, status=Status.active.value):
+async def subscribe_dummy_student(db: AsyncSession, student_id, course_id, status=Status.active.value):
     enrollment = StudentCourse(
         student_id=student_id,
         course_id=course_id,
         status=status,
     )
     db.add(enrollment)
-    db.commit()
+    await db.commit()
     return enrollment
 
 
-async def dummy_student_rating(db: Session, student_id, course_id):
+async def dummy_student_rating(db: AsyncSession, student_id, course_id):
     rating = await get_default_tst_rating()
     new_rating = StudentRating(
         student_id=student_id,
         course_id=course_id,
         rating=rating)
     db.add(new_rating)
-    db.commit()
+    await db.commit()
 
 
-async def create_dummy_admin(db: Session):
+async def create_dummy_admin(db: AsyncSession):
     dummy_admin_id = 3
     dummy_user = Account(
         account_id=dummy_admin_id,
@@ -127,7 +127,7 @@ async def create_dummy_admin(db: Session):
     )
 
     db.add_all([dummy_user, dummy_admin])
-    db.commit()
+    await db.commit()
     return dummy_user, dummy_admin
 
 
@@ -141,8 +141,8 @@ async def create_dummy_section(db):
     )
     
     db.add(section)
-    db.commit()  
-    db.refresh(section)  
+    await db.commit()  
+    await db.refresh(section)  
     return section, course
    
 
@@ -151,13 +151,13 @@ async def dummy_view_section(db, student_id, section_id):
                                      section_id=section_id)
 
     db.add(visited_section)
-    db.commit()
+    await db.commit()
 
 
 async def create_dummy_tag(db):
     tag = Tag(tag_id=1, name='dummyTag')
     db.add(tag)
-    db.commit()
+    await db.commit()
 
     return tag
 
@@ -165,7 +165,7 @@ async def create_dummy_tag(db):
 async def add_dummy_tag(db, course_id, tag_id):
     add_tag = CourseTag(course_id=course_id, tag_id=tag_id)
     db.add(add_tag)
-    db.commit()
+    await db.commit()
 
     return add_tag
 